@@ -1,6 +1,9 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.backends import BaseBackend
-from django.contrib.auth.models import User
-from .tu_api import ThammasatAPI, create_or_update_user
+from .tu_api import TUServiceUnavailable, get_async_tu_api, get_tu_api, get_user_for_login
+from .tasks import queue_profile_sync, queue_user_update
+from .auth_cache import cache_verified_credentials, get_cached_user_data, invalidate_cached_credentials
+from .user_cache import get_cached_user
 
 class ThammasatAuthBackend(BaseBackend):
     """
@@ -14,22 +17,74 @@ class ThammasatAuthBackend(BaseBackend):
         if not username or not password:
             return None
             
-        # Authenticate with Thammasat API
-        tu_api = ThammasatAPI()
-        user_data = tu_api.authenticate_user(username, password)
+        # Credentials verified recently can skip the round trip to the TU API
+        user_data = get_cached_user_data(username, password)
         
         if not user_data:
+            # Authenticate with Thammasat API
+            tu_api = get_tu_api()
+            try:
+                user_data = tu_api.authenticate_user(username, password)
+            except TUServiceUnavailable:
+                self._mark_unavailable(request)
+                return None
+            
+            if not user_data:
+                # Don't let an older cached verification outlive a rejected password
+                invalidate_cached_credentials(username)
+                return None
+            
+            cache_verified_credentials(username, password, user_data)
+            
+        return self._user_for_login(user_data)
+    
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """
+        Authenticate a user via Thammasat API without blocking the event loop
+        """
+        if not username or not password:
             return None
+        
+        user_data = await sync_to_async(get_cached_user_data)(username, password)
+        
+        if not user_data:
+            # The TU call is awaited on the loop; only the DB/cache work uses threads
+            tu_api = get_async_tu_api()
+            try:
+                user_data = await tu_api.authenticate_user(username, password)
+            except TUServiceUnavailable:
+                self._mark_unavailable(request)
+                return None
             
-        # Create or update user based on Thammasat API data
-        user = create_or_update_user(user_data)
+            if not user_data:
+                await sync_to_async(invalidate_cached_credentials)(username)
+                return None
+            
+            await sync_to_async(cache_verified_credentials)(username, password, user_data)
+        
+        return await sync_to_async(self._user_for_login)(user_data)
+    
+    def _user_for_login(self, user_data):
+        """
+        User for the login; saving changed TU data and the student info
+        sync run in the background
+        """
+        user, stale = get_user_for_login(user_data)
+        if stale:
+            queue_user_update(user_data)
+        queue_profile_sync(user)
         return user
     
+    def _mark_unavailable(self, request):
+        """
+        Flag the request so the login view can tell the user the TU service is
+        down; returning None still lets the next backend (ModelBackend) try
+        """
+        if request is not None:
+            request.tu_service_unavailable = True
+    
     def get_user(self, user_id):
         """
-        Get user by ID
+        Get user by ID, with the profile loaded, from the user cache
         """
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
+        return get_cached_user(user_id)
@@ -0,0 +1,84 @@
+import hashlib
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, get_random_string, pbkdf2
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'tu_auth'
+
+
+def is_enabled():
+    """
+    Whether the verified-credential cache is switched on
+    """
+    return getattr(settings, 'TU_AUTH_CACHE_ENABLED', False)
+
+
+def _cache_key(username):
+    # Hash the username so raw IDs never appear in Redis key names
+    digest = hashlib.sha256(username.lower().encode('utf-8')).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{digest}"
+
+
+def _fingerprint(username, password, salt):
+    """
+    Salted, slow (PBKDF2) hash of the credentials; the plaintext password is never stored
+    """
+    iterations = getattr(settings, 'TU_AUTH_CACHE_HASH_ITERATIONS', 100000)
+    digest = pbkdf2(f"{username.lower()}:{password}", salt, iterations)
+    return digest.hex()
+
+
+def get_cached_user_data(username, password):
+    """
+    Return the cached TU profile payload if these credentials were verified
+    within the TTL, None otherwise
+    """
+    if not is_enabled():
+        return None
+    try:
+        entry = cache.get(_cache_key(username))
+    except Exception as e:
+        logger.warning("Credential cache unavailable: %s", e)
+        return None
+
+    if not entry:
+        return None
+    if not constant_time_compare(entry['hash'], _fingerprint(username, password, entry['salt'])):
+        return None
+    return entry['user_data']
+
+
+def cache_verified_credentials(username, password, user_data):
+    """
+    Remember credentials that the TU API has just verified, together with
+    the returned profile payload
+    """
+    if not is_enabled():
+        return
+    salt = get_random_string(16)
+    entry = {
+        'salt': salt,
+        'hash': _fingerprint(username, password, salt),
+        'user_data': user_data,
+    }
+    try:
+        cache.set(_cache_key(username), entry, getattr(settings, 'TU_AUTH_CACHE_TTL', 300))
+    except Exception as e:
+        logger.warning("Could not cache verified credentials: %s", e)
+
+
+def invalidate_cached_credentials(username):
+    """
+    Drop any cached verification for the given user so the next login goes
+    to the TU API again
+    """
+    if not username:
+        return
+    try:
+        cache.delete(_cache_key(username))
+    except Exception as e:
+        logger.warning("Could not invalidate cached credentials: %s", e)
@@ -0,0 +1,88 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_CONFIGS = 'gthread:2x4,gthread:2x8,gthread:4x8,gevent:2,gevent:4,uvicorn:2,uvicorn:4'
+
+
+def parse_config(spec):
+    """
+    'gthread:4x8' -> ('gthread', 4, 8); 'gevent:2' -> ('gevent', 2, None)
+    """
+    kind, _, size = spec.partition(':')
+    if kind not in ('gthread', 'gevent', 'uvicorn') or not size:
+        raise ValueError(f'Bad config {spec!r}, expected gthread:WORKERSxTHREADS, gevent:WORKERS or uvicorn:WORKERS')
+    workers, _, threads = size.partition('x')
+    return kind, int(workers), int(threads) if threads else None
+
+
+class Command(BaseCommand):
+    help = (
+        'Sweep gunicorn worker class, worker and thread counts under the same load: runs load_test '
+        '--spawn (gunicorn.conf.py + TU stub) once per configuration and prints throughput, '
+        'latency and errors side by side'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--configs', default=DEFAULT_CONFIGS,
+                            help='Comma-separated gthread:WORKERSxTHREADS, gevent:WORKERS, uvicorn:WORKERS')
+        parser.add_argument('--rps', type=float, default=60)
+        parser.add_argument('--duration', type=float, default=20)
+        parser.add_argument('--users', type=int, default=30)
+        parser.add_argument('--mix', default=None, help='See load_test --mix')
+        parser.add_argument('--stub-latency', default='lognormal:0.15,0.5', help='See tu_stub --latency')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Also write every run to this JSON file')
+
+    def handle(self, *args, **options):
+        try:
+            configs = [parse_config(spec.strip()) for spec in options['configs'].split(',') if spec.strip()]
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        runs = []
+        for kind, workers, threads in configs:
+            name = f'{kind}:{workers}' + (f'x{threads}' if threads else '')
+            self.stdout.write(f'{name} ...')
+            results = self._load_test(kind, workers, threads, options)
+            runs.append((name, results))
+            self.stdout.write(f'{name}: {self._row(results["total"])}')
+
+        self.stdout.write('')
+        self.stdout.write(f'{options["rps"]:g} req/s offered for {options["duration"]:g}s, TU stub {options["stub_latency"]}')
+        self.stdout.write(f'{"config":<14} {"rps":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}  login p95 ms')
+        for name, results in runs:
+            total = results['total']
+            login = results['scenarios'].get('login', {})
+            self.stdout.write(
+                f'{name:<14} {total["rps"]:>7.1f} {total["p50_ms"] or 0:>8.0f} {total["p95_ms"] or 0:>8.0f} '
+                f'{total["p99_ms"] or 0:>8.0f} {total["errors"]:>7}  {login.get("p95_ms") or 0:.0f}'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(dict(runs), f, indent=2)
+            self.stdout.write(f'Results saved to {options["output"]}')
+
+    def _load_test(self, kind, workers, threads, options):
+        fd, output = tempfile.mkstemp(prefix='sweep-', suffix='.json')
+        os.close(fd)
+        extra = {'mix': options['mix']} if options['mix'] else {}
+        try:
+            call_command(
+                'load_test', spawn=True, worker_class=kind, workers=workers, threads=threads or 1,
+                rps=options['rps'], duration=options['duration'], users=options['users'],
+                stub_latency=options['stub_latency'], seed=options['seed'], output=output,
+                label=f'sweep {kind}:{workers}', stdout=io.StringIO(), **extra,
+            )
+            with open(output) as f:
+                return json.load(f)
+        finally:
+            os.unlink(output)
+
+    def _row(self, total):
+        return f'{total["rps"]:.1f} req/s, p95 {total["p95_ms"]} ms, {total["errors"]} errors'
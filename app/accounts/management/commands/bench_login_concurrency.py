@@ -0,0 +1,126 @@
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.tu_stub import start_stub_server
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent /login/ throughput under WSGI (gthread) and ASGI (uvicorn) '
+        'against a local TU API stub with artificial latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=40, help='Number of logins per server')
+        parser.add_argument('--concurrency', type=int, default=20, help='Number of concurrent clients')
+        parser.add_argument('--latency', type=float, default=1.0, help='TU stub latency in seconds')
+        parser.add_argument('--threads', type=int, default=4, help='gthread threads for the WSGI worker')
+        parser.add_argument('--only', choices=['wsgi', 'asgi'], help='Run a single server type')
+
+    def handle(self, *args, **options):
+        stub, stub_url = start_stub_server(latency=options['latency'])
+        self.stdout.write(f"TU stub on {stub_url} with {options['latency']}s latency")
+
+        servers = {
+            'wsgi': [
+                'ams.wsgi:application', '--worker-class', 'gthread',
+                '--workers', '1', '--threads', str(options['threads']),
+            ],
+            'asgi': [
+                'ams.asgi:application', '--worker-class', 'uvicorn_worker.UvicornWorker',
+                '--workers', '1',
+            ],
+        }
+        if options['only']:
+            servers = {options['only']: servers[options['only']]}
+
+        try:
+            for name, gunicorn_args in servers.items():
+                self._bench_server(name, gunicorn_args, stub_url, options)
+        finally:
+            stub.shutdown()
+
+    def _bench_server(self, name, gunicorn_args, stub_url, options):
+        port = _free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = dict(
+            os.environ,
+            TU_API_URL=f'{stub_url}/api/v1/auth/Ad/verify',
+            TU_API_KEY='TU-bench',
+            ASYNC_LOGIN='True' if name == 'asgi' else 'False',
+        )
+        cmd = [
+            sys.executable, '-m', 'gunicorn', *gunicorn_args,
+            '--bind', f'127.0.0.1:{port}', '--timeout', '300', '--log-level', 'warning',
+        ]
+        proc = subprocess.Popen(cmd, env=env, cwd=settings.BASE_DIR)
+        try:
+            self._wait_until_up(base_url, proc)
+            self._run(name, base_url, options['logins'], options['concurrency'])
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    def _wait_until_up(self, base_url, proc, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise CommandError(f'Server exited with code {proc.returncode}')
+            try:
+                requests.get(f'{base_url}/test/ping/', timeout=1)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise CommandError(f'Server at {base_url} did not start within {timeout}s')
+
+    def _run(self, name, base_url, total, concurrency):
+        login_url = f'{base_url}/login/'
+        latencies = []
+        failures = []
+
+        def login(i):
+            session = requests.Session()
+            session.get(login_url, timeout=300)
+            start = time.perf_counter()
+            response = session.post(
+                login_url,
+                data={
+                    'username': f'65{i:08d}',
+                    'password': 'secret',
+                    'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+                },
+                headers={'Referer': login_url},
+                allow_redirects=False,
+                timeout=300,
+            )
+            latencies.append(time.perf_counter() - start)
+            # A successful login redirects away from the login page
+            if response.status_code != 302:
+                failures.append(response.status_code)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(login, range(total)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        self.stdout.write(
+            f'{name}: {total} logins in {elapsed:.2f}s = {total / elapsed:.1f} logins/s  '
+            f'p50 {statistics.median(latencies):.2f}s  p95 {p95:.2f}s  failures {len(failures)}'
+        )
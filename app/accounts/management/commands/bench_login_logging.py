@@ -0,0 +1,98 @@
+import copy
+import logging
+import logging.config
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from accounts.tu_api import get_tu_api, get_user_for_login, reset_tu_api
+from accounts.tu_stub import start_stub_server
+
+API_KEY = 'TU-bench-secret-application-key'
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmark of login throughput (TU API round trip against a local stub plus the '
+        'user lookup) under the debug and production logging profiles from LOGGING_PROFILES. '
+        'Log output goes to a temporary directory, under --log-dir if given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent login threads (gthread-like)')
+        parser.add_argument('--users', type=int, default=50, help='Distinct usernames to cycle through')
+        parser.add_argument('--trace-sample-rate', type=float, default=None,
+                            help='Override TU_API_TRACE_SAMPLE_RATE for the production profile')
+        parser.add_argument('--log-dir', help='Write the logs here instead of a temporary directory '
+                                              '(to measure a real disk)')
+
+    def handle(self, *args, **options):
+        stub, stub_url = start_stub_server()
+        usernames = [f'logbench{i:05d}' for i in range(options['users'])]
+        try:
+            with tempfile.TemporaryDirectory(dir=options['log_dir']) as log_dir, override_settings(
+                TU_API_URL=f'{stub_url}/api/v1/auth/Ad/verify',
+                TU_PROFILE_API_URL=f'{stub_url}/api/v2/profile/std/info/',
+                TU_API_KEY=API_KEY,
+            ):
+                reset_tu_api()
+                for mode in ('debug', 'production'):
+                    self._bench(mode, log_dir, usernames, options)
+        finally:
+            logging.config.dictConfig(settings.LOGGING)
+            reset_tu_api()
+            stub.shutdown()
+            User.objects.filter(username__in=usernames).delete()
+
+    def _profile(self, mode, log_file, options):
+        config = copy.deepcopy(settings.LOGGING_PROFILES[mode])
+        if mode == 'debug':
+            config['handlers']['file']['filename'] = log_file
+            # Keep the console quiet; the file handler is what we are measuring
+            config['handlers']['console']['class'] = 'logging.NullHandler'
+            config['handlers']['console'].pop('formatter', None)
+        else:
+            config['handlers']['background']['filename'] = log_file
+            if options['trace_sample_rate'] is not None:
+                config['filters']['sample_traces']['rate'] = options['trace_sample_rate']
+        return config
+
+    def _bench(self, mode, log_dir, usernames, options):
+        log_file = os.path.join(log_dir, f'{mode}.log')
+        logging.config.dictConfig(self._profile(mode, log_file, options))
+        tu_api = get_tu_api()
+
+        def login(i):
+            user_data = tu_api.authenticate_user(usernames[i % len(usernames)], 'secret')
+            get_user_for_login(user_data)
+
+        # Warm up: creates the users and opens the pooled connections
+        for i in range(len(usernames)):
+            login(i)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(login, range(options['logins'])))
+        elapsed = time.perf_counter() - started
+
+        # Flush the background writer before measuring the file
+        logging.shutdown()
+        data = b''
+        if os.path.exists(log_file):
+            with open(log_file, 'rb') as f:
+                data = f.read()
+        lines = data.count(b'\n')
+        self.stdout.write(
+            f'{mode:<10} {options["logins"]} logins in {elapsed:.2f}s = '
+            f'{options["logins"] / elapsed:7.1f} logins/s  '
+            f'log {lines} lines, {len(data) / 1024:.0f} KiB'
+        )
+        if API_KEY.encode() in data:
+            self.stdout.write(self.style.ERROR(f'{mode}: the Application-Key appears in the log'))
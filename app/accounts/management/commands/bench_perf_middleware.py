@@ -0,0 +1,57 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import ResolverMatch
+
+from ams.middleware import PerformanceMiddleware
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-request overhead of PerformanceMiddleware on a view that runs a few SQL '
+        'queries and cache lookups, at several sample rates'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--queries', type=int, default=5, help='SQL queries per request')
+        parser.add_argument('--cache-gets', type=int, default=3, help='Cache lookups per request')
+
+    def handle(self, *args, **options):
+        queries, cache_gets = options['queries'], options['cache_gets']
+
+        def view(request):
+            with connection.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute('SELECT 1')
+            for i in range(cache_gets):
+                cache.get(f'bench_perf_middleware:{i}')
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/')
+        request.resolver_match = ResolverMatch(view, (), {}, url_name='bench', route='bench/')
+
+        baseline = self._time(view, request, options['requests'])
+        self.stdout.write(f'{"no middleware":<28} {baseline * 1e6:8.1f} us/request')
+        for rate in (0.0, 0.1, 1.0):
+            for server_timing in (False, True):
+                if server_timing and rate == 0.0:
+                    continue
+                with override_settings(PERF_SAMPLE_RATE=rate, PERF_SERVER_TIMING=server_timing):
+                    elapsed = self._time(PerformanceMiddleware(view), request, options['requests'])
+                label = f'sample {rate:.0%}' + (' + Server-Timing' if server_timing else '')
+                self.stdout.write(
+                    f'{label:<28} {elapsed * 1e6:8.1f} us/request  (+{(elapsed - baseline) * 1e6:.1f} us)'
+                )
+
+    def _time(self, handler, request, count):
+        for _ in range(100):
+            handler(request)
+        started = time.perf_counter()
+        for _ in range(count):
+            handler(request)
+        return (time.perf_counter() - started) / count
@@ -0,0 +1,69 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from accounts import sessions, user_cache
+from accounts.models import UserProfile
+
+CONFIGS = [
+    # (label, SESSION_ENGINE, AUTH_USER_CACHE_TTL, local tier on)
+    ('redis session, user from DB', 'django.contrib.sessions.backends.cache', 0, False),
+    ('redis session + redis user', 'accounts.sessions', 300, False),
+    ('local LRU + redis', 'accounts.sessions', 300, True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests/sec on /profile/ for a logged-in student with the plain cache session engine, '
+        'with the Redis session/user cache only, and with the per-process LRU in front. '
+        'Also reports the SQL queries and cache hits/misses of one warm request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            self.stdout.write(self.style.WARNING('DEBUG is on; numbers include debug overhead'))
+        user, _ = User.objects.get_or_create(username='profilebench', defaults={'first_name': 'Profile'})
+        UserProfile.objects.get_or_create(user=user, defaults={'user_type': 'student', 'tu_id': 'profilebench'})
+        local_ttl = getattr(settings, 'AUTH_LOCAL_CACHE_TTL', 5)
+        try:
+            for label, engine, user_ttl, local in CONFIGS:
+                sessions._local.ttl = user_cache._local.ttl = local_ttl if local else 0
+                sessions._local.clear()
+                user_cache._local.clear()
+                # Server-Timing on every request reports the queries and cache lookups
+                with override_settings(SESSION_ENGINE=engine, AUTH_USER_CACHE_TTL=user_ttl,
+                                       PERF_SAMPLE_RATE=1.0, PERF_SERVER_TIMING=True):
+                    self._bench(label, user, options)
+        finally:
+            sessions._local.ttl = user_cache._local.ttl = local_ttl
+            user.delete()
+
+    def _bench(self, label, user, options):
+        client = Client()
+        client.force_login(user, backend='accounts.auth_backend.ThammasatAuthBackend')
+        # Warm up, then count what one request does
+        for _ in range(20):
+            if client.get('/profile/').status_code != 200:
+                raise CommandError(f'{label}: /profile/ did not return 200')
+        timing = client.get('/profile/').get('Server-Timing', '')
+        breakdown = ', '.join(re.findall(r'(?:db|cache);[^,]*desc="([^"]*)"', timing))
+
+        total = options['requests']
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(lambda _: client.get('/profile/'), range(total)))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{label:<30} {total / elapsed:7.0f} req/s  '
+            f'per request: {breakdown or "n/a (PerformanceMiddleware not installed)"}'
+        )
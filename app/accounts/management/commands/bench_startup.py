@@ -0,0 +1,99 @@
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        out = subprocess.run(['pgrep', '-P', str(pid)], capture_output=True, text=True).stdout
+        return [int(child) for child in out.split()]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time to first response of a fresh gunicorn worker, with and without --preload '
+        '(PRELOAD_APP=True). Starts a one-worker gunicorn, then repeatedly kills the worker and '
+        'times how long the replacement takes to render /login/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5, help='Worker restarts per mode')
+        parser.add_argument('--path', default='/login/', help='Page the fresh worker must serve')
+        parser.add_argument('--only', choices=['default', 'preload'], help='Run a single mode')
+
+    def handle(self, *args, **options):
+        modes = ['default', 'preload']
+        if options['only']:
+            modes = [options['only']]
+        for mode in modes:
+            self._bench(mode, options)
+
+    def _bench(self, mode, options):
+        port = _free_port()
+        url = f'http://127.0.0.1:{port}{options["path"]}'
+        env = dict(os.environ, PRELOAD_APP='True' if mode == 'preload' else 'False')
+        cmd = [
+            sys.executable, '-m', 'gunicorn', 'ams.wsgi:application',
+            '--worker-class', 'gthread', '--workers', '1', '--threads', '4',
+            '--bind', f'127.0.0.1:{port}', '--log-level', 'warning',
+        ]
+        if mode == 'preload':
+            cmd.append('--preload')
+
+        started = time.perf_counter()
+        proc = subprocess.Popen(cmd, env=env, cwd=settings.BASE_DIR)
+        try:
+            cold = self._wait_for(url, proc, started)
+            restarts = []
+            for _ in range(options['rounds']):
+                workers = _children(proc.pid)
+                if not workers:
+                    raise CommandError('Could not find the gunicorn worker process')
+                started = time.perf_counter()
+                os.kill(workers[0], signal.SIGTERM)
+                # Wait until the old worker is gone so it can't answer for the new one
+                while workers[0] in _children(proc.pid):
+                    time.sleep(0.005)
+                restarts.append(self._wait_for(url, proc, started))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+        self.stdout.write(
+            f'{mode:<8} server start to first response {cold * 1000:6.0f} ms; '
+            f'fresh worker to first response: median {statistics.median(restarts) * 1000:6.0f} ms, '
+            f'max {max(restarts) * 1000:6.0f} ms ({len(restarts)} restarts)'
+        )
+
+    def _wait_for(self, url, proc, started, timeout=60):
+        """
+        Seconds from `started` until url answers 200
+        """
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise CommandError(f'gunicorn exited with code {proc.returncode}')
+            try:
+                if requests.get(url, timeout=5).status_code == 200:
+                    return time.perf_counter() - started
+            except requests.RequestException:
+                pass
+            time.sleep(0.005)
+        raise CommandError(f'{url} did not answer within {timeout}s')
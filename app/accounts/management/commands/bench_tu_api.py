@@ -0,0 +1,92 @@
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+
+from accounts.tu_api import ThammasatAPI, _build_session
+from accounts.tu_stub import start_stub_server
+
+
+class _UnpooledSession:
+    """
+    Session shim reproducing the old client: module-level requests.get/post,
+    i.e. a new connection (and TLS handshake) for every call
+    """
+    def get(self, *args, **kwargs):
+        return requests.get(*args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        return requests.post(*args, **kwargs)
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-call requests vs the pooled ThammasatAPI session against a local TU API stub'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Number of Ad/verify calls per run')
+        parser.add_argument('--concurrency', type=int, default=4, help='Number of client threads')
+        parser.add_argument('--latency', type=float, default=0.0, help='Artificial stub latency in seconds')
+        parser.add_argument('--url', help='Benchmark an existing Ad/verify endpoint instead of the local stub')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        concurrency = options['concurrency']
+
+        server = None
+        verify_url = options['url']
+        if not verify_url:
+            server, base_url = start_stub_server(latency=options['latency'])
+            verify_url = f'{base_url}/api/v1/auth/Ad/verify'
+            self.stdout.write(f'TU stub listening on {base_url}')
+
+        # Measure the network path, not the DEBUG logging in tu_api
+        tu_logger = logging.getLogger('accounts.tu_api')
+        previous_level = tu_logger.level
+        tu_logger.setLevel(logging.WARNING)
+
+        clients = (
+            ('per-call requests.post', ThammasatAPI(session=_UnpooledSession())),
+            ('pooled session', ThammasatAPI(session=_build_session())),
+        )
+        try:
+            for label, client in clients:
+                client.api_url = verify_url
+                self._run(label, lambda i, c=client: c.authenticate_user(f'65{i:08d}', 'secret'), total, concurrency)
+        finally:
+            tu_logger.setLevel(previous_level)
+            for _, client in clients:
+                client.session.close()
+            if server is not None:
+                server.shutdown()
+
+    def _run(self, label, func, total, concurrency):
+        latencies = []
+
+        def timed(i):
+            start = time.perf_counter()
+            func(i)
+            latencies.append(time.perf_counter() - start)
+
+        # Warm up outside the measured window
+        for i in range(min(concurrency, total)):
+            func(i)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, range(total)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        self.stdout.write(
+            f'{label:<24} {total / elapsed:8.1f} req/s  '
+            f'mean {statistics.mean(latencies) * 1000:6.2f} ms  '
+            f'p50 {statistics.median(latencies) * 1000:6.2f} ms  '
+            f'p95 {p95 * 1000:6.2f} ms'
+        )
@@ -0,0 +1,389 @@
+import json
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.tu_stub import parse_latency, start_stub_server
+from assignments.models import Assignment
+from courses.models import Course, Enrollment
+
+SCENARIOS = ('login', 'home', 'profile', 'submit_text', 'submit_file')
+SUBMISSION_SCENARIOS = ('submit_text', 'submit_file')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    Latency percentiles (ms), error counts and achieved rate for a list of
+    (latency seconds, error or None) samples
+    """
+    latencies = sorted(latency for latency, _ in samples)
+    errors = Counter(error for _, error in samples if error)
+    ms = lambda value: round(value * 1000, 1) if value is not None else None
+    return {
+        'requests': len(samples),
+        'errors': sum(errors.values()),
+        'error_rate': round(sum(errors.values()) / len(samples), 4) if samples else 0,
+        'error_kinds': dict(errors.most_common()),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else 0,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+        'mean_ms': ms(sum(latencies) / len(latencies) if latencies else None),
+    }
+
+
+class VirtualUser:
+    """
+    One logged-in browser session
+    """
+    def __init__(self, username, base_url, timeout):
+        self.username = username
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = None
+
+    def login(self, session=None):
+        """
+        GET the login page for the CSRF cookie, then POST the credentials;
+        returns an error string or None
+        """
+        session = session or requests.Session()
+        url = f'{self.base_url}/login/'
+        session.get(url, timeout=self.timeout)
+        response = session.post(
+            url,
+            data={
+                'username': self.username,
+                'password': 'loadtest',
+                'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+            },
+            headers={'Referer': url},
+            allow_redirects=False,
+            timeout=self.timeout,
+        )
+        # A successful login redirects away from the login page
+        if response.status_code != 302 or response.headers.get('Location', '').startswith('/login'):
+            return f'login {response.status_code}'
+        self.session = session
+        return None
+
+    def get(self, path):
+        response = self.session.get(f'{self.base_url}{path}', allow_redirects=False, timeout=self.timeout)
+        return None if response.status_code == 200 else f'{path} {response.status_code}'
+
+    def post_submission(self, assignment_id, **kwargs):
+        url = f'{self.base_url}/assignments/{assignment_id}/submit/'
+        response = self.session.post(
+            url,
+            headers={'X-CSRFToken': self.session.cookies.get('csrftoken', ''), 'Referer': url},
+            timeout=self.timeout,
+            **kwargs,
+        )
+        return None if response.status_code in (200, 201) else f'submit {response.status_code}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Open-loop load test of /login/, /, /profile/ and the submission endpoint at a target '
+        'request rate, reporting p50/p95/p99 latency and errors per scenario and saving the results '
+        'as JSON. Runs against --base-url, or with --spawn starts gunicorn plus a TU API stub with '
+        'configurable latency, error and timeout rates. The submission scenarios create a course '
+        'and assignments in this project\'s database, so the server must use the same database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--rps', type=float, default=20, help='Target requests per second (all scenarios)')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--mix', default='login=1,home=4,profile=3,submit_text=1,submit_file=1',
+                            help=f'Scenario weights, name=weight,...; scenarios: {", ".join(SCENARIOS)}')
+        parser.add_argument('--users', type=int, default=50, help='Logged-in virtual users')
+        parser.add_argument('--concurrency', type=int, default=100, help='Max requests in flight')
+        parser.add_argument('--timeout', type=float, default=30, help='Client timeout per request')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for the scenario order')
+        parser.add_argument('--output', help='JSON results file (default loadtest-<time>.json)')
+        parser.add_argument('--label', default='', help='Free text stored with the results')
+        parser.add_argument('--compare', help='Earlier JSON results to compare against')
+        parser.add_argument('--keep', action='store_true', help="Don't delete the test course and users")
+        spawn = parser.add_argument_group('--spawn: local gunicorn (gunicorn.conf.py) + TU stub')
+        spawn.add_argument('--spawn', action='store_true')
+        spawn.add_argument('--worker-class', choices=['gthread', 'gevent', 'uvicorn'], default='gthread')
+        spawn.add_argument('--workers', type=int, default=2)
+        spawn.add_argument('--threads', type=int, default=8, help='gthread only')
+        spawn.add_argument('--stub-latency', default='lognormal:0.15,0.5', help='See tu_stub --latency')
+        spawn.add_argument('--stub-error-rate', type=float, default=0.0)
+        spawn.add_argument('--stub-timeout-rate', type=float, default=0.0)
+
+    def handle(self, *args, **options):
+        mix = self._parse_mix(options['mix'])
+        stub = proc = None
+        try:
+            if options['spawn']:
+                stub, proc, options['base_url'] = self._spawn(options)
+            self._check_up(options['base_url'])
+            results = self._run(mix, options)
+            if stub is not None:
+                results['stub'] = {k: v for k, v in stub.stats.items() if k != 'lock'}
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=30)
+            if stub is not None:
+                stub.shutdown()
+
+        output = options['output'] or f'loadtest-{time.strftime("%Y%m%d-%H%M%S")}.json'
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        self._report(results)
+        self.stdout.write(f'Results saved to {output}')
+        if options['compare']:
+            self._compare(results, options['compare'])
+
+    def _parse_mix(self, spec):
+        mix = {}
+        for part in spec.split(','):
+            name, _, weight = part.strip().partition('=')
+            if name not in SCENARIOS:
+                raise CommandError(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}')
+            try:
+                mix[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f'Invalid weight for {name}: {weight!r}')
+        return {name: weight for name, weight in mix.items() if weight > 0}
+
+    def _spawn(self, options):
+        try:
+            parse_latency(options['stub_latency'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        stub, stub_url = start_stub_server(
+            latency=options['stub_latency'],
+            error_rate=options['stub_error_rate'],
+            timeout_rate=options['stub_timeout_rate'],
+        )
+        port = _free_port()
+        env = dict(
+            os.environ,
+            TU_API_URL=f'{stub_url}/api/v1/auth/Ad/verify',
+            TU_PROFILE_API_URL=f'{stub_url}/api/v2/profile/std/info/',
+            TU_API_KEY='TU-loadtest',
+            GUNICORN_WORKER_CLASS=options['worker_class'],
+            GUNICORN_WORKERS=str(options['workers']),
+            GUNICORN_THREADS=str(options['threads']),
+            GUNICORN_BIND=f'127.0.0.1:{port}',
+            GUNICORN_LOG_LEVEL='warning',
+            GUNICORN_ACCESS_LOG='',
+        )
+        if options['worker_class'] == 'uvicorn':
+            # Let TU verifications share the event loop
+            env['ASYNC_LOGIN'] = 'True'
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')]
+        proc = subprocess.Popen(cmd, env=env, cwd=settings.BASE_DIR)
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                stub.shutdown()
+                raise CommandError(f'gunicorn exited with code {proc.returncode}')
+            try:
+                requests.get(f'{base_url}/test/ping/', timeout=1)
+                break
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.stdout.write(
+            f'gunicorn ({options["workers"]} {options["worker_class"]} workers) on {base_url}, '
+            f'TU stub on {stub_url} ({options["stub_latency"]})'
+        )
+        return stub, proc, base_url
+
+    def _check_up(self, base_url):
+        try:
+            requests.get(f'{base_url}/test/ping/', timeout=5).raise_for_status()
+        except requests.RequestException as e:
+            raise CommandError(f'{base_url} is not answering: {e}')
+
+    def _setup_users(self, options):
+        users = [VirtualUser(f'69{i:08d}', options['base_url'], options['timeout']) for i in range(options['users'])]
+
+        def login(user):
+            # Retried: the stub may be configured to fail some TU calls
+            for _ in range(5):
+                error = user.login()
+                if error is None:
+                    return None
+            return error
+
+        with ThreadPoolExecutor(max_workers=min(16, len(users))) as pool:
+            errors = [e for e in pool.map(login, users) if e]
+        if errors:
+            raise CommandError(f'{len(errors)} of {len(users)} setup logins failed, e.g. {errors[0]}')
+        return users
+
+    def _setup_fixtures(self, users):
+        now = timezone.now()
+        course = Course.objects.create(
+            name='Load test', code=f'LT{int(time.time()) % 10 ** 8}', term='loadtest', year=now.year,
+        )
+        window = {'available_from': now - timedelta(days=1), 'due_date': now + timedelta(days=1), 'total_points': 10}
+        text = Assignment.objects.create(course=course, name='Load test text', submission_type='text', **window)
+        upload = Assignment.objects.create(course=course, name='Load test file', submission_type='file', **window)
+        students = User.objects.filter(username__in=[user.username for user in users])
+        Enrollment.objects.bulk_create([Enrollment(student=student, course=course) for student in students])
+        return course, {'submit_text': text.pk, 'submit_file': upload.pk}
+
+    def _run(self, mix, options):
+        self.stdout.write(f'Logging in {options["users"]} virtual users...')
+        users = self._setup_users(options)
+        course = assignments = None
+        if any(name in SUBMISSION_SCENARIOS for name in mix):
+            course, assignments = self._setup_fixtures(users)
+        try:
+            samples, elapsed = self._drive(mix, users, assignments, options)
+        finally:
+            if course is not None and not options['keep']:
+                course.delete()
+            if not options['keep']:
+                User.objects.filter(username__in=[user.username for user in users]).delete()
+
+        return {
+            'meta': {
+                'label': options['label'],
+                'started_at': timezone.now().isoformat(),
+                'git_commit': self._git_commit(),
+                'base_url': options['base_url'],
+                'target_rps': options['rps'],
+                'duration': options['duration'],
+                'users': options['users'],
+                'concurrency': options['concurrency'],
+                'mix': mix,
+                'spawn': {
+                    'worker_class': options['worker_class'],
+                    'workers': options['workers'], 'threads': options['threads'],
+                    'stub_latency': options['stub_latency'], 'stub_error_rate': options['stub_error_rate'],
+                    'stub_timeout_rate': options['stub_timeout_rate'],
+                } if options['spawn'] else None,
+            },
+            'total': summarize([s for per in samples.values() for s in per], elapsed),
+            'scenarios': {name: summarize(per, elapsed) for name, per in samples.items()},
+        }
+
+    def _drive(self, mix, users, assignments, options):
+        """
+        Fire requests on a fixed schedule (open loop) for the duration;
+        latency is measured from the scheduled start, so time spent
+        waiting for a free client thread counts too
+        """
+        rng = random.Random(options['seed'])
+        names, weights = list(mix), list(mix.values())
+        idle = queue.Queue()
+        for user in users:
+            idle.put(user)
+        samples = {name: [] for name in names}
+        lock = threading.Lock()
+        upload = b'%PDF-1.4\n' + os.urandom(16 * 1024)
+
+        def fire(name, scheduled):
+            user = idle.get()
+            try:
+                if name == 'login':
+                    # A fresh browser session logging in as this user
+                    error = VirtualUser(user.username, user.base_url, user.timeout).login()
+                elif name == 'home':
+                    error = user.get('/')
+                elif name == 'profile':
+                    error = user.get('/profile/')
+                elif name == 'submit_text':
+                    error = user.post_submission(
+                        assignments[name], data={'text_content': f'Load test answer {scheduled}'},
+                    )
+                else:
+                    error = user.post_submission(
+                        assignments[name], files={'file': ('answer.pdf', upload, 'application/pdf')},
+                    )
+            except requests.Timeout:
+                error = 'timeout'
+            except requests.RequestException as e:
+                error = type(e).__name__
+            finally:
+                idle.put(user)
+            with lock:
+                samples[name].append((time.perf_counter() - scheduled, error))
+
+        interval = 1 / options['rps']
+        total = int(options['duration'] * options['rps'])
+        self.stdout.write(f'{total} requests at {options["rps"]:g}/s over {options["duration"]:g}s, mix {mix}')
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for i in range(total):
+                scheduled = started + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(fire, rng.choices(names, weights)[0], scheduled)
+        return samples, time.perf_counter() - started
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def _report(self, results):
+        self.stdout.write(f'{"scenario":<12} {"reqs":>6} {"rps":>7} {"p50":>8} {"p95":>8} {"p99":>8} {"errors":>7}')
+        rows = list(results['scenarios'].items()) + [('total', results['total'])]
+        for name, row in rows:
+            self.stdout.write(
+                f'{name:<12} {row["requests"]:>6} {row["rps"]:>7} {row["p50_ms"] or 0:>6.1f}ms '
+                f'{row["p95_ms"] or 0:>6.1f}ms {row["p99_ms"] or 0:>6.1f}ms {row["errors"]:>7}'
+            )
+            if row['error_kinds']:
+                self.stdout.write(f'{"":<12} {row["error_kinds"]}')
+
+    def _compare(self, results, path):
+        with open(path) as f:
+            before = json.load(f)
+        self.stdout.write(f'Compared with {path} ({before["meta"].get("git_commit") or "unknown commit"}):')
+        for name, row in list(results['scenarios'].items()) + [('total', results['total'])]:
+            old = before['total'] if name == 'total' else before['scenarios'].get(name)
+            if not old:
+                continue
+            deltas = []
+            for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+                if row[key] is not None and old.get(key):
+                    deltas.append(f'{key[:3]} {(row[key] - old[key]) / old[key]:+.0%}')
+            deltas.append(f'errors {old["errors"]} -> {row["errors"]}')
+            self.stdout.write(f'  {name:<12} ' + ', '.join(deltas))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.tu_stub import parse_latency, start_stub_server
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the TU API stub (Ad/verify and v2/profile/std/info) in the foreground, with simulated '
+        'latency, errors and timeouts. Point the app at it with '
+        'TU_API_URL=http://HOST:PORT/api/v1/auth/Ad/verify and '
+        'TU_PROFILE_API_URL=http://HOST:PORT/api/v2/profile/std/info/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8900)
+        parser.add_argument('--latency', default='0',
+                            help='Seconds, or uniform:LOW,HIGH / normal:MEAN,SD / exp:MEAN / lognormal:MEDIAN,SIGMA')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered 500/503')
+        parser.add_argument('--timeout-rate', type=float, default=0.0, help='Share of requests left hanging')
+        parser.add_argument('--hang', type=float, default=30.0, help='Seconds a hanging request is held')
+
+    def handle(self, *args, **options):
+        try:
+            parse_latency(options['latency'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        server, base_url = start_stub_server(
+            host=options['host'], port=options['port'], latency=options['latency'],
+            error_rate=options['error_rate'], timeout_rate=options['timeout_rate'], hang=options['hang'],
+        )
+        self.stdout.write(f'TU stub on {base_url} (latency {options["latency"]}, '
+                          f'errors {options["error_rate"]:.1%}, timeouts {options["timeout_rate"]:.1%}); Ctrl-C to stop')
+        try:
+            while True:
+                time.sleep(10)
+                stats = server.stats
+                self.stdout.write(f'ok {stats["ok"]}, errors {stats["errors"]}, timeouts {stats["timeouts"]}')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
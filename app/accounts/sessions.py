@@ -0,0 +1,42 @@
+"""
+Session engine (SESSION_ENGINE = 'accounts.sessions'): Django's cache
+backend on Redis with a per-process LRU in front of it.
+
+Sessions read within AUTH_LOCAL_CACHE_TTL seconds of the last read or
+write in this process are served from memory without a Redis GET. Saves
+and deletes go to Redis as before and update this process's copy; other
+processes notice within the TTL.
+"""
+
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+
+from ams.local_cache import LocalTTLCache
+
+_local = LocalTTLCache(
+    maxsize=getattr(settings, 'AUTH_LOCAL_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_LOCAL_CACHE_TTL', 5),
+)
+
+
+class SessionStore(CacheSessionStore):
+    def load(self):
+        if self.session_key is not None:
+            data = _local.get(self.session_key)
+            if data is not None:
+                # A copy: the request may change its session
+                return dict(data)
+        data = super().load()
+        if self.session_key is not None and data:
+            _local.set(self.session_key, dict(data))
+        return data
+
+    def save(self, must_create=False):
+        super().save(must_create=must_create)
+        _local.set(self.session_key, dict(self._get_session(no_load=must_create)))
+
+    def delete(self, session_key=None):
+        key = session_key if session_key is not None else self.session_key
+        super().delete(session_key)
+        if key is not None:
+            _local.delete(key)
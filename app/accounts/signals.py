@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import UserProfile
+from .user_cache import invalidate_user
+
+
+def _invalidate(user_id):
+    invalidate_user(user_id)
+    # Again once committed, in case a concurrent request cached the old row meanwhile
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    _invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    _invalidate(instance.user_id)
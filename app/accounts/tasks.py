@@ -0,0 +1,71 @@
+import logging
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError
+from ams.celery import enqueue
+from .tu_api import TUServiceUnavailable, create_or_update_user, enrich_user, get_tu_api, student_info_to_user_data
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+SYNC_KEY_PREFIX = 'tu_profile_sync'
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, retry_jitter=True, max_retries=5)
+def update_user_profile(tu_user_data):
+    """
+    Save the TU data of a login to the user and profile (only the changed
+    columns are written, so running it twice is harmless)
+    """
+    create_or_update_user(tu_user_data)
+
+
+@shared_task(
+    autoretry_for=(TUServiceUnavailable, OperationalError),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    retry_jitter=True,
+    max_retries=5,
+)
+def sync_student_profile(tu_id):
+    """
+    Enrich a student's profile from the TU student info API
+    """
+    user_data = student_info_to_user_data(get_tu_api().get_student_info(tu_id))
+    if not user_data:
+        logger.info("No student info for %s; profile left as is", tu_id)
+        return None
+    changed = enrich_user(user_data)
+    if changed:
+        logger.info("Updated %s for %s from student info", changed, tu_id)
+    return changed
+
+
+def queue_user_update(tu_user_data):
+    """
+    Save login data in the background; inline if the broker is down
+    """
+    enqueue(update_user_profile, tu_user_data)
+
+
+def queue_profile_sync(user):
+    """
+    Queue a student info sync for a student, at most once per
+    TU_PROFILE_SYNC_INTERVAL; skipped (not run inline) if the broker is down
+    """
+    profile = getattr(user, 'profile', None)
+    if profile is None or profile.user_type != 'student':
+        return
+
+    key = f"{SYNC_KEY_PREFIX}:{user.username}"
+    try:
+        if not cache.add(key, 1, getattr(settings, 'TU_PROFILE_SYNC_INTERVAL', 24 * 60 * 60)):
+            return
+    except Exception as e:
+        logger.warning("Profile sync throttle unavailable: %s", e)
+        return
+
+    if enqueue(sync_student_profile, user.username, run_inline=False) is None:
+        # Try again on the next login
+        cache.delete(key)
@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import UserProfile
+from .tu_api import create_or_update_user
+
+TU_USER_DATA = {
+    'username': '6401234567',
+    'type': 'student',
+    'email': '6401234567@dome.tu.ac.th',
+    'displayname_th': 'สมชาย ใจดี',
+    'displayname_en': 'Somchai Jaidee',
+    'faculty': 'Engineering',
+    'department': 'Computer Engineering',
+    'organization': 'Thammasat University',
+}
+
+
+class CreateOrUpdateUserTests(TestCase):
+    def capture(self, tu_user_data):
+        """
+        Run create_or_update_user and return its SQL, without the
+        transaction's savepoints
+        """
+        with CaptureQueriesContext(connection) as queries:
+            create_or_update_user(tu_user_data)
+        return [q['sql'] for q in queries if 'SAVEPOINT' not in q['sql'].upper()]
+
+    def test_new_user_creates_user_and_profile(self):
+        user = create_or_update_user(TU_USER_DATA)
+
+        user = User.objects.select_related('profile').get(pk=user.pk)
+        self.assertEqual(user.email, TU_USER_DATA['email'])
+        self.assertEqual(user.first_name, 'สมชาย')
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(user.profile.tu_id, TU_USER_DATA['username'])
+        self.assertEqual(user.profile.user_type, 'student')
+
+    def test_unchanged_login_only_reads(self):
+        create_or_update_user(TU_USER_DATA)
+
+        queries = self.capture(dict(TU_USER_DATA))
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0].lstrip().upper().startswith('SELECT'), queries[0])
+
+    def test_changed_login_writes_only_changed_columns(self):
+        create_or_update_user(TU_USER_DATA)
+
+        queries = self.capture(dict(TU_USER_DATA, email='somchai@tu.ac.th', department='Electrical Engineering'))
+
+        writes = [sql for sql in queries if not sql.lstrip().upper().startswith('SELECT')]
+        self.assertEqual(len(writes), 2, writes)
+        user_update, profile_update = writes
+        self.assertIn(User._meta.db_table, user_update)
+        self.assertIn('"email"', user_update)
+        for column in ('first_name', 'last_name', 'password', 'last_login'):
+            self.assertNotIn(f'"{column}"', user_update)
+        self.assertIn(UserProfile._meta.db_table, profile_update)
+        self.assertIn('"department"', profile_update)
+        for column in ('faculty', 'organization', 'tu_id', 'user_type'):
+            self.assertNotIn(f'"{column}"', profile_update)
+
+        user = User.objects.select_related('profile').get(username=TU_USER_DATA['username'])
+        self.assertEqual(user.email, 'somchai@tu.ac.th')
+        self.assertEqual(user.profile.department, 'Electrical Engineering')
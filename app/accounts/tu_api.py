@@ -1,43 +1,309 @@
 import os
 import json
+import time
+import asyncio
 import logging
-import requests
+import sys
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from http.cookiejar import DefaultCookiePolicy
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from ams.metrics import track_upstream
 from .models import UserProfile
 
+# requests and httpx are imported when the first client is built, so workers
+# that never call the TU API don't pay for them (ams.preload imports them in
+# the gunicorn master instead)
+
 # Set up logger
 logger = logging.getLogger(__name__)
+# Verbose per-call upstream traces (headers, bodies); sampled in production
+trace_logger = logging.getLogger(f'{__name__}.trace')
+
+# Process-wide HTTP session and client, created lazily on first use
+_session = None
+_client = None
+_lock = threading.RLock()
+# One async client per event loop (see get_async_tu_api)
+_async_clients = weakref.WeakKeyDictionary()
+# Cap on concurrent upstream calls from this process (see _upstream_call)
+_in_flight = None
+
+
+class TUServiceUnavailable(Exception):
+    """
+    Raised instead of calling the TU API when the circuit breaker is open or
+    this process already has too many upstream calls in flight
+    """
+    pass
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for the TU API
+    
+    State lives in CACHES['default'] (Redis) so every worker process sees the
+    same circuit: after `failure_threshold` consecutive errors or timeouts the
+    circuit opens and calls fail fast; once `recovery_timeout` has passed a
+    single probe request is let through (half-open), and its outcome either
+    closes the circuit or re-opens it. If the cache itself is unreachable the
+    breaker stays closed rather than blocking logins.
+    
+    The a-prefixed methods are for the async client: the cache calls block,
+    so they run in a worker thread instead of on the event loop.
+    """
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30, probe_timeout=15):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe_timeout = probe_timeout
+        self.failures_key = f"tu_circuit:{name}:failures"
+        self.opened_key = f"tu_circuit:{name}:opened_at"
+        self.probe_key = f"tu_circuit:{name}:probe"
+    
+    def allow_request(self):
+        """
+        Whether a call may go upstream now
+        """
+        try:
+            opened_at = cache.get(self.opened_key)
+            if opened_at is None:
+                return True
+            if time.time() - opened_at < self.recovery_timeout:
+                return False
+            # Half-open: only the worker that wins the probe slot goes through
+            return cache.add(self.probe_key, 1, self.probe_timeout)
+        except Exception as e:
+            logger.warning("Circuit breaker state unavailable: %s", e)
+            return True
+    
+    def record_success(self):
+        try:
+            if cache.get(self.failures_key):
+                cache.delete_many([self.failures_key, self.opened_key, self.probe_key])
+                logger.info("TU API circuit closed")
+        except Exception as e:
+            logger.warning("Circuit breaker state unavailable: %s", e)
+    
+    def record_failure(self):
+        try:
+            cache.add(self.failures_key, 0, None)
+            failures = cache.incr(self.failures_key)
+            if failures >= self.failure_threshold:
+                # (Re-)open: also covers a failed half-open probe
+                cache.set(self.opened_key, time.time(), None)
+                cache.delete(self.probe_key)
+                logger.warning("TU API circuit open after %s consecutive failures", failures)
+        except Exception as e:
+            logger.warning("Circuit breaker state unavailable: %s", e)
+    
+    async def aallow_request(self):
+        return await sync_to_async(self.allow_request, thread_sensitive=False)()
+    
+    async def arecord_success(self):
+        await sync_to_async(self.record_success, thread_sensitive=False)()
+    
+    async def arecord_failure(self):
+        await sync_to_async(self.record_failure, thread_sensitive=False)()
+    
+    def state(self):
+        """
+        Current state: 'closed', 'open' or 'half-open'
+        """
+        opened_at = cache.get(self.opened_key)
+        if opened_at is None:
+            return 'closed'
+        if time.time() - opened_at < self.recovery_timeout:
+            return 'open'
+        return 'half-open'
+
+
+def get_circuit_breaker():
+    """
+    Return the circuit breaker guarding the TU API, configured from settings
+    """
+    return CircuitBreaker(
+        'tu_api',
+        failure_threshold=getattr(settings, 'TU_CIRCUIT_FAILURE_THRESHOLD', 5),
+        recovery_timeout=getattr(settings, 'TU_CIRCUIT_RECOVERY_TIMEOUT', 30),
+        probe_timeout=getattr(settings, 'TU_API_CONNECT_TIMEOUT', 3.05) + getattr(settings, 'TU_API_READ_TIMEOUT', 10),
+    )
+
+
+def _get_in_flight_semaphore():
+    global _in_flight
+    if _in_flight is None:
+        with _lock:
+            if _in_flight is None:
+                _in_flight = threading.BoundedSemaphore(getattr(settings, 'TU_API_MAX_IN_FLIGHT', 50))
+    return _in_flight
+
+
+def _is_transport_error(exc):
+    """
+    Whether exc is a requests/httpx transport error or timeout (without
+    importing either library just to check)
+    """
+    requests = sys.modules.get('requests')
+    httpx = sys.modules.get('httpx')
+    return (
+        (requests is not None and isinstance(exc, requests.RequestException))
+        or (httpx is not None and isinstance(exc, httpx.HTTPError))
+    )
+
+
+def _build_session():
+    """
+    Build a requests.Session with a keep-alive connection pool and retry policy
+    for the Thammasat API, sized from settings
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    pool_size = getattr(settings, 'TU_API_POOL_SIZE', 10)
+    retry = Retry(
+        total=getattr(settings, 'TU_API_MAX_RETRIES', 2),
+        connect=getattr(settings, 'TU_API_MAX_RETRIES', 2),
+        # Never retry a read timeout: that would multiply the worst-case wait
+        read=0,
+        status=getattr(settings, 'TU_API_MAX_RETRIES', 2),
+        status_forcelist=(502, 503, 504),
+        # Ad/verify is a POST but has no side effects, so it is safe to retry
+        allowed_methods=frozenset(['GET', 'POST']),
+        backoff_factor=getattr(settings, 'TU_API_BACKOFF_FACTOR', 0.3),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # The session is shared between users, so never keep cookies from the API
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide requests.Session used for all Thammasat API calls
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_tu_api():
+    """
+    Return the process-wide ThammasatAPI client
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = ThammasatAPI()
+    return _client
+
+
+def reset_tu_api():
+    """
+    Drop the shared client and close its pooled connections (e.g. after fork
+    or when settings change)
+    """
+    global _session, _client, _in_flight
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _client = None
+        _in_flight = None
+
 
 class ThammasatAPI:
     """
     Class for interacting with Thammasat University REST API
     """
-    def __init__(self):
+    def __init__(self, session=None):
         """
         Initialize the API client with API URL and key from settings
+        
+        Args:
+            session (requests.Session): HTTP session to use; defaults to the
+                shared process-wide pooled session
+        """
+        self.session = session if session is not None else get_session()
+        self._configure()
+    
+    def _configure(self):
         """
+        Load endpoint URLs, credentials and timeouts from settings
+        """
+        self.circuit_breaker = get_circuit_breaker()
+        self.timeout = (
+            getattr(settings, 'TU_API_CONNECT_TIMEOUT', 3.05),
+            getattr(settings, 'TU_API_READ_TIMEOUT', 10),
+        )
         self.api_url = getattr(settings, 'TU_API_URL', 'https://restapi.tu.ac.th/api/v1/auth/Ad/verify')
-        self.api_key = getattr(settings, 'TU_API_KEY', 'your-api-key')
-        self.profile_api_url = 'https://restapi.tu.ac.th/api/v2/profile/std/info/'
+        self.api_key = getattr(settings, 'TU_API_KEY', None) or 'your-api-key'
+        self.profile_api_url = getattr(settings, 'TU_PROFILE_API_URL', None) or 'https://restapi.tu.ac.th/api/v2/profile/std/info/'
         
         # Set up headers with API key - using the full API key provided
-        # TU65a87311d303b5bd29ce61c0ab7a79dff942fa2d9728a86c80a02a17e38718303a18cd84f87bbc52068e9d8a6e721054
         self.headers = {
             'Application-Key': self.api_key,  # Changed from Authorization to Application-Key
             'Content-Type': 'application/json'
         }
         
         # Log the API configuration
-        logger.info(f"Initialized Thammasat API client with URL: {self.api_url}")
-        logger.debug(f"API Key length: {len(self.api_key) if self.api_key else 'None'}")
-        logger.debug(f"Headers: {self.headers}")
+        logger.info("Initialized Thammasat API client with URL: %s", self.api_url)
+        logger.debug("API Key length: %s, header names: %s", len(self.api_key), list(self.headers))
         
         # Warn if API key doesn't start with TU prefix
         if not self.api_key.startswith('TU'):
             logger.warning("API Key does not start with 'TU' prefix, which may be required by Thammasat API")
             
+    @contextmanager
+    def _upstream_call(self, operation):
+        """
+        Guard one TU API request: fail fast if the circuit is open or the
+        process is at its in-flight cap, count transport errors and
+        timeouts as circuit failures, and time the call (ams.metrics)
+        """
+        if not self.circuit_breaker.allow_request():
+            logger.warning("TU API circuit is open; failing fast")
+            raise TUServiceUnavailable("Thammasat API circuit is open")
+        
+        semaphore = _get_in_flight_semaphore()
+        if not semaphore.acquire(blocking=False):
+            logger.warning("Too many in-flight TU API calls; rejecting request")
+            raise TUServiceUnavailable("Too many concurrent Thammasat API calls")
+        try:
+            with track_upstream(operation):
+                yield
+        except Exception as e:
+            if _is_transport_error(e):
+                self.circuit_breaker.record_failure()
+            raise
+        finally:
+            semaphore.release()
+    
+    def _record_outcome(self, response):
+        """
+        Feed an upstream response into the circuit breaker; only 5xx count as
+        failures, a rejected password is a healthy answer
+        """
+        if response.status_code >= 500:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+    
     def get_student_info(self, student_id):
         """
         Get student profile information from Thammasat API v2
@@ -51,86 +317,104 @@ class ThammasatAPI:
         try:
             # Construct the URL with query parameter
             endpoint = f"{self.profile_api_url}?id={student_id}"
-            logger.info(f"Getting student info for ID {student_id} from {endpoint}")
+            trace_logger.debug("Getting student info for ID %s from %s", student_id, endpoint)
             
             # Make the API request
-            logger.debug(f"Sending GET request to {endpoint}")
-            response = requests.get(endpoint, headers=self.headers)
-            
-            # Log response details
-            logger.debug(f"Response status code: {response.status_code}")
-            logger.debug(f"Response headers: {response.headers}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Successfully retrieved student info for ID {student_id}")
-                return data
-            else:
-                logger.warning(f"Failed to get student info for ID {student_id}. Status code: {response.status_code}")
-                if response.content:
-                    try:
-                        error_data = response.json()
-                        logger.warning(f"Error response: {error_data}")
-                    except json.JSONDecodeError:
-                        logger.warning(f"Non-JSON error response: {response.content}")
-                return None
+            trace_logger.debug("Sending GET request to %s", endpoint)
+            with self._upstream_call('student_info'):
+                response = self.session.get(endpoint, headers=self.headers, timeout=self.timeout)
+            self._record_outcome(response)
+            return self._handle_student_info_response(student_id, response)
                 
+        except TUServiceUnavailable:
+            raise
         except Exception as e:
-            logger.error(f"Error getting student info: {str(e)}")
+            logger.error("Error getting student info: %s", e)
+            return None
+    
+    def _handle_student_info_response(self, student_id, response):
+        """
+        Turn a profile API response (requests or httpx) into student data or None
+        """
+        # Log response details
+        trace_logger.debug("Response status code: %s, headers: %s", response.status_code, response.headers)
+        
+        if response.status_code == 200:
+            data = response.json()
+            logger.info("Successfully retrieved student info for ID %s", student_id)
+            return data
+        else:
+            logger.warning("Failed to get student info for ID %s. Status code: %s", student_id, response.status_code)
+            if response.content:
+                try:
+                    error_data = response.json()
+                    logger.warning("Error response: %s", error_data)
+                except json.JSONDecodeError:
+                    logger.warning("Non-JSON error response: %s", response.content[:500])
             return None
     
     def authenticate_user(self, username, password):
         """
         Authenticate a user with Thammasat API
         Returns user data if authentication is successful, None otherwise
+        Raises TUServiceUnavailable if the call was shed without being attempted
         """
         try:
-            # Debug API configuration
-            logger.debug(f"TU_API_URL: {settings.TU_API_URL}")
-            logger.debug(f"API Key length: {len(settings.TU_API_KEY) if settings.TU_API_KEY else 'None'}")
-            
-            # Use the API URL directly without appending /auth
-            endpoint = self.api_url
-            logger.info(f"Authenticating user {username} with Thammasat API at {endpoint}")
-            
-            payload = {
-                'UserName': username,
-                'PassWord': password
-            }
-            
-            # Debug request headers (without showing full API key)
-            safe_headers = self.headers.copy()
-            if 'Authorization' in safe_headers:
-                auth_value = safe_headers['Authorization']
-                if auth_value.startswith('Bearer '):
-                    safe_headers['Authorization'] = f"Bearer {auth_value[7:15]}..." # Show only part of the token
-            logger.debug(f"Request headers: {safe_headers}")
+            endpoint, payload = self._prepare_auth_request(username, password)
             
             # Make the API request with timeout to prevent worker hanging
-            logger.debug(f"Sending POST request to {endpoint}")
-            response = requests.post(endpoint, json=payload, headers=self.headers, timeout=10)
-            
-            # Log response details
-            logger.debug(f"Response status code: {response.status_code}")
-            logger.debug(f"Response headers: {response.headers}")
-            logger.debug(f"Response content: {response.content}")
-            
-            if response.status_code == 200:
-                logger.info(f"Authentication successful for user {username}")
-                return response.json()
-            else:
-                logger.warning(f"Authentication failed for user {username}. Status code: {response.status_code}")
-                try:
-                    error_content = response.json()
-                    logger.warning(f"Error response: {error_content}")
-                except:
-                    logger.warning(f"Error response content: {response.text[:500]}")
-                return None
+            trace_logger.debug("Sending POST request to %s", endpoint)
+            with self._upstream_call('authenticate'):
+                response = self.session.post(endpoint, json=payload, headers=self.headers, timeout=self.timeout)
+            self._record_outcome(response)
+            return self._handle_auth_response(username, response)
+        except TUServiceUnavailable:
+            raise
         except Exception as e:
-            logger.error(f"Authentication error: {str(e)}", exc_info=True)
+            logger.error("Authentication error: %s", e, exc_info=True)
+            return None
+    
+    def _prepare_auth_request(self, username, password):
+        """
+        Build the Ad/verify endpoint and payload for a login attempt
+        """
+        # Use the API URL directly without appending /auth
+        endpoint = self.api_url
+        trace_logger.debug("Authenticating user %s with Thammasat API at %s", username, endpoint)
+        
+        payload = {
+            'UserName': username,
+            'PassWord': password
+        }
+        
+        # Header names only: the values carry the Application-Key
+        trace_logger.debug("Request header names: %s", list(self.headers))
+        return endpoint, payload
+    
+    def _handle_auth_response(self, username, response):
+        """
+        Turn an Ad/verify response (requests or httpx) into user data or None
+        """
+        # Log response details
+        trace_logger.debug(
+            "Response status code: %s, headers: %s, content: %s",
+            response.status_code, response.headers, response.content,
+        )
+        
+        if response.status_code == 200:
+            logger.info("Authentication successful for user %s", username)
+            return response.json()
+        else:
+            logger.warning("Authentication failed for user %s. Status code: %s", username, response.status_code)
+            try:
+                error_content = response.json()
+                logger.warning("Error response: %s", error_content)
+            except:
+                logger.warning("Error response content: %s", response.text[:500])
             return None
     
-    def get_user_role(self, user_data):
+    @staticmethod
+    def get_user_role(user_data):
         # Logic to determine role based on TU API response
         # This would depend on the actual structure of TU API response
         
@@ -153,9 +437,147 @@ class ThammasatAPI:
         # Default role if type not specified or recognized
         return 'student'
 
-def create_or_update_user(tu_user_data):
+class AsyncThammasatAPI(ThammasatAPI):
     """
-    Create or update Django User and UserProfile based on Thammasat API data
+    asyncio variant of ThammasatAPI for the ASGI login path, backed by a
+    pooled httpx.AsyncClient so in-flight TU calls don't hold a thread
+    """
+    def __init__(self, client=None):
+        """
+        Initialize the API client with API URL and key from settings
+        
+        Args:
+            client (httpx.AsyncClient): HTTP client to use; defaults to a new
+                pooled client
+        """
+        self.client = client if client is not None else _build_async_client()
+        self._configure()
+    
+    @asynccontextmanager
+    async def _upstream_call(self, operation):
+        """
+        Async ThammasatAPI._upstream_call: the circuit breaker's cache calls
+        run off the event loop
+        """
+        if not await self.circuit_breaker.aallow_request():
+            logger.warning("TU API circuit is open; failing fast")
+            raise TUServiceUnavailable("Thammasat API circuit is open")
+        
+        semaphore = _get_in_flight_semaphore()
+        if not semaphore.acquire(blocking=False):
+            logger.warning("Too many in-flight TU API calls; rejecting request")
+            raise TUServiceUnavailable("Too many concurrent Thammasat API calls")
+        try:
+            with track_upstream(operation):
+                yield
+        except Exception as e:
+            if _is_transport_error(e):
+                await self.circuit_breaker.arecord_failure()
+            raise
+        finally:
+            semaphore.release()
+    
+    async def _record_outcome(self, response):
+        if response.status_code >= 500:
+            await self.circuit_breaker.arecord_failure()
+        else:
+            await self.circuit_breaker.arecord_success()
+    
+    async def get_student_info(self, student_id):
+        """
+        Get student profile information from Thammasat API v2
+        
+        Returns:
+            dict: Student profile data if successful, None otherwise
+        """
+        try:
+            endpoint = f"{self.profile_api_url}?id={student_id}"
+            trace_logger.debug("Getting student info for ID %s from %s", student_id, endpoint)
+            
+            async with self._upstream_call('student_info'):
+                response = await self.client.get(endpoint, headers=self.headers)
+            await self._record_outcome(response)
+            return self._handle_student_info_response(student_id, response)
+        except TUServiceUnavailable:
+            raise
+        except Exception as e:
+            logger.error("Error getting student info: %s", e)
+            return None
+    
+    async def authenticate_user(self, username, password):
+        """
+        Authenticate a user with Thammasat API
+        Returns user data if authentication is successful, None otherwise
+        Raises TUServiceUnavailable if the call was shed without being attempted
+        """
+        try:
+            endpoint, payload = self._prepare_auth_request(username, password)
+            
+            trace_logger.debug("Sending async POST request to %s", endpoint)
+            async with self._upstream_call('authenticate'):
+                response = await self.client.post(endpoint, json=payload, headers=self.headers)
+            await self._record_outcome(response)
+            return self._handle_auth_response(username, response)
+        except TUServiceUnavailable:
+            raise
+        except Exception as e:
+            logger.error("Authentication error: %s", e, exc_info=True)
+            return None
+
+
+def _build_async_client():
+    """
+    Build an httpx.AsyncClient with the same timeouts and pool settings as
+    the sync session
+    """
+    import httpx
+    
+    timeout = httpx.Timeout(
+        getattr(settings, 'TU_API_READ_TIMEOUT', 10),
+        connect=getattr(settings, 'TU_API_CONNECT_TIMEOUT', 3.05),
+    )
+    limits = httpx.Limits(
+        max_connections=getattr(settings, 'TU_API_ASYNC_POOL_SIZE', 100),
+        max_keepalive_connections=getattr(settings, 'TU_API_POOL_SIZE', 10),
+    )
+    # httpx transports only retry failed connects, matching read=0 on the sync side
+    transport = httpx.AsyncHTTPTransport(retries=getattr(settings, 'TU_API_MAX_RETRIES', 2), limits=limits)
+    return httpx.AsyncClient(timeout=timeout, transport=transport)
+
+
+def get_async_tu_api():
+    """
+    Return the AsyncThammasatAPI client shared by the running event loop
+    
+    httpx clients are bound to the loop they were first used on, so keep one
+    per loop rather than one per process.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncThammasatAPI()
+    return client
+
+def apply_changes(instance, values):
+    """
+    Set the given field values on a model instance
+    
+    Returns:
+        list: Names of the fields whose value actually changed
+    """
+    changed = []
+    for field, value in values.items():
+        if getattr(instance, field) != value:
+            setattr(instance, field, value)
+            changed.append(field)
+    return changed
+
+def extract_user_fields(tu_user_data):
+    """
+    Map Thammasat API user data onto Django model fields
+    
+    Returns:
+        tuple: (username, User field values, UserProfile field values)
     """
     if not tu_user_data:
         raise ValidationError("Invalid user data from Thammasat API")
@@ -191,45 +613,143 @@ def create_or_update_user(tu_user_data):
         first_name = ''
         last_name = ''
     
-    # Get or create Django User
-    try:
-        user = User.objects.get(username=username)
-        # Update existing user
-        user.email = email
-        user.first_name = first_name
-        user.last_name = last_name
-        user.save()
-    except User.DoesNotExist:
-        # Create new user with unusable password (auth is via TU API)
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            first_name=first_name,
-            last_name=last_name
-        )
-        user.set_unusable_password()
-        user.save()
-    
-    # Get or create UserProfile
-    try:
-        profile = UserProfile.objects.get(user=user)
-    except UserProfile.DoesNotExist:
-        profile = UserProfile(user=user)
+    user_values = {
+        'email': email,
+        'first_name': first_name,
+        'last_name': last_name,
+    }
     
-    # Update profile with TU data
-    profile.tu_id = tu_id
-    profile.faculty = tu_user_data.get('faculty', '')
-    profile.department = tu_user_data.get('department', '')
-    profile.organization = tu_user_data.get('organization', '')
-    profile.displayname_th = tu_user_data.get('displayname_th', '')
-    profile.displayname_en = tu_user_data.get('displayname_en', '')
+    profile_values = {
+        'tu_id': tu_id,
+        'faculty': tu_user_data.get('faculty', ''),
+        'department': tu_user_data.get('department', ''),
+        'organization': tu_user_data.get('organization', ''),
+        'displayname_th': tu_user_data.get('displayname_th', ''),
+        'displayname_en': tu_user_data.get('displayname_en', ''),
+    }
     
     # Determine role
-    tu_api = ThammasatAPI()
-    role = tu_api.get_user_role(tu_user_data)
+    role = ThammasatAPI.get_user_role(tu_user_data)
     if role:
-        profile.user_type = role
+        profile_values['user_type'] = role
     
-    profile.save()
+    return username, user_values, profile_values
+
+def student_info_to_user_data(student_info):
+    """
+    Convert a v2/profile/std/info response into the Ad/verify shape used by
+    create_or_update_user and the roster import
+    """
+    data = (student_info or {}).get('data') or {}
+    username = data.get('userName')
+    if not username:
+        return None
+    return {
+        'type': 'student',
+        'username': username,
+        'email': data.get('email') or '',
+        'displayname_th': data.get('displayname_th') or '',
+        'displayname_en': data.get('displayname_en') or '',
+        'faculty': data.get('faculty') or '',
+        'department': data.get('department') or '',
+    }
+
+def create_or_update_user(tu_user_data):
+    """
+    Create or update Django User and UserProfile based on Thammasat API data
+    """
+    username, user_values, profile_values = extract_user_fields(tu_user_data)
+    
+    with transaction.atomic():
+        # Fetch the user and profile in a single query
+        user = User.objects.select_related('profile').filter(username=username).first()
+        created = user is None
+        
+        if created:
+            # Create new user with unusable password (auth is via TU API)
+            user = User.objects.create_user(
+                username=username,
+                password=None,
+                **user_values
+            )
+        else:
+            # Update existing user, writing only the columns that changed
+            changed = apply_changes(user, user_values)
+            if changed:
+                user.save(update_fields=changed)
+        
+        # Get or create UserProfile (a freshly created user cannot have one yet)
+        profile = None
+        if not created:
+            try:
+                profile = user.profile
+            except UserProfile.DoesNotExist:
+                pass
+        
+        if profile is None:
+            profile = UserProfile(user=user, **profile_values)
+            profile.save()
+        else:
+            changed = apply_changes(profile, profile_values)
+            if changed:
+                profile.save(update_fields=changed)
     
     return user
+
+def get_user_for_login(tu_user_data):
+    """
+    Look up the user for a successful TU login, leaving the profile update
+    for later
+    
+    New users are created straight away. For existing users the TU data is
+    only applied to the loaded instances, so this request sees it without
+    writing anything; save it with create_or_update_user in the background.
+    
+    Returns:
+        tuple: (User, bool whether the stored user/profile are out of date)
+    """
+    username, user_values, profile_values = extract_user_fields(tu_user_data)
+    user = User.objects.select_related('profile').filter(username=username).first()
+    if user is None:
+        return create_or_update_user(tu_user_data), False
+    
+    stale = bool(apply_changes(user, user_values))
+    try:
+        stale = bool(apply_changes(user.profile, profile_values)) or stale
+    except UserProfile.DoesNotExist:
+        stale = True
+    return user, stale
+
+def enrich_user(tu_user_data):
+    """
+    Fill in an existing user's details from another TU source (such as the
+    student info API) without blanking fields it leaves empty or changing
+    the user's role
+    
+    Returns:
+        list: Names of the fields that changed, or None if there is no such user
+    """
+    username, user_values, profile_values = extract_user_fields(tu_user_data)
+    user_values = {field: value for field, value in user_values.items() if value}
+    profile_values = {
+        field: value for field, value in profile_values.items() if value and field != 'user_type'
+    }
+    
+    with transaction.atomic():
+        user = User.objects.select_related('profile').filter(username=username).first()
+        if user is None:
+            return None
+        
+        changed = apply_changes(user, user_values)
+        if changed:
+            user.save(update_fields=changed)
+        
+        try:
+            profile = user.profile
+        except UserProfile.DoesNotExist:
+            return changed
+        profile_changed = apply_changes(profile, profile_values)
+        if profile_changed:
+            profile.save(update_fields=profile_changed)
+    
+    return changed + profile_changed
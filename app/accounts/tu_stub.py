@@ -0,0 +1,199 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def fake_user_data(username):
+    """
+    Build an Ad/verify style response for the given username
+    """
+    return {
+        'status': True,
+        'message': 'Success',
+        'type': 'student',
+        'username': username,
+        'tu_status': 'ปกติ',
+        'statusid': '10',
+        'displayname_th': f'นักศึกษา {username}',
+        'displayname_en': f'Student {username}',
+        'email': f'{username}@dome.tu.ac.th',
+        'department': 'Computer Science',
+        'faculty': 'Science and Technology',
+    }
+
+
+def fake_student_info(student_id):
+    """
+    Build a v2/profile/std/info style response for the given student ID
+    """
+    return {
+        'status': True,
+        'message': 'Success',
+        'data': {
+            'userName': student_id,
+            'prefixname': 'นาย',
+            'displayname_th': f'นักศึกษา {student_id}',
+            'displayname_en': f'Student {student_id}',
+            'email': f'{student_id}@dome.tu.ac.th',
+            'faculty': 'Science and Technology',
+            'department': 'Computer Science',
+            'studentStatusname': 'ปกติ',
+        },
+    }
+
+
+def parse_latency(spec):
+    """
+    Build a latency sampler (returning seconds) from a spec string:
+
+        0.2                     fixed (same as fixed:0.2)
+        uniform:LOW,HIGH        uniformly between LOW and HIGH
+        normal:MEAN,STDDEV      normal, clipped at 0
+        exp:MEAN                exponential
+        lognormal:MEDIAN,SIGMA  log-normal (long tail, like real upstreams)
+    """
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+    kind, _, params = str(spec).partition(':')
+    if not params:
+        kind, params = 'fixed', kind
+    try:
+        args = [float(p) for p in params.split(',')]
+        if kind == 'fixed' and len(args) == 1:
+            return lambda: args[0]
+        if kind == 'uniform' and len(args) == 2:
+            return lambda: random.uniform(*args)
+        if kind == 'normal' and len(args) == 2:
+            return lambda: max(0.0, random.gauss(*args))
+        if kind == 'exp' and len(args) == 1:
+            return lambda: random.expovariate(1 / args[0]) if args[0] > 0 else 0.0
+        if kind == 'lognormal' and len(args) == 2:
+            median, sigma = args
+            return lambda: median * random.lognormvariate(0, sigma)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec {spec!r}")
+
+
+class TUStubHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for restapi.tu.ac.th implementing Ad/verify and
+    v2/profile/std/info, for benchmarks and load tests
+
+    Each request waits for a sample of `latency`. Then an `error_rate`
+    share of requests is answered with a 500/503, and a `timeout_rate`
+    share hangs for `hang` seconds (past the client's read timeout)
+    before being dropped without an answer.
+    """
+    # HTTP/1.1 so clients can keep connections alive
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+    latency = staticmethod(lambda: 0.0)
+    error_rate = 0.0
+    timeout_rate = 0.0
+    hang = 30.0
+    stats = None
+
+    def _simulate_upstream(self):
+        """
+        Apply latency, then maybe fail; returns False if the request was
+        already answered (or dropped)
+        """
+        delay = self.latency()
+        if delay > 0:
+            time.sleep(delay)
+        roll = random.random()
+        if roll < self.timeout_rate:
+            self._count('timeouts')
+            time.sleep(self.hang)
+            self.close_connection = True
+            return False
+        if roll < self.timeout_rate + self.error_rate:
+            self._count('errors')
+            self._send_json(random.choice((500, 503)), {'status': False, 'message': 'Simulated upstream error'})
+            return False
+        self._count('ok')
+        return True
+
+    def _count(self, outcome):
+        if self.stats is not None:
+            with self.stats['lock']:
+                self.stats[outcome] += 1
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if not self._simulate_upstream():
+            return
+
+        if not urlparse(self.path).path.rstrip('/').endswith('Ad/verify'):
+            return self._send_json(404, {'status': False, 'message': 'Not found'})
+        try:
+            payload = json.loads(raw or b'{}')
+        except json.JSONDecodeError:
+            return self._send_json(400, {'status': False, 'message': 'Invalid JSON'})
+
+        username = payload.get('UserName')
+        if not username or not payload.get('PassWord'):
+            return self._send_json(400, {'status': False, 'message': 'Invalid credentials'})
+        self._send_json(200, fake_user_data(username))
+
+    def do_GET(self):
+        if not self._simulate_upstream():
+            return
+
+        url = urlparse(self.path)
+        if not url.path.rstrip('/').endswith('profile/std/info'):
+            return self._send_json(404, {'status': False, 'message': 'Not found'})
+        student_id = parse_qs(url.query).get('id', [''])[0]
+        if not student_id:
+            return self._send_json(400, {'status': False, 'message': 'Missing id'})
+        self._send_json(200, fake_student_info(student_id))
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+
+def start_stub_server(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, timeout_rate=0.0, hang=30.0):
+    """
+    Start the stub server in a daemon thread
+
+    Args:
+        latency: seconds, or a spec for parse_latency
+        error_rate: share of requests answered with a 500/503
+        timeout_rate: share of requests left hanging for `hang` seconds
+
+    Returns:
+        tuple: (server, base_url); call server.shutdown() to stop it.
+        server.stats counts the 'ok', 'errors' and 'timeouts' outcomes.
+    """
+    stats = {'lock': threading.Lock(), 'ok': 0, 'errors': 0, 'timeouts': 0}
+    handler = type('ConfiguredTUStubHandler', (TUStubHandler,), {
+        'latency': staticmethod(parse_latency(latency)),
+        'error_rate': error_rate,
+        'timeout_rate': timeout_rate,
+        'hang': hang,
+        'stats': stats,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.stats = stats
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://{server.server_address[0]}:{server.server_address[1]}'
+    return server, base_url
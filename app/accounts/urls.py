@@ -1,9 +1,10 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
     path('', views.home_view, name='home'),
-    path('login/', views.login_view, name='login'),
+    path('login/', views.login_view_async if settings.ASYNC_LOGIN else views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
     
@@ -0,0 +1,71 @@
+import logging
+import pickle
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from ams.local_cache import LocalTTLCache
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'auth_user'
+
+_local = LocalTTLCache(
+    maxsize=getattr(settings, 'AUTH_LOCAL_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_LOCAL_CACHE_TTL', 5),
+)
+
+
+def _cache_key(user_id):
+    return f"{CACHE_KEY_PREFIX}:{user_id}"
+
+
+def get_cached_user(user_id):
+    """
+    The user with their profile already loaded, for
+    ThammasatAuthBackend.get_user on every authenticated request
+
+    Looked up in this process's LRU, then Redis, then the database (one
+    query with the profile joined). The cached copy is dropped when the user
+    or profile is saved or deleted and on logout (invalidate_user); other
+    processes may serve their local copy for up to AUTH_LOCAL_CACHE_TTL
+    seconds longer. Each call returns a fresh instance, so the request can't
+    change the cached one.
+
+    Returns:
+        User or None
+    """
+    ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 300)
+    if not ttl:
+        return User.objects.filter(pk=user_id).first()
+
+    key = _cache_key(user_id)
+    data = _local.get(key)
+    if data is None:
+        try:
+            data = cache.get(key)
+        except Exception as e:
+            logger.warning("User cache unavailable: %s", e)
+        if data is None:
+            user = User.objects.select_related('profile').filter(pk=user_id).first()
+            if user is None:
+                return None
+            data = pickle.dumps(user, pickle.HIGHEST_PROTOCOL)
+            try:
+                cache.set(key, data, ttl)
+            except Exception as e:
+                logger.warning("User cache unavailable: %s", e)
+        _local.set(key, data)
+    return pickle.loads(data)
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached user+profile after a change
+    """
+    key = _cache_key(user_id)
+    _local.delete(key)
+    try:
+        cache.delete(key)
+    except Exception as e:
+        logger.warning("User cache unavailable: %s", e)
@@ -1,10 +1,19 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import aauthenticate, alogin, authenticate, login, logout
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_protect
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse, JsonResponse
 import time
+from assignments.dashboard import get_dashboard
+from .auth_cache import invalidate_cached_credentials
+from .user_cache import invalidate_user
+
+SERVICE_UNAVAILABLE_MESSAGE = (
+    'The Thammasat University login service is temporarily unavailable. '
+    'Please try again in a few minutes.'
+)
 
 @csrf_protect
 def login_view(request):
@@ -32,15 +41,57 @@ def login_view(request):
             # Redirect to the page user was trying to access, or home
             next_page = request.GET.get('next', 'home')
             return redirect(next_page)
+        elif getattr(request, 'tu_service_unavailable', False):
+            messages.error(request, SERVICE_UNAVAILABLE_MESSAGE)
+            return render(request, 'accounts/login.html', status=503)
         else:
             messages.error(request, 'Invalid credentials or unable to connect to Thammasat API')
     
     return render(request, 'accounts/login.html')
 
+@csrf_protect
+async def login_view_async(request):
+    """
+    Handle user login via Thammasat API on the ASGI event loop, so a slow TU
+    verification doesn't hold a worker thread while it waits
+    """
+    user = await request.auser()
+    if user.is_authenticated:
+        return redirect('home')  # Redirect to home if already logged in
+        
+    if request.method == 'POST':
+        username = request.POST.get('username')
+        password = request.POST.get('password')
+        
+        if not username or not password:
+            messages.error(request, 'Please provide both username and password')
+            return await sync_to_async(render)(request, 'accounts/login.html')
+            
+        # Authenticate using our custom backend's async path
+        user = await aauthenticate(request, username=username, password=password)
+        
+        if user is not None:
+            await alogin(request, user)
+            messages.success(request, f'Welcome, {user.first_name}!')
+            
+            # Redirect to the page user was trying to access, or home
+            next_page = request.GET.get('next', 'home')
+            return redirect(next_page)
+        elif getattr(request, 'tu_service_unavailable', False):
+            messages.error(request, SERVICE_UNAVAILABLE_MESSAGE)
+            return await sync_to_async(render)(request, 'accounts/login.html', status=503)
+        else:
+            messages.error(request, 'Invalid credentials or unable to connect to Thammasat API')
+    
+    return await sync_to_async(render)(request, 'accounts/login.html')
+
 def logout_view(request):
     """
     Handle user logout
     """
+    if request.user.is_authenticated:
+        invalidate_cached_credentials(request.user.username)
+        invalidate_user(request.user.pk)
     logout(request)
     messages.info(request, 'You have been logged out')
     return redirect('login')
@@ -56,7 +107,11 @@ def home_view(request):
     """
     Home page view
     """
-    return render(request, 'accounts/home.html')
+    context = {}
+    if request.user.is_authenticated:
+        # Cached per user; a constant number of queries on a miss
+        context['dashboard'] = get_dashboard(request.user)
+    return render(request, 'accounts/home.html', context)
 
 
 def test_ping(request):
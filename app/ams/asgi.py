@@ -0,0 +1,21 @@
+"""
+ASGI config for ams project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Run it with e.g. ``gunicorn ams.asgi:application -k uvicorn.workers.UvicornWorker``
+and set ``ASYNC_LOGIN=True`` so TU API verifications share the event loop.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ams.settings')
+
+application = get_asgi_application()
+
+if getattr(settings, 'PRELOAD_APP', False):
+    # Under gunicorn --preload this runs once, in the master (see ams.preload)
+    from ams.preload import warm_up
+    warm_up()
@@ -0,0 +1,55 @@
+"""
+Celery application for ams.
+
+Configuration is read from the Django settings (CELERY_* names) and tasks
+are discovered from each installed app's tasks.py module. Tasks are routed
+to one queue per workload (see CELERY_TASK_ROUTES):
+
+    auth-sync   TU profile sync after login
+    grading     gradebook refreshes after submitting and grading, similarity signatures
+    files       upload housekeeping
+    autograde   running code submissions against their test suites (CPU heavy,
+                a worker of its own: the task fans out to AUTOGRADE_WORKERS sandboxes)
+
+Run a worker for all of them with:
+
+    celery -A ams worker -Q default,auth-sync,grading,files -l info
+"""
+
+import logging
+import os
+
+from celery import Celery
+from kombu.exceptions import OperationalError
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ams.settings')
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+app = Celery('ams')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+
+def enqueue(task, *args, run_inline=True, countdown=None):
+    """
+    Queue a task, or run it in-process if the broker can't be reached
+
+    Every task queued this way is idempotent, so running it inline is only
+    slower, never wrong. Pass run_inline=False for work that is not worth
+    doing on the request path; None is returned when it was dropped. A
+    countdown (seconds) delays a queued task; one run inline runs now.
+
+    Only a failure to publish (kombu's OperationalError) falls back; any
+    other error is raised, including the task's own error when it already
+    ran eagerly (CELERY_TASK_ALWAYS_EAGER), so it never runs twice.
+    """
+    try:
+        return task.apply_async(args, countdown=countdown)
+    except OperationalError as e:
+        if not run_inline:
+            logger.warning("Could not queue %s, skipped: %s", task.name, e)
+            return None
+        logger.warning("Could not queue %s, running inline: %s", task.name, e)
+        return task.apply(args)
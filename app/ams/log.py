@@ -0,0 +1,191 @@
+"""
+Logging helpers for the production logging profile (LOG_MODE=production).
+
+Request threads only put records on an in-memory queue (BackgroundHandler);
+a QueueListener thread redacts them (RedactSecretsFilter), renders them as
+one JSON object per line (JSONFormatter) and does the write, so a slow disk
+or pipe never blocks a gthread worker. SampleFilter thins out the verbose
+TU API traces logged on 'accounts.tu_api.trace'.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# LogRecord attributes that are not `extra` fields
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_SECRET_PATTERNS = [
+    # 'Application-Key': 'TU...' in a logged dict, or Application-Key: TU... in raw headers
+    re.compile(r"""(Application-Key['"]?\s*[:=]\s*b?['"]?)[^'",}\s]+""", re.IGNORECASE),
+    re.compile(r"""(['"]?PassWord['"]?\s*[:=]\s*b?['"]?)[^'",}\s]+""", re.IGNORECASE),
+    re.compile(r"""(Authorization['"]?\s*[:=]\s*['"]?(?:Bearer\s+)?)[^'",}\s]+""", re.IGNORECASE),
+]
+REDACTED = '[REDACTED]'
+
+
+class RedactSecretsFilter(logging.Filter):
+    """
+    Mask the TU Application-Key, passwords and bearer tokens in log messages
+
+    The configured TU_API_KEY is also masked wherever it appears verbatim.
+    The record's message is rendered here, so attach this to the handler
+    that does the writing, not to a logger on the request path.
+    """
+    def __init__(self, name=''):
+        super().__init__(name)
+        self._api_key = None
+
+    def _secrets(self):
+        if self._api_key is None:
+            from django.conf import settings
+            key = getattr(settings, 'TU_API_KEY', '') or ''
+            # Don't turn every 'TU' in a message into [REDACTED]
+            self._api_key = key if len(key) >= 8 else ''
+        return self._api_key
+
+    def redact(self, text):
+        api_key = self._secrets()
+        if api_key and api_key in text:
+            text = text.replace(api_key, REDACTED)
+        for pattern in _SECRET_PATTERNS:
+            text = pattern.sub(rf'\g<1>{REDACTED}', text)
+        return text
+
+    def filter(self, record):
+        message = record.getMessage()
+        redacted = self.redact(message)
+        if redacted != message:
+            record.msg, record.args = redacted, None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.redact(logging.Formatter().formatException(record.exc_info))
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """
+    Let through only a `rate` share of records (warnings and above always
+    pass)
+    """
+    def __init__(self, rate=1.0, name=''):
+        super().__init__(name)
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, message, process and
+    thread, plus any `extra` fields and the formatted exception
+    """
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Non-blocking handler: records go on a bounded queue and a QueueListener
+    thread formats them as JSON and writes them to `filename` (stdout when
+    not given)
+
+    When the queue is full the record is dropped rather than blocking the
+    request; the number dropped is kept in `dropped`. The listener is
+    started lazily, and again in a forked child, so a handler created
+    before gunicorn forks (--preload) gets its thread in each worker.
+    """
+    def __init__(self, filename=None, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        if filename:
+            target = logging.FileHandler(filename, encoding='utf-8', delay=True)
+        else:
+            target = logging.StreamHandler(sys.stdout)
+        target.setFormatter(JSONFormatter())
+        target.addFilter(RedactSecretsFilter())
+        self.target = target
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+        self._listener_lock = threading.Lock()
+        # A thread of the parent may have held it when we forked
+        os.register_at_fork(after_in_child=self._reset_listener_lock)
+        atexit.register(self.stop)
+
+    def _reset_listener_lock(self):
+        self._listener_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        # The first records of a process can come from several threads at once
+        with self._listener_lock:
+            if self._pid == os.getpid():
+                return
+            if self.listener is not None:
+                # Forked: the parent's listener thread did not come along
+                self.queue = queue.Queue(self.queue.maxsize)
+            self.listener = QueueListener(self.queue, self.target)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Render the message now (the args may change once we return) but
+        # leave JSON formatting, redaction and tracebacks to the listener
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+
+    def stop(self):
+        """
+        Flush the queue and stop the listener thread
+        """
+        with self._listener_lock:
+            if self.listener is not None and self._pid == os.getpid():
+                self.listener.stop()
+            self.listener = None
+            self._pid = None
+        self.target.close()
+
+    def close(self):
+        self.stop()
+        super().close()
@@ -0,0 +1,191 @@
+"""
+Per-request performance metrics for ams.
+
+PerformanceMiddleware (ams.middleware) opens a RequestStats for each
+sampled request in a context variable; SQL time is collected by an
+execute wrapper installed on every new DB connection, cache hits and
+misses by InstrumentedRedisCache, and TU API time by
+ThammasatAPI._upstream_call. Everything is also fed into Prometheus
+histograms served at /metrics.
+
+With several gunicorn workers set PROMETHEUS_MULTIPROC_DIR so that
+/metrics aggregates all of them; gunicorn.conf.py empties the directory
+when the server starts and marks exited workers dead.
+"""
+
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django_redis.cache import RedisCache
+
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+from prometheus_client import (  # noqa: E402 (needs the multiprocess dir first)
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+REQUEST_DURATION = Histogram(
+    'ams_request_duration_seconds', 'Wall time per request',
+    ['view', 'method', 'status'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    'ams_request_db_queries', 'SQL queries per sampled request',
+    ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    'ams_request_db_duration_seconds', 'SQL time per sampled request',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_UPSTREAM_DURATION = Histogram(
+    'ams_request_upstream_duration_seconds', 'Thammasat API time per sampled request',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_DURATION = Histogram(
+    'ams_tu_api_duration_seconds', 'Duration of each Thammasat API call',
+    ['operation', 'outcome'], buckets=LATENCY_BUCKETS,
+)
+CACHE_OPERATIONS = Counter(
+    'ams_cache_operations_total', 'Cache lookups by result',
+    ['result'],
+)
+
+_current = ContextVar('ams_request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Timings collected while one sampled request is handled
+    """
+    __slots__ = ('db_queries', 'db_time', 'cache_hits', 'cache_misses', 'upstream_calls', 'upstream_time')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.upstream_calls = 0
+        self.upstream_time = 0.0
+
+
+def start_request():
+    """
+    Begin collecting stats for the current request; returns (stats, token)
+    for finish_request
+    """
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def _install_query_timer(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_install_query_timer, dispatch_uid='ams.metrics.query_timer')
+# Connections this thread opened before the module was loaded
+for _connection in connections.all(initialized_only=True):
+    _install_query_timer(None, _connection)
+
+
+def record_cache(hits, misses):
+    if hits:
+        CACHE_OPERATIONS.labels('hit').inc(hits)
+    if misses:
+        CACHE_OPERATIONS.labels('miss').inc(misses)
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+@contextmanager
+def track_upstream(operation):
+    """
+    Time one Thammasat API call (its outcome is 'error' if it raised)
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_DURATION.labels(operation, outcome).observe(elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.upstream_calls += 1
+            stats.upstream_time += elapsed
+
+
+_MISSING = object()
+
+
+class InstrumentedRedisCache(RedisCache):
+    """
+    django-redis cache backend that counts hits and misses
+    """
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, default=_MISSING, version=version, client=client)
+        if value is _MISSING:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version, client=client)
+        record_cache(len(values), len(keys) - len(values))
+        return values
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; requires `Authorization: Bearer <METRICS_TOKEN>`
+    when METRICS_TOKEN is set
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponseForbidden()
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
+    return HttpResponse(data, content_type=CONTENT_TYPE_LATEST)
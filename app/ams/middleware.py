@@ -0,0 +1,79 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+
+class PerformanceMiddleware:
+    """
+    Record wall time for every request, and for a sampled share of them
+    (PERF_SAMPLE_RATE) the SQL query count and time, cache hits/misses and
+    Thammasat API time
+
+    Sampled requests get a Server-Timing header when PERF_SERVER_TIMING is
+    on, so the breakdown shows up in the browser's network panel. Put this
+    first in MIDDLEWARE so the timings cover the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 1.0)
+        self.server_timing = getattr(settings, 'PERF_SERVER_TIMING', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        stats, token = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                metrics.finish_request(token)
+        return self._finish(request, response, started, stats)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        stats, token = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                metrics.finish_request(token)
+        return self._finish(request, response, started, stats)
+
+    def _start(self):
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            return metrics.start_request()
+        return None, None
+
+    def _finish(self, request, response, started, stats):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match.route) if match else 'unmatched'
+        metrics.REQUEST_DURATION.labels(view, request.method, response.status_code).observe(elapsed)
+        if stats is None:
+            return response
+
+        metrics.REQUEST_DB_QUERIES.labels(view).observe(stats.db_queries)
+        metrics.REQUEST_DB_DURATION.labels(view).observe(stats.db_time)
+        if stats.upstream_calls:
+            metrics.REQUEST_UPSTREAM_DURATION.labels(view).observe(stats.upstream_time)
+
+        if self.server_timing:
+            entries = [
+                f'total;dur={elapsed * 1000:.1f}',
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.db_queries} queries"',
+                f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+            ]
+            if stats.upstream_calls:
+                entries.append(f'tu;dur={stats.upstream_time * 1000:.1f};desc="{stats.upstream_calls} TU API calls"')
+            response['Server-Timing'] = ', '.join(entries)
+        return response
@@ -0,0 +1,73 @@
+"""
+Start-up warm-up for gunicorn --preload.
+
+With PRELOAD_APP on, ams.wsgi/ams.asgi call warm_up() right after Django is
+set up. Under `gunicorn --preload` that happens once in the master, and
+every worker forked from it (including the replacements --max-requests
+keeps spawning) starts with the modules imported, the URLconf loaded and
+the hot templates compiled, instead of paying for all of that itself.
+
+warm_up() leaves no database connections, sockets or threads open, so
+forking afterwards is safe: the TU API client, cache connections and the
+log listener thread are all created lazily in each worker.
+"""
+
+import gc
+import logging
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Imported lazily by the code that uses them; worth sharing from the master
+PRELOAD_MODULES = [
+    'requests',
+    'httpx',
+    'accounts.tu_api',
+    'accounts.auth_backend',
+    'accounts.sessions',
+    'accounts.tasks',
+    'assignments.tasks',
+]
+
+PRELOAD_TEMPLATES = [
+    'base.html',
+    'accounts/login.html',
+    'accounts/home.html',
+    'accounts/profile.html',
+    'assignments/course_gradebook.html',
+]
+
+
+def warm_up():
+    """
+    Import, resolve and compile everything a first request would, then
+    freeze the heap so forked workers share it copy-on-write
+    """
+    started = time.perf_counter()
+    for name in getattr(settings, 'PRELOAD_MODULES', PRELOAD_MODULES):
+        import_module(name)
+    # Imports every view module
+    get_resolver().url_patterns
+
+    # The cached template loader keeps these compiled for the process lifetime
+    for name in getattr(settings, 'PRELOAD_TEMPLATES', PRELOAD_TEMPLATES):
+        try:
+            get_template(name)
+        except TemplateDoesNotExist:
+            logger.warning("Preload: template %s not found", name)
+
+    # Nothing above should have connected, but a worker must never share a parent's socket
+    connections.close_all()
+
+    # Keep the GC from touching (and so copying) the inherited objects in each worker
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded application in %.0f ms", (time.perf_counter() - started) * 1000)
@@ -1,4 +1,5 @@
 import os
+import shlex
 from pathlib import Path
 import dj_database_url
 from dotenv import load_dotenv
@@ -13,8 +14,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-default-key-for-dev')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-# Force DEBUG to False to improve performance
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', 'True').lower() in ('1', 'true', 'yes')
 
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'ams.middleware.PerformanceMiddleware',  # First, so its timings cover everything below
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,8 +58,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept for the life of the process, in DEBUG too
+            # (runserver's autoreloader clears them when a template changes)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -70,6 +78,14 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'ams.wsgi.application'
+ASGI_APPLICATION = 'ams.asgi.application'
+
+# Import the lazily loaded modules and compile the hot templates at startup (ams.preload);
+# turn on together with gunicorn --preload so it happens once, in the master
+PRELOAD_APP = os.environ.get('PRELOAD_APP', 'False').lower() in ('1', 'true', 'yes')
+
+# Serve /login/ with the async view (only useful when running under ASGI)
+ASYNC_LOGIN = os.environ.get('ASYNC_LOGIN', 'False').lower() in ('1', 'true', 'yes')
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -83,7 +99,8 @@ DATABASES = {
 # Redis cache
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        # django_redis RedisCache that also counts hits/misses for ams.metrics
+        "BACKEND": "ams.metrics.InstrumentedRedisCache",
         "LOCATION": os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
@@ -125,6 +142,40 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/app/media'
 
+# Submission uploads are streamed into content-addressed storage under MEDIA_ROOT
+# (see assignments.uploads); keep the limit in line with nginx client_max_body_size
+SUBMISSION_MAX_UPLOAD_SIZE = int(os.environ.get('SUBMISSION_MAX_UPLOAD_SIZE', str(100 * 1024 * 1024)))
+SUBMISSION_ALLOWED_EXTENSIONS = [
+    '.pdf', '.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx', '.odt', '.txt', '.md', '.csv',
+    '.zip', '.tar', '.gz', '.7z', '.png', '.jpg', '.jpeg', '.gif',
+    '.py', '.ipynb', '.java', '.c', '.cpp', '.h', '.js', '.ts', '.html', '.css', '.sql',
+]
+# Partial uploads older than this are removed by the hourly cleanup task
+SUBMISSION_INCOMING_MAX_AGE = 6 * 60 * 60  # seconds
+# Submission downloads are permission-checked by Django; with X-Accel-Redirect on, nginx
+# then sends the bytes from its `internal` location mapped to MEDIA_ROOT
+SUBMISSION_XACCEL_REDIRECT = os.environ.get('SUBMISSION_XACCEL_REDIRECT', 'False').lower() in ('1', 'true', 'yes')
+SUBMISSION_XACCEL_PREFIX = os.environ.get('SUBMISSION_XACCEL_PREFIX', '/protected-media/')
+# Near-duplicate report (assignments.similarity): pairs at or above this estimated
+# Jaccard similarity of their 5-token shingles; uploaded text/code files are read
+# up to SIMILARITY_MAX_BYTES
+SIMILARITY_THRESHOLD = float(os.environ.get('SIMILARITY_THRESHOLD', '0.5'))
+SIMILARITY_MAX_BYTES = 1024 * 1024
+# Gradebook stats of an assignment are refreshed (on the grading queue) at most once
+# per this many seconds however many submissions arrive; 0 refreshes after each one
+GRADEBOOK_REFRESH_DELAY = int(os.environ.get('GRADEBOOK_REFRESH_DELAY', '5'))
+# Auto-grading of code submissions (assignments.autograde): sandboxed processes
+# running at once (default one per CPU). Nothing is graded unless the sandbox is
+# isolated (see assignments.sandbox): a command each one is started under that
+# gives it its own user, network and PID namespaces, and/or a dedicated
+# unprivileged user to run it as (the worker must then run as root)
+AUTOGRADE_WORKERS = int(os.environ.get('AUTOGRADE_WORKERS', '0')) or os.cpu_count()
+AUTOGRADE_SANDBOX_PREFIX = shlex.split(os.environ.get('AUTOGRADE_SANDBOX_PREFIX', ''))
+AUTOGRADE_SANDBOX_USER = os.environ.get('AUTOGRADE_SANDBOX_USER', '') or None
+AUTOGRADE_MAX_OUTPUT = 1024 * 1024  # bytes of stdout/stderr per case
+# RLIMIT_NPROC for submissions: 1 = no forking or threads; 0 (off) or more only with a prefix
+AUTOGRADE_MAX_PROCESSES = int(os.environ.get('AUTOGRADE_MAX_PROCESSES', '1'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -141,10 +192,87 @@ CRISPY_TEMPLATE_PACK = "tailwind"
 # Thammasat University API settings
 TU_API_URL = os.environ.get('TU_API_URL')
 TU_API_KEY = os.environ.get('TU_API_KEY')
+TU_PROFILE_API_URL = os.environ.get('TU_PROFILE_API_URL', 'https://restapi.tu.ac.th/api/v2/profile/std/info/')
+# Shared connection pool for the TU API client (per worker process)
+TU_API_POOL_SIZE = int(os.environ.get('TU_API_POOL_SIZE', '10'))
+TU_API_CONNECT_TIMEOUT = float(os.environ.get('TU_API_CONNECT_TIMEOUT', '3.05'))
+TU_API_READ_TIMEOUT = float(os.environ.get('TU_API_READ_TIMEOUT', '10'))
+TU_API_MAX_RETRIES = int(os.environ.get('TU_API_MAX_RETRIES', '2'))
+TU_API_BACKOFF_FACTOR = float(os.environ.get('TU_API_BACKOFF_FACTOR', '0.3'))
+# Max concurrent TU connections per event loop on the async (ASGI) path
+TU_API_ASYNC_POOL_SIZE = int(os.environ.get('TU_API_ASYNC_POOL_SIZE', '100'))
+# Load shedding: reject (don't queue) TU calls beyond this many in flight per process
+TU_API_MAX_IN_FLIGHT = int(os.environ.get('TU_API_MAX_IN_FLIGHT', '50'))
+# Circuit breaker shared across workers via Redis
+TU_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('TU_CIRCUIT_FAILURE_THRESHOLD', '5'))
+TU_CIRCUIT_RECOVERY_TIMEOUT = int(os.environ.get('TU_CIRCUIT_RECOVERY_TIMEOUT', '30'))  # seconds
+# Roster imports (courses.services.import_roster): max TU profile calls per second, 0 for no limit
+TU_ROSTER_RATE = float(os.environ.get('TU_ROSTER_RATE', '20'))
+
+# Opt-in cache of recently verified TU credentials (salted PBKDF2 fingerprint + profile payload)
+TU_AUTH_CACHE_ENABLED = os.environ.get('TU_AUTH_CACHE_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+TU_AUTH_CACHE_TTL = int(os.environ.get('TU_AUTH_CACHE_TTL', '300'))  # seconds
+TU_AUTH_CACHE_HASH_ITERATIONS = int(os.environ.get('TU_AUTH_CACHE_HASH_ITERATIONS', '100000'))
+
+# Home page dashboard cache (invalidated by signals in assignments.signals)
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', '300'))  # seconds
+DASHBOARD_UPCOMING_LIMIT = 20
+
+# Bulk grading (assignments.grading); the gradebook rows are refreshed by a Celery task
+GRADING_BULK_BATCH_SIZE = 500
+
+# Celery (ams/celery.py)
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'))
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_TIMEZONE = TIME_ZONE
+# Run tasks in-process (tests and local runs without Redis or a worker)
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False').lower() in ('1', 'true', 'yes')
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'accounts.tasks.*': {'queue': 'auth-sync'},
+    'assignments.tasks.refresh_gradebook_task': {'queue': 'grading'},
+    'assignments.tasks.rebuild_course_gradebook_task': {'queue': 'grading'},
+    'assignments.tasks.update_signature_task': {'queue': 'grading'},
+    'assignments.tasks.autograde_task': {'queue': 'autograde'},
+    'assignments.tasks.cleanup_incoming_uploads': {'queue': 'files'},
+}
+# Tasks are idempotent: acknowledge after they finish so a lost worker's tasks are redelivered
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Give up publishing quickly when Redis is down; callers then run the task inline
+CELERY_TASK_PUBLISH_RETRY_POLICY = {'max_retries': 2, 'interval_start': 0, 'interval_step': 0.2, 'interval_max': 0.5}
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-incoming-uploads': {
+        'task': 'assignments.tasks.cleanup_incoming_uploads',
+        'schedule': 60 * 60,
+    },
+}
+
+# Background TU profile sync after login (accounts.tasks)
+TU_PROFILE_SYNC_INTERVAL = int(os.environ.get('TU_PROFILE_SYNC_INTERVAL', str(24 * 60 * 60)))  # seconds
+
+# Performance instrumentation (ams.middleware, ams.metrics)
+# Share of requests that get the SQL/cache/TU API breakdown; wall time is recorded for all
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', '1.0'))
+# Send the breakdown of sampled requests to the client as a Server-Timing header
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', str(DEBUG)).lower() in ('1', 'true', 'yes')
+# Bearer token required by /metrics when set (nginx does not proxy /metrics at all)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
 
 # Session settings
-SESSION_ENGINE = "django.contrib.sessions.backends.cache"
+# Cache (Redis) sessions with a per-process LRU in front (accounts.sessions)
+SESSION_ENGINE = "accounts.sessions"
 SESSION_CACHE_ALIAS = "default"
+# Per-process tier for sessions and users: entries and seconds an entry may
+# be served after it changed in another process (0 turns the tier off)
+AUTH_LOCAL_CACHE_SIZE = int(os.environ.get('AUTH_LOCAL_CACHE_SIZE', '10000'))
+AUTH_LOCAL_CACHE_TTL = float(os.environ.get('AUTH_LOCAL_CACHE_TTL', '5'))
+# Seconds the logged-in user and profile stay cached in Redis (0 reads them from the database every request)
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', '300'))
 
 # Login URL
 LOGIN_URL = '/login/'
@@ -161,42 +289,96 @@ AUTHENTICATION_BACKENDS = [
 CSRF_TRUSTED_ORIGINS = ['http://localhost:8080', 'http://127.0.0.1:8080']
 
 # Logging configuration
-LOGGING = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
+# 'debug': the accounts logger at DEBUG to the console and /app/debug.log,
+# written synchronously. 'production': INFO and above as JSON lines, written
+# by a background thread (ams.log.BackgroundHandler) with secrets redacted;
+# verbose TU API traces ('accounts.tu_api.trace') are kept for a sampled
+# share of calls only.
+LOG_MODE = os.environ.get('LOG_MODE', 'debug' if DEBUG else 'production')
+LOG_FILE = os.environ.get('LOG_FILE', '')  # production: JSON lines go to stdout when empty
+TU_API_TRACE_SAMPLE_RATE = float(os.environ.get('TU_API_TRACE_SAMPLE_RATE', '0.01'))
+
+LOGGING_PROFILES = {
+    'debug': {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'filters': {
+            'redact': {
+                '()': 'ams.log.RedactSecretsFilter',
+            },
         },
-        'simple': {
-            'format': '{levelname} {message}',
-            'style': '{',
+        'formatters': {
+            'verbose': {
+                'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
+                'style': '{',
+            },
+            'simple': {
+                'format': '{levelname} {message}',
+                'style': '{',
+            },
         },
-    },
-    'handlers': {
-        'console': {
-            'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+        'handlers': {
+            'console': {
+                'level': 'DEBUG',
+                'class': 'logging.StreamHandler',
+                'formatter': 'verbose',
+                'filters': ['redact'],
+            },
+            'file': {
+                'level': 'DEBUG',
+                'class': 'logging.FileHandler',
+                'filename': LOG_FILE or '/app/debug.log',
+                'formatter': 'verbose',
+                'filters': ['redact'],
+            },
         },
-        'file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': '/app/debug.log',
-            'formatter': 'verbose',
+        'loggers': {
+            'django': {
+                'handlers': ['console'],
+                'level': 'INFO',
+                'propagate': True,
+            },
+            'accounts': {
+                'handlers': ['console', 'file'],
+                'level': 'DEBUG',
+                'propagate': True,
+            },
         },
     },
-    'loggers': {
-        'django': {
-            'handlers': ['console'],
-            'level': 'INFO',
-            'propagate': True,
+    'production': {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'filters': {
+            'sample_traces': {
+                '()': 'ams.log.SampleFilter',
+                'rate': TU_API_TRACE_SAMPLE_RATE,
+            },
+        },
+        'handlers': {
+            'background': {
+                'class': 'ams.log.BackgroundHandler',
+                'filename': LOG_FILE or None,
+            },
+        },
+        'root': {
+            'handlers': ['background'],
+            'level': 'WARNING',
         },
-        'accounts': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
-            'propagate': True,
+        'loggers': {
+            'django': {
+                'level': 'INFO',
+            },
+            'accounts': {
+                'level': 'INFO',
+            },
+            'assignments': {
+                'level': 'INFO',
+            },
+            'accounts.tu_api.trace': {
+                'level': 'DEBUG',
+                'filters': ['sample_traces'],
+            },
         },
     },
 }
+LOGGING = LOGGING_PROFILES[LOG_MODE]
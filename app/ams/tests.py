@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+from kombu.exceptions import OperationalError
+
+from ams import log
+from ams.celery import app, enqueue
+
+calls = []
+
+
+@app.task(name='ams.tests.record_call')
+def record_call(value):
+    calls.append(value)
+    if value == 'fail':
+        raise ValueError(value)
+    return value
+
+
+class EnqueueTests(SimpleTestCase):
+    def setUp(self):
+        calls.clear()
+        # Run tasks the way CELERY_TASK_ALWAYS_EAGER does in development
+        for name in ('task_always_eager', 'task_eager_propagates'):
+            self.addCleanup(setattr, app.conf, name, getattr(app.conf, name))
+            setattr(app.conf, name, True)
+
+    def test_eager_task_runs_once(self):
+        result = enqueue(record_call, 'ok')
+        self.assertEqual(result.get(), 'ok')
+        self.assertEqual(calls, ['ok'])
+
+    def test_eager_task_error_is_raised_not_rerun(self):
+        with self.assertRaises(ValueError):
+            enqueue(record_call, 'fail')
+        self.assertEqual(calls, ['fail'])
+
+    def test_runs_inline_when_broker_is_down(self):
+        with mock.patch.object(record_call, 'apply_async', side_effect=OperationalError('broker down')):
+            result = enqueue(record_call, 'ok')
+        self.assertEqual(result.get(), 'ok')
+        self.assertEqual(calls, ['ok'])
+
+    def test_skipped_when_broker_is_down_and_not_run_inline(self):
+        with mock.patch.object(record_call, 'apply_async', side_effect=OperationalError('broker down')):
+            self.assertIsNone(enqueue(record_call, 'ok', run_inline=False))
+        self.assertEqual(calls, [])
+
+    def test_other_publish_errors_are_raised(self):
+        with mock.patch.object(record_call, 'apply_async', side_effect=TypeError('not serializable')):
+            with self.assertRaises(TypeError):
+                enqueue(record_call, 'ok')
+        self.assertEqual(calls, [])
+
+
+class QueueRoutingTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Runs the autodiscovery of each app's tasks.py, as a worker does at start
+        app.loader.import_default_modules()
+
+    def queue(self, task_name):
+        return app.amqp.router.route({}, task_name)['queue'].name
+
+    def test_tasks_are_routed_by_workload(self):
+        routes = {
+            'accounts.tasks.update_user_profile': 'auth-sync',
+            'accounts.tasks.sync_student_profile': 'auth-sync',
+            'assignments.tasks.refresh_gradebook_task': 'grading',
+            'assignments.tasks.rebuild_course_gradebook_task': 'grading',
+            'assignments.tasks.update_signature_task': 'grading',
+            'assignments.tasks.autograde_task': 'autograde',
+            'assignments.tasks.cleanup_incoming_uploads': 'files',
+        }
+        for task_name, queue in routes.items():
+            with self.subTest(task_name):
+                self.assertIn(task_name, app.tasks)
+                self.assertEqual(self.queue(task_name), queue)
+
+    def test_other_tasks_use_the_default_queue(self):
+        self.assertEqual(self.queue('ams.tests.record_call'), 'default')
+
+
+class BackgroundHandlerTests(SimpleTestCase):
+    def test_concurrent_first_records_start_one_listener(self):
+        handler = log.BackgroundHandler(filename=os.devnull)
+        self.addCleanup(handler.close)
+        started = []
+
+        class SlowListener(log.QueueListener):
+            def start(self):
+                started.append(self)
+                # Widen the window between the check and the start
+                time.sleep(0.05)
+                super().start()
+
+        barrier = threading.Barrier(8)
+
+        def emit(i):
+            barrier.wait()
+            handler.emit(logging.LogRecord('ams.tests', logging.INFO, __file__, 0, 'record %s', (i,), None))
+
+        with mock.patch.object(log, 'QueueListener', SlowListener):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(pool.map(emit, range(8)))
+
+        self.assertEqual(len(started), 1)
+        self.assertIs(handler.listener, started[0])
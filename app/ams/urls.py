@@ -2,13 +2,16 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('accounts.urls')),  # Include accounts URLs at root path
+    path('assignments/', include('assignments.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
-# Serve media files in development
+# Serve static files in development. Media is never served directly: submission
+# files go through assignments.views.submission_file_view, which checks permissions
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
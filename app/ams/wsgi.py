@@ -6,8 +6,14 @@ It exposes the WSGI callable as a module-level variable named ``application``.
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ams.settings')
 
 application = get_wsgi_application()
+
+if getattr(settings, 'PRELOAD_APP', False):
+    # Under gunicorn --preload this runs once, in the master (see ams.preload)
+    from ams.preload import warm_up
+    warm_up()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AssignmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assignments'
+
+    def ready(self):
+        # Keep cached dashboards in sync with assignments, submissions and enrollments
+        from . import signals  # noqa: F401
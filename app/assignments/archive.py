@@ -0,0 +1,116 @@
+"""
+ZIP archives of an assignment's submission files, generated on the fly.
+
+The archive is written by zipfile into a write-only sink that the response
+drains after every chunk, so nothing but the current chunk is held in
+memory however many or large the files are. Without a seekable output,
+zipfile streams each entry's data first and writes its CRC and sizes in a
+data descriptor behind it; ZIP64 records are used where an entry or the
+archive passes 4 GiB.
+
+Files whose format is already compressed are stored as they are; running
+deflate over a JPEG or a .docx costs CPU and saves nothing. Everything else
+is deflated.
+"""
+
+import logging
+import os
+import time
+import zipfile
+from django.conf import settings
+from django.utils.text import slugify
+from .models import Submission
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2 ** 20
+# Rows fetched per query while listing the files
+ITERATOR_CHUNK_SIZE = 500
+STORED_EXTENSIONS = {
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.mp3', '.mp4', '.mov', '.webm',
+    '.pdf', '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp',
+}
+
+
+class ZipSink:
+    """
+    Write-only file object for zipfile: keeps what was written until the
+    response takes it
+    """
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def archive_name(assignment):
+    return f"{assignment.course.code}_{slugify(assignment.name) or 'assignment'}.zip"
+
+
+def submission_files(assignment):
+    """
+    (name in the archive, file name under MEDIA_ROOT) of every submission
+    with a file, by student username
+    """
+    folder = slugify(assignment.name) or 'submissions'
+    rows = (
+        Submission.objects.filter(assignment=assignment).exclude(file='').exclude(file__isnull=True)
+        .order_by('student__username')
+        .values_list('file', 'student__username')
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+    for name, username in rows:
+        yield f"{folder}/{username}{os.path.splitext(name)[1].lower()}", name
+
+
+def stream_archive(files, chunk_size=CHUNK_SIZE):
+    """
+    Bytes of a ZIP archive of (name in the archive, file name under
+    MEDIA_ROOT) pairs, produced as the files are read
+
+    Files that are missing or outside MEDIA_ROOT are left out and listed in
+    a MISSING.txt entry at the end.
+    """
+    media_root = os.path.normpath(settings.MEDIA_ROOT)
+    sink = ZipSink()
+    missing = []
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+        for arcname, name in files:
+            path = os.path.normpath(os.path.join(media_root, name.lstrip('/')))
+            try:
+                if not path.startswith(media_root + os.sep):
+                    raise FileNotFoundError(name)
+                f = open(path, 'rb')
+            except OSError as e:
+                logger.warning("Leaving %s out of the archive: %s", name, e)
+                missing.append(arcname)
+                continue
+            with f:
+                stat = os.fstat(f.fileno())
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime(stat.st_mtime)[:6])
+                info.external_attr = 0o644 << 16
+                info.file_size = stat.st_size
+                extension = os.path.splitext(arcname)[1]
+                info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                with archive.open(info, 'w') as entry:
+                    while chunk := f.read(chunk_size):
+                        entry.write(chunk)
+                        data = sink.take()
+                        if data:
+                            yield data
+        if missing:
+            archive.writestr('MISSING.txt', 'Files not found on the server:\n' + '\n'.join(missing) + '\n')
+    yield sink.take()
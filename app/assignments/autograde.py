@@ -0,0 +1,261 @@
+"""
+Auto-grading of code submissions.
+
+A teacher attaches a TestSuite to a code assignment: stdin/stdout cases
+worth some points each, plus a CPU time and memory limit per case.
+grade_submissions() runs submissions against it in the sandbox
+(assignments.sandbox), at most AUTOGRADE_WORKERS sandboxed processes at a
+time, and writes grade (total_points scaled by the points earned) and
+feedback back through apply_grades, like a grade sheet would.
+
+Outcomes are cached in GradingResult by (SHA-256 of the source, SHA-256 of
+the suite): identical submissions (copies, resubmissions of unchanged code,
+re-running an unchanged suite) are executed once. Editing the suite changes
+its hash, so everything is run again against the new cases.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
+from django.conf import settings
+from ams.celery import enqueue
+from .grading import apply_grades
+from .models import GradingResult, Submission, TestSuite
+from .sandbox import STATUS_LABELS, SandboxError, check_isolation, run_suite
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Part of every suite hash: bump when a sandbox change can alter outcomes
+RUNNER_VERSION = 1
+CENT = Decimal('0.01')
+MAX_CASES = 100
+MAX_TIME_LIMIT = 30
+MAX_MEMORY_LIMIT = 2048
+
+
+class AutogradeError(Exception):
+    """
+    A test suite that failed validation, or an assignment without one;
+    `errors` lists the problems
+    """
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def clean_suite(data):
+    """
+    Validate a test suite as a teacher sends it:
+
+        {"cases": [{"name": "...", "stdin": "...", "expected_output": "...", "points": 1}, ...],
+         "time_limit": 2, "memory_limit": 256, "grade_on_submit": true}
+
+    Returns:
+        dict: TestSuite field values
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('cases'), list) or not data['cases']:
+        raise AutogradeError(['Expected an object with a non-empty list of cases'])
+    errors = []
+    if len(data['cases']) > MAX_CASES:
+        errors.append(f"At most {MAX_CASES} cases")
+
+    cases = []
+    for index, case in enumerate(data['cases'], start=1):
+        if not isinstance(case, dict):
+            errors.append(f"Case {index}: expected an object")
+            continue
+        stdin, expected = case.get('stdin', ''), case.get('expected_output')
+        points = case.get('points', 1)
+        if not isinstance(stdin, str) or not isinstance(expected, str):
+            errors.append(f"Case {index}: stdin and expected_output must be strings")
+        if isinstance(points, bool) or not isinstance(points, (int, float)) or points <= 0:
+            errors.append(f"Case {index}: points must be a positive number")
+        cases.append({
+            'name': str(case.get('name') or f'case {index}'),
+            'stdin': stdin,
+            'expected_output': expected,
+            'points': points,
+        })
+
+    values = {'cases': cases}
+    for field, maximum in (('time_limit', MAX_TIME_LIMIT), ('memory_limit', MAX_MEMORY_LIMIT)):
+        if field not in data:
+            continue
+        value = data[field]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= maximum:
+            errors.append(f"{field} must be a number in (0, {maximum}]")
+        values[field] = value
+    if 'grade_on_submit' in data:
+        values['grade_on_submit'] = bool(data['grade_on_submit'])
+    if errors:
+        raise AutogradeError(errors)
+    if 'memory_limit' in values:
+        values['memory_limit'] = int(values['memory_limit'])
+    return values
+
+
+def suite_spec(suite):
+    """
+    Everything the sandbox needs to run a suite (plain data, no models)
+    """
+    return {
+        'language': suite.language,
+        'cases': suite.cases,
+        'time_limit': suite.time_limit,
+        'memory_limit': suite.memory_limit,
+        'max_output': getattr(settings, 'AUTOGRADE_MAX_OUTPUT', 2 ** 20),
+        'max_processes': getattr(settings, 'AUTOGRADE_MAX_PROCESSES', 1),
+        'prefix': getattr(settings, 'AUTOGRADE_SANDBOX_PREFIX', []),
+        'user': getattr(settings, 'AUTOGRADE_SANDBOX_USER', None),
+        'python': getattr(settings, 'AUTOGRADE_PYTHON', None),
+    }
+
+
+def suite_hash(spec):
+    """
+    SHA-256 of what decides a suite's outcomes: the cases, the limits and the
+    runner version (not where or how the sandbox is started)
+    """
+    key = {
+        'version': RUNNER_VERSION,
+        **{field: spec[field] for field in ('language', 'cases', 'time_limit', 'memory_limit', 'max_output')},
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def content_hash(source):
+    return hashlib.sha256(source.encode('utf-8', errors='replace')).hexdigest()
+
+
+def run_sources(sources, spec, workers=None):
+    """
+    Run each distinct source against a suite, at most `workers` sandboxes at
+    a time
+
+    Every case is its own sandboxed process; the threads here only start
+    them and wait, so they don't hold the GIL while student code runs.
+
+    Returns:
+        dict: {content hash: run_suite result}
+    """
+    workers = workers or getattr(settings, 'AUTOGRADE_WORKERS', None) or os.cpu_count() or 1
+    if not sources:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(sources)), thread_name_prefix='autograde') as pool:
+        results = pool.map(lambda source: run_suite(source, spec), sources.values())
+        return dict(zip(sources, results))
+
+
+def grade_of(result, total_points):
+    if not result['possible']:
+        return Decimal(0)
+    grade = Decimal(total_points) * Decimal(str(result['earned'])) / Decimal(str(result['possible']))
+    return grade.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def feedback_of(result):
+    """
+    Per-case outcome for the student; never their output, which could be
+    anything
+    """
+    passed = sum(1 for case in result['cases'] if case['earned'])
+    lines = [f"Auto-graded: {passed}/{len(result['cases'])} tests passed ({result['earned']:g}/{result['possible']:g} points)"]
+    for case in result['cases']:
+        label = STATUS_LABELS.get(case['status'], case['status'])
+        if case.get('error'):
+            label = f"{label} ({case['error']})"
+        lines.append(f"- {case['name']}: {label}")
+    return '\n'.join(lines)
+
+
+def grade_submissions(assignment, submission_ids=None, workers=None, force=False):
+    """
+    Run an assignment's test suite on its code submissions (or the given
+    ones) and write the grades and feedback
+
+    Sources already run against this suite are not run again unless force
+    is given.
+
+    Returns:
+        dict: {'graded', 'executed', 'cached', 'updated', 'unchanged'}
+    """
+    suite = TestSuite.objects.filter(assignment=assignment).first()
+    if suite is None:
+        raise AutogradeError([f"Assignment {assignment.pk} has no test suite"])
+    spec = suite_spec(suite)
+    digest = suite_hash(spec)
+
+    submissions = Submission.objects.filter(assignment=assignment).select_related('student').only(
+        'id', 'text_content', 'student__username'
+    )
+    if submission_ids is not None:
+        submissions = submissions.filter(pk__in=submission_ids)
+    by_hash = {}
+    sources = {}
+    for submission in submissions:
+        if not submission.text_content.strip():
+            continue
+        key = content_hash(submission.text_content)
+        by_hash.setdefault(key, []).append(submission)
+        sources[key] = submission.text_content
+
+    results = {}
+    if not force:
+        results = dict(
+            GradingResult.objects.filter(suite_hash=digest, content_hash__in=list(by_hash))
+            .values_list('content_hash', 'result')
+        )
+    missing = {key: source for key, source in sources.items() if key not in results}
+    if missing:
+        # Fail closed: nothing runs on a worker that can't isolate it
+        try:
+            check_isolation(spec)
+        except SandboxError as e:
+            logger.error("Not auto-grading %s: %s", assignment.pk, e)
+            raise AutogradeError([str(e)])
+    executed = run_sources(missing, spec, workers)
+    if executed:
+        GradingResult.objects.bulk_create(
+            [GradingResult(content_hash=key, suite_hash=digest, result=result) for key, result in executed.items()],
+            update_conflicts=True,
+            unique_fields=['content_hash', 'suite_hash'],
+            update_fields=['result', 'created_at'],
+        )
+        results.update(executed)
+
+    rows = [
+        {
+            'row': None,
+            'student': submission.student.username,
+            'grade': grade_of(results[key], assignment.total_points),
+            'feedback': feedback_of(results[key]),
+        }
+        for key, group in by_hash.items()
+        for submission in group
+    ]
+    written = apply_grades(assignment, rows) if rows else {'updated': 0, 'unchanged': 0}
+    summary = {
+        'graded': len(rows),
+        'executed': len(executed),
+        'cached': len(by_hash) - len(executed),
+        **written,
+    }
+    logger.info(
+        "Auto-graded %s: %s submission(s), %s run, %s from cache",
+        assignment.pk, summary['graded'], summary['executed'], summary['cached'],
+    )
+    return summary
+
+
+def schedule_autograde(assignment_id, submission_ids=None, on_submit=False):
+    """
+    Grade in the background (autograde queue); never on the request path
+    """
+    from .tasks import autograde_task
+
+    ids = None if submission_ids is None else [str(pk) for pk in submission_ids]
+    return enqueue(autograde_task, str(assignment_id), ids, on_submit, run_inline=False)
@@ -0,0 +1,129 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from courses.models import Course, Enrollment
+from .models import Assignment, Submission
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'dashboard'
+
+
+def _cache_key(user_id):
+    return f"{CACHE_KEY_PREFIX}:{user_id}"
+
+
+def build_dashboard(user, now=None):
+    """
+    Build the home page dashboard for a user in a fixed number of queries
+    (3, however many courses the user has)
+
+    Returns:
+        dict: {
+            'enrolled_courses': [course dicts],
+            'teaching_courses': [course dicts],
+            'upcoming_assignments': [assignment dicts with the user's submission status],
+        }
+    """
+    now = now or timezone.now()
+    limit = getattr(settings, 'DASHBOARD_UPCOMING_LIMIT', 20)
+
+    # 1. Enrolled and taught courses in one query
+    teaching = Course.teachers.through.objects.filter(user_id=user.pk)
+    enrolled = Enrollment.objects.filter(student_id=user.pk, status='enrolled')
+    courses = (
+        Course.objects
+        .filter(Q(pk__in=enrolled.values('course_id')) | Q(pk__in=teaching.values('course_id')))
+        .annotate(is_teacher=Exists(teaching.filter(course_id=OuterRef('pk'))))
+        .values('id', 'code', 'name', 'term', 'year', 'is_teacher')
+    )
+    courses = {course['id']: course for course in courses}
+    teaching_ids = {cid for cid, course in courses.items() if course['is_teacher']}
+
+    enrolled_courses = [c for cid, c in courses.items() if cid not in teaching_ids]
+    teaching_courses = [c for cid, c in courses.items() if cid in teaching_ids]
+
+    # 2. Upcoming assignments across all of those courses
+    upcoming = []
+    if courses:
+        assignments = (
+            Assignment.objects
+            .filter(course_id__in=courses, due_date__gte=now)
+            .filter(Q(course_id__in=teaching_ids) | Q(available_from__lte=now))
+            .order_by('due_date')
+            .values('id', 'course_id', 'name', 'assignment_type', 'submission_type',
+                    'due_date', 'available_from', 'total_points')[:limit]
+        )
+        upcoming = list(assignments)
+
+    # 3. The user's own submissions for those assignments
+    if upcoming:
+        submissions = {
+            s['assignment_id']: s
+            for s in Submission.objects
+            .filter(student=user, assignment_id__in=[a['id'] for a in upcoming])
+            .values('assignment_id', 'status', 'is_late', 'grade', 'submitted_at')
+        }
+        for assignment in upcoming:
+            course = courses[assignment['course_id']]
+            assignment['course_code'] = course['code']
+            assignment['course_name'] = course['name']
+            assignment['is_teacher'] = assignment['course_id'] in teaching_ids
+            assignment['submission'] = submissions.get(assignment['id'])
+
+    return {
+        'enrolled_courses': sorted(enrolled_courses, key=lambda c: c['code']),
+        'teaching_courses': sorted(teaching_courses, key=lambda c: c['code']),
+        'upcoming_assignments': upcoming,
+    }
+
+
+def get_dashboard(user):
+    """
+    Return the user's dashboard from the cache, building it on a miss
+    """
+    now = timezone.now()
+    key = _cache_key(user.pk)
+    try:
+        dashboard = cache.get(key)
+    except Exception as e:
+        logger.warning("Dashboard cache unavailable: %s", e)
+        return build_dashboard(user, now)
+
+    if dashboard is None:
+        dashboard = build_dashboard(user, now)
+        try:
+            cache.set(key, dashboard, getattr(settings, 'DASHBOARD_CACHE_TTL', 300))
+        except Exception as e:
+            logger.warning("Could not cache dashboard: %s", e)
+    else:
+        # Deadlines that passed since the entry was cached drop out without a rebuild
+        dashboard['upcoming_assignments'] = [
+            a for a in dashboard['upcoming_assignments'] if a['due_date'] >= now
+        ]
+    return dashboard
+
+
+def invalidate_dashboards(user_ids):
+    """
+    Drop cached dashboards for the given users
+    """
+    keys = [_cache_key(user_id) for user_id in set(user_ids) if user_id]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        logger.warning("Could not invalidate dashboards: %s", e)
+
+
+def invalidate_course_dashboards(course_id):
+    """
+    Drop cached dashboards for everyone enrolled in or teaching a course
+    """
+    student_ids = Enrollment.objects.filter(course_id=course_id).values_list('student_id', flat=True)
+    teacher_ids = Course.teachers.through.objects.filter(course_id=course_id).values_list('user_id', flat=True)
+    invalidate_dashboards(list(student_ids) + list(teacher_ids))
@@ -0,0 +1,324 @@
+"""
+Registrar-style gradebook exports: one row per submission across any number
+of courses, filtered by year, term, faculty, department or course, as CSV or
+XLSX.
+
+The rows come from a single query joining Submission with its assignment,
+course, student and profile. It is read with .iterator(chunk_size), which
+on PostgreSQL is a server-side cursor and on SQLite fetchmany(), and each
+chunk is written out before the next is fetched. Memory holds one chunk of
+rows and about BUFFER_SIZE of output, however many rows the export has.
+
+XLSX is written directly (inline strings, no shared string table) into a
+streamed ZIP (assignments.archive.ZipSink), so it needs no spreadsheet
+library and, like CSV, starts downloading with the first chunk.
+"""
+
+import csv
+import io
+import logging
+import re
+import uuid
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.utils import timezone
+from django.utils.text import slugify
+from .archive import ZipSink
+from .models import Submission
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+ITERATOR_CHUNK_SIZE = 2000
+# Output collected before it is handed to the response
+BUFFER_SIZE = 64 * 2 ** 10
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+FILTERS = ('year', 'term', 'faculty', 'department', 'course')
+
+# (header, lookup from Submission)
+COLUMNS = [
+    ('faculty', 'assignment__course__faculty'),
+    ('department', 'assignment__course__department'),
+    ('year', 'assignment__course__year'),
+    ('term', 'assignment__course__term'),
+    ('course_code', 'assignment__course__code'),
+    ('course_name', 'assignment__course__name'),
+    ('assignment', 'assignment__name'),
+    ('due_date', 'assignment__due_date'),
+    ('total_points', 'assignment__total_points'),
+    ('tu_id', 'student__profile__tu_id'),
+    ('username', 'student__username'),
+    ('first_name', 'student__first_name'),
+    ('last_name', 'student__last_name'),
+    ('status', 'status'),
+    ('submitted_at', 'submitted_at'),
+    ('late', 'is_late'),
+    ('grade', 'grade'),
+]
+HEADERS = [header for header, _ in COLUMNS]
+
+# Excel's limit is 1,048,576 rows including the header; further rows go on a new sheet
+XLSX_SHEET_ROWS = 2 ** 20 - 1
+XLSX_DATE_STYLE = 1
+EXCEL_EPOCH = datetime(1899, 12, 30)
+ILLEGAL_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+class ExportError(Exception):
+    """
+    Export filters or format that failed validation
+    """
+
+
+def clean_export_filters(params):
+    """
+    Validate export filters from a query string or command options; empty
+    values are ignored
+
+    Returns:
+        dict: {filter: value} for the filters given
+    """
+    filters = {}
+    for name in FILTERS:
+        value = params.get(name)
+        if value is None or str(value).strip() == '':
+            continue
+        value = str(value).strip()
+        if name == 'year':
+            try:
+                value = int(value)
+            except ValueError:
+                raise ExportError('year must be a number')
+        elif name == 'course':
+            try:
+                value = uuid.UUID(value)
+            except ValueError:
+                raise ExportError('course must be a course ID')
+        filters[name] = value
+    return filters
+
+
+def export_rows(filters, teacher=None, chunk_size=ITERATOR_CHUNK_SIZE):
+    """
+    Rows (tuples in COLUMNS order) of every submission matching the
+    filters, limited to the courses `teacher` teaches if given; one query,
+    read chunk_size rows at a time
+    """
+    submissions = Submission.objects.all()
+    for name, value in filters.items():
+        lookup = 'assignment__course_id' if name == 'course' else f'assignment__course__{name}'
+        submissions = submissions.filter(**{lookup: value})
+    if teacher is not None:
+        submissions = submissions.filter(assignment__course__teachers=teacher)
+    return (
+        submissions
+        .order_by('assignment__course__year', 'assignment__course__term', 'assignment__course__code',
+                  'assignment__due_date', 'assignment_id', 'student__username')
+        .values_list(*[lookup for _, lookup in COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def export_filename(filters, export_format):
+    parts = [str(filters[name]) for name in FILTERS if name in filters and name != 'course']
+    if 'course' in filters:
+        parts.append(str(filters['course'])[-12:])
+    return f"gradebook_{slugify('_'.join(parts)) or 'all'}.{export_format}"
+
+
+def _local(value):
+    return timezone.localtime(value) if timezone.is_aware(value) else value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    if isinstance(value, datetime):
+        return _local(value).strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def stream_csv(rows):
+    """
+    UTF-8 CSV (with a BOM, so Excel reads Thai names correctly) of the
+    rows, in pieces of about BUFFER_SIZE
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(HEADERS)
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        if buffer.tell() >= BUFFER_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+COLUMN_LETTERS = [_column_letter(i) for i in range(len(COLUMNS))]
+
+
+def _xlsx_cell(ref, value):
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        serial = (_local(value).replace(tzinfo=None) - EXCEL_EPOCH).total_seconds() / 86400
+        # 10 places: 6 are only 86 ms apart, so readers that truncate lose a second
+        return f'<c r="{ref}" s="{XLSX_DATE_STYLE}"><v>{serial:.10f}</v></c>'
+    text = escape(ILLEGAL_XML_RE.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(number, values):
+    cells = ''.join(_xlsx_cell(f'{letter}{number}', value) for letter, value in zip(COLUMN_LETTERS, values))
+    return f'<row r="{number}">{cells}</row>'
+
+
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" '
+    'state="frozen"/></sheetView></sheetViews><sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+WORKBOOK_SHEET = '<sheet name="{name}" sheetId="{n}" r:id="rId{n}"/>'
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}<Relationship Id="rId{styles}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK_SHEET_REL = (
+    '<Relationship Id="rId{n}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{n}.xml"/>'
+)
+# Style 0 is the default, style 1 (XLSX_DATE_STYLE) shows a date and time
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def stream_xlsx(rows, sheet_rows=XLSX_SHEET_ROWS):
+    """
+    XLSX workbook of the rows, in pieces of about BUFFER_SIZE (compressed);
+    sheet_rows rows per sheet, each sheet with the header and a frozen
+    header row
+
+    The sheets are written first, as the rows arrive; the workbook parts
+    that list them are added at the end, once their number is known.
+    """
+    sink = ZipSink()
+    sheets = 0
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as book:
+        sheet = None
+        parts = []
+        size = 0
+        number = 0
+        for row in rows:
+            if sheet is None or number > sheet_rows:
+                if sheet is not None:
+                    sheet.write((''.join(parts) + SHEET_END).encode('utf-8'))
+                    sheet.close()
+                    parts, size = [], 0
+                sheets += 1
+                sheet = book.open(f'xl/worksheets/sheet{sheets}.xml', 'w')
+                sheet.write((SHEET_START + _xlsx_row(1, HEADERS)).encode('utf-8'))
+                number = 1
+            number += 1
+            parts.append(_xlsx_row(number, row))
+            size += len(parts[-1])
+            if size >= BUFFER_SIZE:
+                sheet.write(''.join(parts).encode('utf-8'))
+                parts, size = [], 0
+                data = sink.take()
+                if data:
+                    yield data
+        if sheet is None:
+            sheets = 1
+            book.writestr('xl/worksheets/sheet1.xml', SHEET_START + _xlsx_row(1, HEADERS) + SHEET_END)
+        else:
+            sheet.write((''.join(parts) + SHEET_END).encode('utf-8'))
+            sheet.close()
+
+        numbers = range(1, sheets + 1)
+        book.writestr('[Content_Types].xml', CONTENT_TYPES.format(
+            sheets=''.join(SHEET_CONTENT_TYPE.format(n=n) for n in numbers)
+        ))
+        book.writestr('_rels/.rels', ROOT_RELS)
+        book.writestr('xl/workbook.xml', WORKBOOK.format(
+            sheets=''.join(WORKBOOK_SHEET.format(name='Grades' if n == 1 else f'Grades {n}', n=n) for n in numbers)
+        ))
+        book.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS.format(
+            sheets=''.join(WORKBOOK_SHEET_REL.format(n=n) for n in numbers), styles=sheets + 1,
+        ))
+        book.writestr('xl/styles.xml', STYLES)
+    yield sink.take()
+
+
+def stream_export(rows, export_format):
+    if export_format not in FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(FORMATS)}")
+    return stream_csv(rows) if export_format == 'csv' else stream_xlsx(rows)
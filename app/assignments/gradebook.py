@@ -0,0 +1,378 @@
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from ams.celery import enqueue
+from courses.models import Course, Enrollment
+from .models import Assignment, AssignmentStats, StudentCourseTotal, Submission
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+STATS_FIELDS = ['submission_count', 'graded_count', 'late_count', 'mean_grade', 'median_grade', 'histogram']
+TOTAL_FIELDS = ['submitted_count', 'graded_count', 'late_count', 'points_earned', 'points_possible']
+CENT = Decimal('0.01')
+# At most one pending refresh of an assignment's stats / rebuild of a course (see _claim)
+STATS_REFRESH_KEY_PREFIX = 'gradebook_stats_refresh'
+REBUILD_KEY_PREFIX = 'gradebook_rebuild'
+
+
+def _assignment_stats(total_points, submissions):
+    """
+    Statistics of one assignment from its (status, is_late, grade) rows
+    """
+    grades = sorted(grade for status, _, grade in submissions if status == 'graded' and grade is not None)
+    buckets = AssignmentStats.HISTOGRAM_BUCKETS
+    histogram = [0] * buckets
+    if total_points:
+        for grade in grades:
+            histogram[min(int(grade * buckets / total_points), buckets - 1)] += 1
+
+    mean = median = None
+    if grades:
+        mean = (sum(grades) / len(grades)).quantize(CENT)
+        middle = len(grades) // 2
+        median = grades[middle] if len(grades) % 2 else (grades[middle - 1] + grades[middle]) / 2
+        median = median.quantize(CENT)
+
+    return {
+        'submission_count': len(submissions),
+        'graded_count': len(grades),
+        'late_count': sum(1 for _, is_late, _ in submissions if is_late),
+        'mean_grade': mean,
+        'median_grade': median,
+        'histogram': histogram,
+    }
+
+
+def _student_totals(submissions):
+    """
+    Totals of one student in a course from their (status, is_late, grade,
+    total_points) rows
+    """
+    graded = [(grade, points) for status, _, grade, points in submissions if status == 'graded' and grade is not None]
+    return {
+        'submitted_count': len(submissions),
+        'graded_count': len(graded),
+        'late_count': sum(1 for _, is_late, _, _ in submissions if is_late),
+        'points_earned': sum((grade for grade, _ in graded), Decimal(0)).quantize(CENT),
+        'points_possible': sum((points for _, points in graded), Decimal(0)).quantize(CENT),
+    }
+
+
+def compute_course_gradebook(course_id):
+    """
+    Gradebook of a course computed on the fly from its submissions
+    (two queries, O(submissions))
+
+    Returns:
+        dict: {
+            'assignments': {assignment_id: stats dict (STATS_FIELDS)},
+            'students': {student_id: totals dict (TOTAL_FIELDS)},
+        }
+    """
+    total_points = dict(Assignment.objects.filter(course_id=course_id).values_list('id', 'total_points'))
+    by_assignment = defaultdict(list)
+    by_student = defaultdict(list)
+    rows = Submission.objects.filter(assignment__course_id=course_id).values_list(
+        'assignment_id', 'student_id', 'status', 'is_late', 'grade'
+    )
+    for assignment_id, student_id, status, is_late, grade in rows:
+        by_assignment[assignment_id].append((status, is_late, grade))
+        by_student[student_id].append((status, is_late, grade, total_points[assignment_id]))
+
+    return {
+        'assignments': {
+            assignment_id: _assignment_stats(points, by_assignment.get(assignment_id, []))
+            for assignment_id, points in total_points.items()
+        },
+        'students': {student_id: _student_totals(rows) for student_id, rows in by_student.items()},
+    }
+
+
+def _save_assignment_stats(course_id, stats):
+    AssignmentStats.objects.bulk_create(
+        [
+            AssignmentStats(assignment_id=assignment_id, course_id=course_id, **values)
+            for assignment_id, values in stats.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['assignment'],
+        update_fields=STATS_FIELDS + ['course', 'updated_at'],
+    )
+
+
+def _save_student_totals(course_id, totals):
+    StudentCourseTotal.objects.bulk_create(
+        [
+            StudentCourseTotal(course_id=course_id, student_id=student_id, **values)
+            for student_id, values in totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['course', 'student'],
+        update_fields=TOTAL_FIELDS + ['updated_at'],
+    )
+
+
+def _lock_course(course_id):
+    """
+    Serialize gradebook refreshes of a course until the transaction ends, so
+    two of them can't finish out of order and leave the older figures; the
+    course rather than the assignment, as every assignment feeds the
+    student totals
+    """
+    list(Course.objects.select_for_update().filter(pk=course_id).values_list('pk', flat=True))
+
+
+def refresh_gradebook(assignment_id, student_ids, stats=True):
+    """
+    Incrementally update the gradebook after submissions of one assignment
+    changed: the assignment's stats row (unless stats is False) and the
+    given students' course totals are recomputed, nothing else is touched
+    """
+    course_id = Assignment.objects.filter(pk=assignment_id).values_list('course_id', flat=True).first()
+    if course_id is None:
+        # Deleted along with its submissions; the Assignment signal rebuilds the course
+        return
+    student_ids = list(set(student_ids))
+
+    with transaction.atomic():
+        _lock_course(course_id)
+        # Read under the lock, so these are at least as new as the last refresh's
+        if stats:
+            total_points = Assignment.objects.filter(pk=assignment_id).values_list('total_points', flat=True).first()
+            if total_points is None:
+                return
+            rows = list(Submission.objects.filter(assignment_id=assignment_id).values_list('status', 'is_late', 'grade'))
+            _save_assignment_stats(course_id, {assignment_id: _assignment_stats(total_points, rows)})
+
+        by_student = defaultdict(list)
+        if student_ids:
+            rows = Submission.objects.filter(
+                assignment__course_id=course_id, student_id__in=student_ids
+            ).values_list('student_id', 'status', 'is_late', 'grade', 'assignment__total_points')
+            for student_id, *row in rows:
+                by_student[student_id].append(tuple(row))
+        totals = {student_id: _student_totals(rows) for student_id, rows in by_student.items()}
+
+        if totals:
+            _save_student_totals(course_id, totals)
+        gone = set(student_ids) - set(totals)
+        if gone:
+            StudentCourseTotal.objects.filter(course_id=course_id, student_id__in=gone).delete()
+
+
+def rebuild_course_gradebook(course_id):
+    """
+    Recompute every gradebook row of a course from scratch
+    """
+    with transaction.atomic():
+        _lock_course(course_id)
+        gradebook = compute_course_gradebook(course_id)
+        if gradebook['assignments']:
+            _save_assignment_stats(course_id, gradebook['assignments'])
+        if gradebook['students']:
+            _save_student_totals(course_id, gradebook['students'])
+        StudentCourseTotal.objects.filter(course_id=course_id).exclude(
+            student_id__in=list(gradebook['students'])
+        ).delete()
+    return gradebook
+
+
+def _claim(key):
+    """
+    Whether to queue the refresh behind key: False while one is already
+    queued and hasn't started, as that one will see the caller's changes
+    """
+    delay = getattr(settings, 'GRADEBOOK_REFRESH_DELAY', 5)
+    if not delay:
+        return True
+    try:
+        # Expires in case the queued task is lost
+        return cache.add(key, 1, delay + 60)
+    except Exception as e:
+        logger.warning("Gradebook refresh debounce unavailable: %s", e)
+        return True
+
+
+def _release(key):
+    try:
+        cache.delete(key)
+    except Exception as e:
+        logger.warning("Gradebook refresh debounce unavailable: %s", e)
+
+
+def release_stats_refresh(assignment_id):
+    """
+    Called by the queued stats refresh before it reads anything, so changes
+    made from now on queue another one
+    """
+    _release(f"{STATS_REFRESH_KEY_PREFIX}:{assignment_id}")
+
+
+def release_course_rebuild(course_id):
+    _release(f"{REBUILD_KEY_PREFIX}:{course_id}")
+
+
+def schedule_gradebook_refresh(assignment_id, student_ids):
+    """
+    Refresh the gradebook in the background (grading queue)
+
+    The students' totals only read their own submissions and are refreshed
+    right away. The assignment's stats read all of its submissions, so they
+    are refreshed at most once per GRADEBOOK_REFRESH_DELAY seconds however
+    many submissions come in meanwhile (a deadline rush).
+    """
+    from .tasks import refresh_gradebook_task
+
+    student_ids = list(set(student_ids))
+    if student_ids:
+        enqueue(refresh_gradebook_task, str(assignment_id), student_ids, False)
+    if _claim(f"{STATS_REFRESH_KEY_PREFIX}:{assignment_id}"):
+        enqueue(
+            refresh_gradebook_task, str(assignment_id), [], True,
+            countdown=getattr(settings, 'GRADEBOOK_REFRESH_DELAY', 5),
+        )
+
+
+def schedule_course_rebuild(course_id):
+    """
+    Rebuild a course's gradebook in the background (grading queue), at most
+    once per GRADEBOOK_REFRESH_DELAY seconds
+    """
+    from .tasks import rebuild_course_gradebook_task
+
+    if _claim(f"{REBUILD_KEY_PREFIX}:{course_id}"):
+        enqueue(rebuild_course_gradebook_task, str(course_id), countdown=getattr(settings, 'GRADEBOOK_REFRESH_DELAY', 5))
+
+
+def check_course_gradebook(course_id):
+    """
+    Compare the stored gradebook rows of a course with a fresh computation
+
+    Returns:
+        list: descriptions of the rows that differ (empty when consistent)
+    """
+    expected = compute_course_gradebook(course_id)
+    problems = []
+
+    stored = {
+        row['assignment_id']: row
+        for row in AssignmentStats.objects.filter(course_id=course_id).values('assignment_id', *STATS_FIELDS)
+    }
+    for assignment_id, values in expected['assignments'].items():
+        row = stored.pop(assignment_id, None)
+        if row is None:
+            problems.append(f"assignment {assignment_id}: no stats row")
+            continue
+        for field in STATS_FIELDS:
+            if row[field] != values[field]:
+                problems.append(f"assignment {assignment_id}: {field} is {row[field]}, expected {values[field]}")
+    for assignment_id in stored:
+        problems.append(f"assignment {assignment_id}: stats row for an assignment of another course")
+
+    stored = {
+        row['student_id']: row
+        for row in StudentCourseTotal.objects.filter(course_id=course_id).values('student_id', *TOTAL_FIELDS)
+    }
+    for student_id, values in expected['students'].items():
+        row = stored.pop(student_id, None)
+        if row is None:
+            problems.append(f"student {student_id}: no totals row")
+            continue
+        for field in TOTAL_FIELDS:
+            if row[field] != values[field]:
+                problems.append(f"student {student_id}: {field} is {row[field]}, expected {values[field]}")
+    for student_id in stored:
+        problems.append(f"student {student_id}: totals row without submissions")
+
+    return problems
+
+
+def _overview(assignments, students, enrolled):
+    """
+    Course-level figures from per-assignment and per-student rows
+    """
+    submitted = sum(a['submission_count'] for a in assignments)
+    for student in students:
+        possible = student['points_possible']
+        student['percentage'] = (student['points_earned'] * 100 / possible).quantize(CENT) if possible else None
+    percentages = [s['percentage'] for s in students if s['percentage'] is not None]
+    expected = enrolled * len(assignments)
+    return {
+        'assignments': assignments,
+        'students': students,
+        'enrolled_count': enrolled,
+        'average_percentage': (sum(percentages) / len(percentages)).quantize(CENT) if percentages else None,
+        'completion_rate': round(submitted / expected, 4) if expected else None,
+        'late_ratio': round(sum(a['late_count'] for a in assignments) / submitted, 4) if submitted else None,
+    }
+
+
+def get_course_overview(course_id):
+    """
+    Teacher's course overview read from the materialized gradebook
+    (three queries, one row per assignment and per student)
+    """
+    assignments = list(
+        AssignmentStats.objects
+        .filter(course_id=course_id)
+        .order_by('assignment__due_date')
+        .values('assignment_id', 'assignment__name', 'assignment__due_date', 'assignment__total_points',
+                *STATS_FIELDS)
+    )
+    students = list(
+        StudentCourseTotal.objects
+        .filter(course_id=course_id)
+        .order_by('student__username')
+        .values('student_id', 'student__username', 'student__first_name', 'student__last_name', *TOTAL_FIELDS)
+    )
+    enrolled = Enrollment.objects.filter(course_id=course_id, status='enrolled').count()
+    return _overview(assignments, students, enrolled)
+
+
+def compute_course_overview(course_id):
+    """
+    The same overview aggregated on the fly from Submission joined with
+    Assignment and Enrollment; used as the baseline by bench_gradebook
+    """
+    gradebook = compute_course_gradebook(course_id)
+    names = {
+        a['id']: a
+        for a in Assignment.objects.filter(course_id=course_id).values('id', 'name', 'due_date', 'total_points')
+    }
+    assignments = sorted(
+        (
+            {
+                'assignment_id': assignment_id,
+                'assignment__name': names[assignment_id]['name'],
+                'assignment__due_date': names[assignment_id]['due_date'],
+                'assignment__total_points': names[assignment_id]['total_points'],
+                **stats,
+            }
+            for assignment_id, stats in gradebook['assignments'].items()
+        ),
+        key=lambda a: a['assignment__due_date'],
+    )
+    users = {
+        u['id']: u
+        for u in User.objects.filter(pk__in=list(gradebook['students'])).values('id', 'username', 'first_name', 'last_name')
+    }
+    students = sorted(
+        (
+            {
+                'student_id': student_id,
+                'student__username': users[student_id]['username'],
+                'student__first_name': users[student_id]['first_name'],
+                'student__last_name': users[student_id]['last_name'],
+                **totals,
+            }
+            for student_id, totals in gradebook['students'].items()
+        ),
+        key=lambda s: s['student__username'],
+    )
+    enrolled = Enrollment.objects.filter(course_id=course_id, status='enrolled').count()
+    return _overview(assignments, students, enrolled)
@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import transaction
+from .dashboard import invalidate_dashboards
+from .gradebook import schedule_gradebook_refresh
+from .models import Submission
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+STUDENT_COLUMNS = ('student', 'username', 'student_id', 'tu_id')
+
+
+class GradingError(Exception):
+    """
+    A grade sheet that could not be parsed or failed validation; `errors`
+    lists the problems as {'row', 'student', 'error'} dicts
+    """
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid row(s) in grade sheet")
+        self.errors = errors
+
+
+def parse_grade_sheet(data, content_type=''):
+    """
+    Parse a CSV or JSON grade sheet into rows of student, grade and feedback
+
+    CSV needs a header with a student column (student, username, student_id
+    or tu_id), a grade column and optionally a feedback column. JSON is a list
+    of objects with the same keys, or {"grades": [...]}.
+
+    Returns:
+        list: {'row', 'student', 'grade', 'feedback'} dicts; feedback is None
+        when the sheet has none, so existing feedback is kept
+    """
+    text = data.decode('utf-8-sig') if isinstance(data, bytes) else data
+    if 'json' in (content_type or '') or text.lstrip()[:1] in ('[', '{'):
+        return _parse_json(text)
+    return _parse_csv(text)
+
+
+def _parse_json(text):
+    try:
+        items = json.loads(text)
+    except ValueError as e:
+        raise GradingError([{'row': None, 'student': None, 'error': f"Invalid JSON: {str(e)}"}])
+    if isinstance(items, dict):
+        items = items.get('grades')
+    if not isinstance(items, list):
+        raise GradingError([{'row': None, 'student': None, 'error': 'Expected a list of grades'}])
+
+    rows = []
+    for index, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            raise GradingError([{'row': index, 'student': None, 'error': 'Expected an object'}])
+        student = next((item[key] for key in STUDENT_COLUMNS if key in item), None)
+        rows.append({
+            'row': index,
+            'student': str(student).strip() if student is not None else '',
+            'grade': item.get('grade'),
+            'feedback': item.get('feedback'),
+        })
+    return rows
+
+
+def _parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    header = {(name or '').strip().lower(): name for name in reader.fieldnames or []}
+    student_column = next((header[key] for key in STUDENT_COLUMNS if key in header), None)
+    if student_column is None or 'grade' not in header:
+        raise GradingError([{
+            'row': None, 'student': None,
+            'error': 'CSV needs a header with student and grade columns',
+        }])
+
+    rows = []
+    # Row numbers as a spreadsheet shows them (the header is row 1)
+    for index, record in enumerate(reader, start=2):
+        feedback = record.get(header['feedback']) if 'feedback' in header else None
+        rows.append({
+            'row': index,
+            'student': (record.get(student_column) or '').strip(),
+            'grade': record.get(header['grade']),
+            'feedback': feedback,
+        })
+    return rows
+
+
+def _clean_grade(value, total_points):
+    """
+    Grade as a Decimal with at most 2 places within [0, total_points];
+    raises ValueError with a message otherwise
+    """
+    if value is None or str(value).strip() == '':
+        raise ValueError('Grade is required')
+    try:
+        grade = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Grade '{value}' is not a number")
+    if not grade.is_finite() or grade.as_tuple().exponent < -2:
+        raise ValueError(f"Grade '{value}' has more than 2 decimal places")
+    if grade < 0 or grade > total_points:
+        raise ValueError(f"Grade {grade} is outside 0-{total_points}")
+    return grade
+
+
+def apply_grades(assignment, rows, batch_size=None):
+    """
+    Validate a parsed grade sheet and write it in one transaction
+
+    Every row must name a student who has a submission for the assignment
+    and a grade within 0..total_points; if any row fails nothing is written
+    and GradingError lists all problems. Submissions are loaded in one query
+    and changed rows are written with bulk_update (one UPDATE per batch);
+    rows that would not change anything are skipped. The gradebook rows
+    are refreshed by a background task once the transaction commits.
+
+    Returns:
+        dict: {'updated': int, 'unchanged': int}
+    """
+    batch_size = batch_size or getattr(settings, 'GRADING_BULK_BATCH_SIZE', 500)
+    errors = []
+    grades = {}
+    seen = set()
+    for row in rows:
+        student = row['student']
+        if not student:
+            errors.append({'row': row['row'], 'student': student, 'error': 'Student is required'})
+            continue
+        if student in seen:
+            errors.append({'row': row['row'], 'student': student, 'error': 'Student appears more than once'})
+            continue
+        seen.add(student)
+        try:
+            grade = _clean_grade(row['grade'], assignment.total_points)
+        except ValueError as e:
+            errors.append({'row': row['row'], 'student': student, 'error': str(e)})
+            continue
+        feedback = row['feedback']
+        grades[student] = (row['row'], grade, None if feedback is None else str(feedback))
+
+    with transaction.atomic():
+        submissions = {
+            submission.student.username: submission
+            for submission in Submission.objects
+            .filter(assignment=assignment, student__username__in=list(grades))
+            .select_related('student')
+            .only('id', 'grade', 'feedback', 'status', 'student__username')
+        }
+        for student, (row_number, _, _) in grades.items():
+            if student not in submissions:
+                errors.append({'row': row_number, 'student': student, 'error': 'No submission for this assignment'})
+        if errors:
+            raise GradingError(sorted(errors, key=lambda e: e['row'] or 0))
+
+        changed = []
+        for student, (_, grade, feedback) in grades.items():
+            submission = submissions[student]
+            values = {'grade': grade, 'status': 'graded'}
+            if feedback is not None:
+                values['feedback'] = feedback
+            if any(getattr(submission, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(submission, field, value)
+                changed.append(submission)
+
+        if changed:
+            Submission.objects.bulk_update(changed, ['grade', 'feedback', 'status'], batch_size=batch_size)
+            student_ids = [submission.student_id for submission in changed]
+            # bulk_update sends no post_save, so do what the signal handlers would
+            transaction.on_commit(lambda: invalidate_dashboards(student_ids))
+            transaction.on_commit(lambda: schedule_gradebook_refresh(assignment.pk, student_ids))
+
+    logger.info(
+        "Graded %s: %s updated, %s unchanged", assignment.pk, len(changed), len(grades) - len(changed)
+    )
+    return {'updated': len(changed), 'unchanged': len(grades) - len(changed)}
@@ -0,0 +1,46 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assignments.autograde import AutogradeError, clean_suite, grade_submissions
+from assignments.models import Assignment, TestSuite
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a code assignment\'s test suite on its submissions now and write the grades. Sources '
+        'already run against the same suite come from the result cache unless --force is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('assignment_id', help='UUID of the assignment')
+        parser.add_argument('--suite', help='JSON test suite file to install first')
+        parser.add_argument('--workers', type=int, default=None, help='Sandboxes at once (default AUTOGRADE_WORKERS)')
+        parser.add_argument('--force', action='store_true', help='Ignore cached results')
+
+    def handle(self, *args, **options):
+        assignment = Assignment.objects.filter(pk=options['assignment_id']).first()
+        if assignment is None:
+            raise CommandError(f'No assignment {options["assignment_id"]}')
+        if options['suite']:
+            try:
+                with open(options['suite']) as f:
+                    values = clean_suite(json.load(f))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["suite"]}: {e}')
+            except AutogradeError as e:
+                raise CommandError(f'Invalid test suite: {"; ".join(e.errors)}')
+            TestSuite.objects.update_or_create(assignment=assignment, defaults=values)
+
+        started = time.perf_counter()
+        try:
+            summary = grade_submissions(assignment, workers=options['workers'], force=options['force'])
+        except AutogradeError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{assignment}: graded {summary["graded"]} submission(s) in {elapsed:.1f}s '
+            f'({summary["executed"]} run, {summary["cached"]} cached; '
+            f'{summary["updated"]} updated, {summary["unchanged"]} unchanged)'
+        ))
@@ -0,0 +1,179 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from assignments.models import Assignment, Submission
+from courses.models import Course, Enrollment
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a realistic volume of courses/assignments/submissions and compare query plans '
+        'and timings of the hot assignment/submission queries without and with the composite '
+        'and partial indexes. Runs in a transaction that is rolled back unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--courses', type=int, default=500)
+        parser.add_argument('--assignments-per-course', type=int, default=10)
+        parser.add_argument('--submissions', type=int, default=200000)
+        parser.add_argument('--courses-per-student', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=50, help='Executions per query when timing')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded data instead of rolling back')
+        parser.add_argument('--no-plans', action='store_true', help="Don't print query plans")
+
+    def handle(self, *args, **options):
+        self.options = options
+        try:
+            with transaction.atomic():
+                sample = self._seed()
+                self._analyze()
+
+                self.stdout.write(self.style.MIGRATE_HEADING('Without new indexes'))
+                self._toggle_indexes(drop=True)
+                before = self._measure(sample)
+
+                self.stdout.write(self.style.MIGRATE_HEADING('With new indexes'))
+                self._toggle_indexes(drop=False)
+                after = self._measure(sample)
+
+                self.stdout.write(self.style.MIGRATE_HEADING('Summary (mean ms per query)'))
+                for label in before:
+                    speedup = before[label] / after[label] if after[label] else float('inf')
+                    self.stdout.write(
+                        f'{label:<34} {before[label] * 1000:9.3f} -> {after[label] * 1000:9.3f}  ({speedup:.1f}x)'
+                    )
+
+                if not options['keep']:
+                    raise _Rollback()
+        except _Rollback:
+            self.stdout.write('Seeded data rolled back')
+
+    def _seed(self):
+        opts = self.options
+        rng = random.Random(42)
+        now = timezone.now()
+        started = time.perf_counter()
+        tag = f'bench{int(time.time())}'
+        password = make_password(None)
+
+        students = User.objects.bulk_create(
+            [User(username=f'{tag}_s{i}', password=password) for i in range(opts['students'])],
+            batch_size=2000,
+        )
+        courses = Course.objects.bulk_create(
+            [
+                Course(name=f'Course {i}', code=f'B{i:04d}', term='2025/1', year=2025,
+                       faculty=f'Faculty {i % 10}', department=f'Dept {i % 40}')
+                for i in range(opts['courses'])
+            ],
+            batch_size=2000,
+        )
+
+        roster = {course.pk: [] for course in courses}
+        enrollments = []
+        for student in students:
+            for course in rng.sample(courses, min(opts['courses_per_student'], len(courses))):
+                roster[course.pk].append(student)
+                enrollments.append(Enrollment(student=student, course=course))
+        Enrollment.objects.bulk_create(enrollments, batch_size=5000)
+
+        assignments = []
+        for course in courses:
+            for j in range(opts['assignments_per_course']):
+                available_from = now + timedelta(days=rng.randint(-60, 30))
+                assignments.append(Assignment(
+                    course=course, name=f'Assignment {j}',
+                    available_from=available_from,
+                    due_date=available_from + timedelta(days=rng.randint(1, 21)),
+                    total_points=100,
+                ))
+        Assignment.objects.bulk_create(assignments, batch_size=5000)
+
+        per_assignment = max(1, opts['submissions'] // max(1, len(assignments)))
+        submissions = []
+        for assignment in assignments:
+            for student in roster[assignment.course_id][:per_assignment]:
+                is_late = rng.random() < 0.1
+                graded = rng.random() < 0.6
+                submissions.append(Submission(
+                    assignment=assignment, student=student, text_content='...',
+                    is_late=is_late,
+                    status='graded' if graded else ('late' if is_late else 'submitted'),
+                    grade=rng.randint(0, 100) if graded else None,
+                ))
+                if len(submissions) >= 10000:
+                    Submission.objects.bulk_create(submissions)
+                    submissions = []
+        Submission.objects.bulk_create(submissions)
+
+        self.stdout.write(
+            f'Seeded {len(students)} students, {len(courses)} courses, {len(assignments)} assignments, '
+            f'{Submission.objects.filter(assignment__course__in=courses).count()} submissions '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+        busiest = max(assignments, key=lambda a: len(roster[a.course_id]))
+        return {'course': courses[len(courses) // 2], 'assignment': busiest, 'now': now}
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _toggle_indexes(self, drop):
+        # Build the DDL without entering the schema editor, which SQLite refuses
+        # to do inside the surrounding transaction
+        editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        with connection.cursor() as cursor:
+            for model in (Assignment, Submission):
+                for index in model._meta.indexes:
+                    if drop:
+                        statement = editor.sql_delete_index % {
+                            'table': editor.quote_name(model._meta.db_table),
+                            'name': editor.quote_name(index.name),
+                        }
+                    else:
+                        statement = str(index.create_sql(model, editor))
+                    cursor.execute(statement)
+        self._analyze()
+
+    def _queries(self, sample):
+        course = sample['course']
+        assignment = sample['assignment']
+        now = sample['now']
+        return {
+            'course assignments by due_date': Assignment.objects.filter(course=course).order_by('due_date'),
+            'currently available assignments': Assignment.objects.filter(
+                available_from__lte=now, due_date__gte=now
+            ),
+            'ungraded submissions (grading q)': Submission.objects.filter(
+                assignment=assignment
+            ).exclude(status='graded').order_by('submitted_at'),
+            'late submissions per course': Submission.objects.filter(
+                assignment__course=course, is_late=True
+            ),
+        }
+
+    def _measure(self, sample):
+        results = {}
+        for label, queryset in self._queries(sample).items():
+            if not self.options['no_plans']:
+                self.stdout.write(f'-- {label}')
+                self.stdout.write(queryset.explain())
+            list(queryset)  # warm up
+            start = time.perf_counter()
+            for _ in range(self.options['repeat']):
+                list(queryset.all())
+            results[label] = (time.perf_counter() - start) / self.options['repeat']
+            self.stdout.write(f'{label:<34} {results[label] * 1000:9.3f} ms')
+        return results
@@ -0,0 +1,128 @@
+import os
+import random
+import shlex
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from assignments.autograde import AutogradeError, grade_submissions, suite_hash, suite_spec
+from assignments.models import Assignment, GradingResult, Submission, TestSuite
+from courses.models import Course, Enrollment
+
+# Sum of 1..n; most students get it right, some in a slow or wrong way
+PROGRAMS = [
+    (0.45, 'n = int(input())\nprint(n * (n + 1) // 2)\n'),
+    (0.25, 'n = int(input())\ntotal = 0\nfor i in range(1, n + 1):\n    total += i\nprint(total)\n'),
+    (0.12, 'n = int(input())\nprint(sum(range(n)))\n'),
+    (0.10, 'values = list(map(int, input().split()))\nprint(values[1])\n'),
+    (0.05, 'import sys\nn = int(sys.stdin.readline())\nprint(n * n)\n'),
+    (0.03, 'n = int(input())\nwhile n:\n    n = n\n'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Throughput of the auto-grader on one code assignment: grades N submissions (a share of '
+        'them identical copies) with 1, 2, 4, ... sandboxes at once from a cold result cache, '
+        'then again with a warm one. Creates its own course, students and submissions '
+        '(committed) and deletes them afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        cpus = os.cpu_count() or 1
+        parser.add_argument('--submissions', type=int, default=300)
+        parser.add_argument('--copies', type=float, default=0.3, help='Share of submissions identical to another')
+        parser.add_argument('--cases', type=int, default=5, help='Test cases in the suite')
+        parser.add_argument('--time-limit', type=float, default=1.0, help='CPU seconds per case')
+        parser.add_argument('--workers', default=','.join(str(w) for w in sorted({1, 2, 4, cpus, cpus * 2})),
+                            help='Comma-separated sandbox counts to compare')
+        parser.add_argument('--prefix', help='Sandbox command (default AUTOGRADE_SANDBOX_PREFIX)')
+        parser.add_argument('--user', help='Sandbox user (default AUTOGRADE_SANDBOX_USER)')
+        parser.add_argument('--seed', type=int, default=3)
+        parser.add_argument('--keep', action='store_true', help="Don't delete the test data")
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options['prefix'] is not None:
+            overrides['AUTOGRADE_SANDBOX_PREFIX'] = shlex.split(options['prefix'])
+        if options['user'] is not None:
+            overrides['AUTOGRADE_SANDBOX_USER'] = options['user']
+        with override_settings(**overrides):
+            try:
+                self._run(options)
+            except AutogradeError as e:
+                raise CommandError(str(e))
+
+    def _run(self, options):
+        assignment, students = self._setup(options)
+        suite = TestSuite.objects.get(assignment=assignment)
+        digest = suite_hash(suite_spec(suite))
+        try:
+            self.stdout.write(
+                f'{options["submissions"]} submissions, {options["cases"]} cases, {os.cpu_count()} CPU(s)'
+            )
+            self.stdout.write(f'{"sandboxes":>9} {"cold s":>8} {"subs/s":>8} {"runs":>6} {"cases/s":>8} {"warm s":>8}')
+            for workers in [int(w) for w in options['workers'].split(',')]:
+                GradingResult.objects.filter(suite_hash=digest).delete()
+                started = time.perf_counter()
+                cold = grade_submissions(assignment, workers=workers)
+                cold_s = time.perf_counter() - started
+
+                started = time.perf_counter()
+                warm = grade_submissions(assignment, workers=workers)
+                warm_s = time.perf_counter() - started
+                assert warm['executed'] == 0
+
+                self.stdout.write(
+                    f'{workers:>9} {cold_s:>8.1f} {cold["graded"] / cold_s:>8.1f} {cold["executed"]:>6} '
+                    f'{cold["executed"] * options["cases"] / cold_s:>8.1f} {warm_s:>8.2f}'
+                )
+
+            full = Submission.objects.filter(assignment=assignment, grade=assignment.total_points).count()
+            self.stdout.write(f'{full} of {options["submissions"]} submissions got full marks')
+        finally:
+            if not options['keep']:
+                GradingResult.objects.filter(suite_hash=digest).delete()
+                assignment.course.delete()
+                User.objects.filter(pk__in=[s.pk for s in students]).delete()
+
+    def _setup(self, options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        tag = f'autograde{int(time.time())}'
+        course = Course.objects.create(name='Auto-grader benchmark', code=tag[:20], term='bench', year=now.year)
+        assignment = Assignment.objects.create(
+            course=course, name='Sum to n', submission_type='code', total_points=10,
+            available_from=now - timedelta(days=1), due_date=now + timedelta(days=1),
+        )
+        cases = []
+        for i in range(options['cases']):
+            n = rng.randint(1, 10 ** 6)
+            cases.append({'name': f'n={n}', 'stdin': f'{n}\n', 'expected_output': f'{n * (n + 1) // 2}\n', 'points': 1})
+        TestSuite.objects.create(assignment=assignment, cases=cases, time_limit=options['time_limit'])
+
+        password = make_password(None)
+        students = User.objects.bulk_create(
+            [User(username=f'{tag}_{i}', password=password) for i in range(options['submissions'])]
+        )
+        Enrollment.objects.bulk_create([Enrollment(student=s, course=course) for s in students])
+
+        weights = [weight for weight, _ in PROGRAMS]
+        sources = []
+        for i, student in enumerate(students):
+            if sources and rng.random() < options['copies']:
+                sources.append(rng.choice(sources))
+                continue
+            program = rng.choices(PROGRAMS, weights)[0][1]
+            # Students' own variable names and comments make most sources distinct
+            sources.append(f'# {student.username}\n{program}')
+        Submission.objects.bulk_create([
+            Submission(assignment=assignment, student=student, text_content=source, submitted_at=now)
+            for student, source in zip(students, sources)
+        ])
+        return assignment, students
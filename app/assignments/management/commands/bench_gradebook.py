@@ -0,0 +1,103 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from assignments.gradebook import compute_course_overview, get_course_overview, rebuild_course_gradebook
+from assignments.models import Assignment, Submission
+from courses.models import Course, Enrollment
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed one course and compare the teacher's course overview aggregated on the fly from "
+        'submissions with the same overview read from the materialized gradebook. Runs in a '
+        'transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--assignments', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                course = self._seed(options)
+
+                started = time.perf_counter()
+                rebuild_course_gradebook(course.pk)
+                self.stdout.write(f'Full rebuild: {(time.perf_counter() - started) * 1000:.1f} ms')
+
+                live = self._measure('on the fly', compute_course_overview, course.pk, options['repeat'])
+                stored = self._measure('materialized', get_course_overview, course.pk, options['repeat'])
+                self.stdout.write(f'Speedup: {live / stored:.1f}x')
+
+                submission = Submission.objects.filter(assignment__course=course).first()
+                submission.grade = 50
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    submission.save()
+                    # Run the on_commit gradebook refresh now instead of at the (rolled back) commit
+                    for _, callback, _ in connection.run_on_commit:
+                        callback()
+                    connection.run_on_commit = []
+                self.stdout.write(
+                    f'Incremental update after one grade: {(time.perf_counter() - started) * 1000:.1f} ms, '
+                    f'{len(queries)} queries'
+                )
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write('Seeded data rolled back')
+
+    def _seed(self, options):
+        rng = random.Random(42)
+        now = timezone.now()
+        tag = f'gb{int(time.time())}'
+        password = make_password(None)
+
+        course = Course.objects.create(name='Gradebook bench', code='GB101', term='2025/1', year=2025)
+        students = User.objects.bulk_create(
+            [User(username=f'{tag}_s{i}', password=password) for i in range(options['students'])]
+        )
+        Enrollment.objects.bulk_create([Enrollment(student=s, course=course) for s in students])
+        assignments = Assignment.objects.bulk_create([
+            Assignment(course=course, name=f'Assignment {i}', total_points=100,
+                       available_from=now - timedelta(days=30), due_date=now + timedelta(days=i))
+            for i in range(options['assignments'])
+        ])
+        submissions = []
+        for assignment in assignments:
+            for student in students:
+                if rng.random() < 0.9:
+                    graded = rng.random() < 0.7
+                    submissions.append(Submission(
+                        assignment=assignment, student=student, is_late=rng.random() < 0.1,
+                        status='graded' if graded else 'submitted',
+                        grade=rng.randint(0, 100) if graded else None,
+                    ))
+        Submission.objects.bulk_create(submissions, batch_size=5000)
+        self.stdout.write(
+            f'Seeded {len(students)} students, {len(assignments)} assignments, {len(submissions)} submissions'
+        )
+        return course
+
+    def _measure(self, label, overview, course_id, repeat):
+        with CaptureQueriesContext(connection) as queries:
+            overview(course_id)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            overview(course_id)
+        elapsed = (time.perf_counter() - started) / repeat
+        self.stdout.write(f'{label:<14} {elapsed * 1000:9.2f} ms per overview, {len(queries)} queries')
+        return elapsed
@@ -0,0 +1,199 @@
+import csv
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from assignments.exports import HEADERS, export_rows, stream_export
+from assignments.models import Assignment, Submission
+from courses.models import Course
+
+MODES = ('csv', 'xlsx', 'naive')
+SUBMISSIONS_PER_COURSE = 5000
+ASSIGNMENTS_PER_COURSE = 10
+
+
+def _memory_mib(field):
+    """
+    VmRSS (now) or VmHWM (peak) of this process; unlike ru_maxrss, the peak
+    doesn't carry over the parent's from before the exec
+    """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(f'{field}:'):
+                return int(line.split()[1]) / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Peak RSS, time to first byte and query count of the gradebook export as the number of '
+        'rows grows: streamed CSV and XLSX (assignments.exports) vs loading the queryset and '
+        'building the CSV in memory. One faculty per size; every export runs in its own process '
+        'so its peak RSS is its own, so it needs a database the child processes can share (not '
+        ':memory:). Creates its own courses, students and submissions (committed) and deletes '
+        'them afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,50000,200000', help='Submissions per export')
+        parser.add_argument('--modes', default=','.join(MODES))
+        parser.add_argument('--seed', type=int, default=11)
+        parser.add_argument('--keep', action='store_true', help="Don't delete the test data")
+        # Internal: run one export in this process and print its numbers as JSON
+        parser.add_argument('--child', choices=MODES, help='(internal)')
+        parser.add_argument('--faculty', help='(internal)')
+
+    def handle(self, *args, **options):
+        if options['child']:
+            self._child(options)
+            return
+
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        faculties, courses, students = self._setup(sizes, options)
+        try:
+            self.stdout.write(
+                f'{"rows":>8} {"mode":<6} {"queries":>8} {"TTFB ms":>9} {"total s":>8} {"rows/s":>8} '
+                f'{"MiB out":>8} {"peak RSS MiB":>13} {"over base":>10}'
+            )
+            for size, faculty in zip(sizes, faculties):
+                for mode in options['modes'].split(','):
+                    result = self._spawn(mode, faculty)
+                    self.stdout.write(
+                        f'{result["rows"]:>8} {mode:<6} {result["queries"]:>8} {result["ttfb"] * 1000:>9.0f} '
+                        f'{result["total"]:>8.2f} {result["rows"] / result["total"]:>8.0f} '
+                        f'{result["bytes"] / 2 ** 20:>8.1f} {result["peak_rss"]:>13.1f} '
+                        f'{result["peak_rss"] - result["base_rss"]:>10.1f}'
+                    )
+        finally:
+            if options['keep']:
+                self.stdout.write(f'Kept faculties {", ".join(faculties)}')
+            else:
+                Course.objects.filter(pk__in=[c.pk for c in courses]).delete()
+                User.objects.filter(pk__in=[s.pk for s in students]).delete()
+
+    def _spawn(self, mode, faculty):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_gradebook_export',
+            '--child', mode, '--faculty', faculty,
+        ]
+        completed = subprocess.run(command, capture_output=True, text=True, check=True)
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def _child(self, options):
+        filters = {'faculty': options['faculty']}
+        base_rss = _memory_mib('VmRSS')
+        started = time.perf_counter()
+        ttfb = None
+        sent = 0
+        rows = 0
+
+        def counted(items):
+            nonlocal rows
+            for item in items:
+                rows += 1
+                yield item
+
+        with CaptureQueriesContext(connection) as queries:
+            if options['child'] == 'naive':
+                content = [self._naive_csv(filters)]
+            else:
+                content = stream_export(counted(export_rows(filters)), options['child'])
+            # Drain the body the way the WSGI server would
+            for part in content:
+                if ttfb is None and part:
+                    ttfb = time.perf_counter() - started
+                sent += len(part)
+        if options['child'] == 'naive':
+            rows = self._naive_rows
+        self.stdout.write(json.dumps({
+            'rows': rows,
+            'queries': len(queries),
+            'ttfb': ttfb,
+            'total': time.perf_counter() - started,
+            'bytes': sent,
+            'base_rss': base_rss,
+            'peak_rss': _memory_mib('VmHWM'),
+        }))
+
+    def _naive_csv(self, filters):
+        """
+        The usual way: model instances with their relations, then the whole
+        CSV in one string
+        """
+        submissions = list(
+            Submission.objects.filter(assignment__course__faculty=filters['faculty'])
+            .select_related('assignment__course', 'student__profile')
+            .order_by('assignment__course__code', 'assignment__due_date', 'student__username')
+        )
+        self._naive_rows = len(submissions)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(HEADERS)
+        for s in submissions:
+            course = s.assignment.course
+            profile = getattr(s.student, 'profile', None)
+            writer.writerow([
+                course.faculty, course.department, course.year, course.term, course.code, course.name,
+                s.assignment.name, s.assignment.due_date, s.assignment.total_points,
+                profile.tu_id if profile else '', s.student.username, s.student.first_name,
+                s.student.last_name, s.status, s.submitted_at, s.is_late, s.grade,
+            ])
+        return buffer.getvalue().encode('utf-8')
+
+    def _setup(self, sizes, options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        tag = f'export{int(time.time())}'
+        per_assignment = SUBMISSIONS_PER_COURSE // ASSIGNMENTS_PER_COURSE
+        password = make_password(None)
+        students = User.objects.bulk_create([
+            User(username=f'{tag}_{i}', first_name=f'Student{i}', last_name='Benchmark', password=password)
+            for i in range(per_assignment)
+        ])
+
+        faculties, courses = [], []
+        for index, size in enumerate(sizes):
+            faculty = f'{tag}-{index}'
+            faculties.append(faculty)
+            remaining = size
+            for number in range(math.ceil(size / SUBMISSIONS_PER_COURSE)):
+                course = Course.objects.create(
+                    name=f'Export benchmark {number}', code=f'EX{index}{number:04d}', term='1',
+                    year=now.year, faculty=faculty, department=f'Department {number % 7}',
+                )
+                courses.append(course)
+                assignments = Assignment.objects.bulk_create([
+                    Assignment(
+                        course=course, name=f'Assignment {a}', submission_type='text', total_points=10,
+                        available_from=now - timedelta(days=30), due_date=now - timedelta(days=20 - a),
+                    )
+                    for a in range(ASSIGNMENTS_PER_COURSE)
+                ])
+                batch = []
+                for assignment in assignments:
+                    for student in students[:min(per_assignment, remaining)]:
+                        graded = rng.random() < 0.8
+                        batch.append(Submission(
+                            assignment=assignment, student=student, text_content='answer',
+                            submitted_at=now - timedelta(days=rng.randint(20, 30)),
+                            is_late=rng.random() < 0.1,
+                            status='graded' if graded else 'submitted',
+                            grade=Decimal(rng.randint(0, 1000)) / 100 if graded else None,
+                        ))
+                    remaining -= min(per_assignment, remaining)
+                Submission.objects.bulk_create(batch, batch_size=2000)
+        return faculties, courses, students
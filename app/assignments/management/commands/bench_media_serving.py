@@ -0,0 +1,64 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import FileResponse
+from django.test import RequestFactory, override_settings
+
+from assignments.media import serve_protected_file
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the worker time spent serving a submission file with a plain FileResponse '
+        '(the whole body streamed through Python) against an X-Accel-Redirect response '
+        '(headers only; nginx sends the bytes).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=50, help='Size of the test file in MiB')
+        parser.add_argument('--requests', type=int, default=20)
+
+    def handle(self, *args, **options):
+        size = options['size_mb'] * 2 ** 20
+        count = options['requests']
+        factory = RequestFactory()
+
+        with tempfile.TemporaryDirectory() as media_root:
+            name = 'submissions/bench/report.pdf'
+            path = os.path.join(media_root, name)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                chunk = os.urandom(2 ** 20)
+                for _ in range(options['size_mb']):
+                    f.write(chunk)
+
+            def file_response(request):
+                return FileResponse(open(path, 'rb'), as_attachment=True)
+
+            def protected(request):
+                return serve_protected_file(request, name)
+
+            self.stdout.write(f'{count} downloads of a {options["size_mb"]} MiB file')
+            with override_settings(MEDIA_ROOT=media_root, SUBMISSION_XACCEL_REDIRECT=False):
+                self._run('FileResponse', file_response, factory.get('/'), count, size)
+                self._run('streamed (ETag/Range)', protected, factory.get('/'), count, size)
+                self._run('streamed, Range 1 MiB', protected,
+                          factory.get('/', HTTP_RANGE='bytes=0-1048575'), count, 2 ** 20)
+            with override_settings(MEDIA_ROOT=media_root, SUBMISSION_XACCEL_REDIRECT=True):
+                self._run('X-Accel-Redirect', protected, factory.get('/'), count, 0)
+
+    def _run(self, label, view, request, count, expected):
+        started = time.perf_counter()
+        for _ in range(count):
+            response = view(request)
+            # Drain the body the way the WSGI server would
+            sent = sum(len(part) for part in response)
+            response.close()
+            assert sent == expected, f'{label}: sent {sent} bytes, expected {expected}'
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{label:<24} {elapsed / count * 1000:9.2f} ms/request of worker time '
+            f'({sent / 2 ** 20:.1f} MiB through Python each)'
+        )
@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from assignments.similarity import NUM_PERM, candidate_pairs, signature_of, similar_pairs
+
+
+class Command(BaseCommand):
+    help = (
+        'Scaling of the similarity check with the number of submissions: MinHash time per '
+        'submission, LSH candidate search vs comparing every pair of signatures, and the share of '
+        'planted near-duplicates found. Synthetic essays, in memory; no database needed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,250,500,1000,2000,5000', help='Submission counts')
+        parser.add_argument('--words', type=int, default=400, help='Words per essay')
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--dup-rate', type=float, default=0.05, help='Share of essays that are edited copies')
+        parser.add_argument('--edit-rate', type=float, default=0.05, help='Share of words changed in a copy')
+        parser.add_argument('--threshold', type=float, default=0.5)
+        parser.add_argument('--brute-max', type=int, default=5000, help='Skip all-pairs above this size')
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        vocabulary = np.array([f'w{i}' for i in range(options['vocabulary'])])
+        # Zipf-like word frequencies, like real text
+        weights = 1 / np.arange(1, len(vocabulary) + 1)
+        weights /= weights.sum()
+
+        self.stdout.write(
+            f'{"n":>6} {"hash ms/doc":>12} {"LSH ms":>9} {"candidates":>11} {"pairs":>6} '
+            f'{"all-pairs ms":>13} {"planted found":>14} {"vs all-pairs":>13}'
+        )
+        for n in [int(size) for size in options['sizes'].split(',')]:
+            texts, planted = self._essays(n, vocabulary, weights, rng, options)
+
+            started = time.perf_counter()
+            signatures = np.stack([signature_of(text)[0] for text in texts])
+            hash_ms = (time.perf_counter() - started) * 1000 / n
+
+            started = time.perf_counter()
+            candidates = candidate_pairs(signatures)
+            found = {(i, j) for i, j, _ in similar_pairs(signatures, options['threshold'], candidates)}
+            lsh_ms = (time.perf_counter() - started) * 1000
+
+            brute_ms, agreement = float('nan'), 'skipped'
+            if n <= options['brute_max']:
+                started = time.perf_counter()
+                expected = self._all_pairs(signatures, options['threshold'])
+                brute_ms = (time.perf_counter() - started) * 1000
+                agreement = f'{len(found & expected) / len(expected):.1%}' if expected else 'n/a'
+
+            recall = f'{len(found & planted) / len(planted):.1%}' if planted else 'n/a'
+            self.stdout.write(
+                f'{n:>6} {hash_ms:>12.2f} {lsh_ms:>9.1f} {len(candidates):>11} {len(found):>6} '
+                f'{brute_ms:>13.1f} {recall:>14} {agreement:>13}'
+            )
+
+    def _essays(self, n, vocabulary, weights, rng, options):
+        """
+        n essays, of which dup_rate are edited copies of another; returns
+        (texts, set of planted (original, copy) index pairs)
+        """
+        copies = int(n * options['dup_rate'])
+        originals = n - copies
+        words = rng.choice(len(vocabulary), size=(originals, options['words']), p=weights)
+        texts = [' '.join(vocabulary[row]) for row in words]
+        planted = set()
+        for k in range(copies):
+            source = int(rng.integers(originals))
+            row = words[source].copy()
+            edits = rng.random(len(row)) < options['edit_rate']
+            row[edits] = rng.choice(len(vocabulary), size=int(edits.sum()), p=weights)
+            planted.add((source, originals + k))
+            texts.append(' '.join(vocabulary[row]))
+        return texts, planted
+
+    def _all_pairs(self, signatures, threshold, block=32):
+        """
+        Every pair at or above threshold by comparing all n^2 signatures
+        """
+        n = len(signatures)
+        pairs = set()
+        for start in range(0, n, block):
+            similarity = (signatures[start:start + block, np.newaxis, :] == signatures[np.newaxis, :, :]).sum(axis=2)
+            rows, cols = np.nonzero(similarity >= threshold * NUM_PERM)
+            pairs.update((start + i, j) for i, j in zip(rows.tolist(), cols.tolist()) if start + i < j)
+        return pairs
@@ -0,0 +1,146 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, models, transaction
+from django.utils import timezone
+
+from ams.ids import uuid7
+
+GENERATORS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Insert throughput and primary key index size with random (uuid4) vs time-ordered (uuid7) '
+        'keys. Inserts submission-shaped rows (uuid key, assignment, student, timestamp, unique '
+        '(assignment, student)) in committed batches into a scratch table per generator, then '
+        'reports rows/s and the size and fill of the key index. Works on Postgres and SQLite; the '
+        'scratch tables are dropped afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per committed INSERT batch')
+        parser.add_argument('--assignments', type=int, default=200, help='Assignments the rows are spread over')
+        parser.add_argument('--only', choices=list(GENERATORS), help='Run a single generator')
+        parser.add_argument('--keep', action='store_true', help="Don't drop the scratch tables")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'Index sizes are only measured on Postgres and SQLite, not {connection.vendor}')
+        kinds = [options['only']] if options['only'] else list(GENERATORS)
+
+        results = {}
+        for kind in kinds:
+            table = f'bench_uuid_keys_{kind}'
+            self._create_table(table)
+            try:
+                elapsed = self._insert(table, GENERATORS[kind], options)
+                results[kind] = (options['rows'] / elapsed, *self._index_size(table))
+            finally:
+                if not options['keep']:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'DROP TABLE {connection.ops.quote_name(table)}')
+            rate, size, fill, rebuilt = results[kind]
+            self.stdout.write(f'{kind}: {rate:,.0f} rows/s, key index {size / 2 ** 20:.1f} MiB')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{options["rows"]:,} rows on {connection.vendor}, batches of {options["batch_size"]}'
+        ))
+        self.stdout.write(f'{"keys":<6} {"rows/s":>10} {"index MiB":>10} {"leaf fill":>10} {"rebuilt MiB":>12}')
+        for kind, (rate, size, fill, rebuilt) in results.items():
+            self.stdout.write(
+                f'{kind:<6} {rate:>10,.0f} {size / 2 ** 20:>10.1f} '
+                f'{f"{fill:.0%}" if fill is not None else "n/a":>10} {rebuilt / 2 ** 20:>12.1f}'
+            )
+
+    def _create_table(self, table):
+        uuid_type = models.UUIDField().db_type(connection)
+        time_type = models.DateTimeField().db_type(connection)
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {qn(table)}')
+            cursor.execute(
+                f'CREATE TABLE {qn(table)} ('
+                f'id {uuid_type} NOT NULL PRIMARY KEY, '
+                f'assignment_id {uuid_type} NOT NULL, '
+                f'student_id integer NOT NULL, '
+                f'submitted_at {time_type} NOT NULL, '
+                f'text_content text NOT NULL, '
+                f'UNIQUE (assignment_id, student_id))'
+            )
+
+    def _insert(self, table, generate, options):
+        """
+        Seconds to insert options['rows'] rows, one transaction per batch,
+        the way submissions arrive during a deadline
+        """
+        field = models.UUIDField()
+        prep = lambda value: field.get_db_prep_value(value, connection)
+        rng = random.Random(42)
+        assignments = [prep(uuid.uuid4()) for _ in range(options['assignments'])]
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        sql = (
+            f'INSERT INTO {connection.ops.quote_name(table)} '
+            f'(id, assignment_id, student_id, submitted_at, text_content) VALUES (%s, %s, %s, %s, %s)'
+        )
+
+        rows, batch_size = options['rows'], options['batch_size']
+        elapsed = 0.0
+        for start in range(0, rows, batch_size):
+            # Keys are generated as the rows arrive, inside the timed section
+            count = min(batch_size, rows - start)
+            students = range(start, start + count)
+            started = time.perf_counter()
+            batch = [
+                (prep(generate()), assignments[i % len(assignments)], i, now, 'x' * rng.randint(20, 200))
+                for i in students
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            elapsed += time.perf_counter() - started
+        return elapsed
+
+    def _index_size(self, table):
+        """
+        (bytes, share of the leaf pages in use or None, bytes once rebuilt) of
+        the primary key index
+        """
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                constraints = connection.introspection.get_constraints(cursor, table)
+                index = next(name for name, info in constraints.items() if info['primary_key'])
+                cursor.execute('SELECT pg_relation_size(%s::regclass)', [index])
+                size = cursor.fetchone()[0]
+                fill = None
+                try:
+                    cursor.execute('SELECT avg_leaf_density FROM pgstatindex(%s::regclass)', [index])
+                    fill = cursor.fetchone()[0] / 100
+                except DatabaseError:
+                    # pgstattuple isn't installed
+                    pass
+                cursor.execute(f'REINDEX INDEX {connection.ops.quote_name(index)}')
+                cursor.execute('SELECT pg_relation_size(%s::regclass)', [index])
+                return size, fill, cursor.fetchone()[0]
+
+            # SQLite names the index behind a non-integer PRIMARY KEY sqlite_autoindex_<table>_1
+            index = f'sqlite_autoindex_{table}_1'
+            size, fill = self._sqlite_index_stats(cursor, index)
+            cursor.execute(f'REINDEX {connection.ops.quote_name(index)}')
+            # REINDEX frees pages but keeps them in the file; dbstat counts the index's own pages
+            rebuilt, _ = self._sqlite_index_stats(cursor, index)
+            return size, fill, rebuilt
+
+    def _sqlite_index_stats(self, cursor, index):
+        cursor.execute(
+            "SELECT SUM(pgsize), SUM(pgsize - unused) FROM dbstat WHERE name = %s AND pagetype = 'leaf'",
+            [index],
+        )
+        leaf_size, leaf_used = cursor.fetchone()
+        cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [index])
+        return cursor.fetchone()[0], leaf_used / leaf_size if leaf_size else None
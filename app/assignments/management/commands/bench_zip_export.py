@@ -0,0 +1,204 @@
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.test import override_settings
+from django.utils import timezone
+
+from assignments.archive import stream_archive, submission_files
+from assignments.models import Assignment, Submission
+from courses.models import Course, Enrollment
+
+MODES = ('streaming', 'memory', 'tempfile')
+# Uploads that are compressed already (random bytes) and ones that deflate well
+COMPRESSED_EXTENSIONS = ('.pdf', '.zip', '.jpg', '.docx')
+TEXT_EXTENSIONS = ('.py', '.txt', '.csv')
+
+
+def _memory_mib(field):
+    """
+    VmRSS (now) or VmHWM (peak) of this process; unlike ru_maxrss, the peak
+    doesn't carry over the parent's from before the exec
+    """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(f'{field}:'):
+                return int(line.split()[1]) / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Peak RSS and time to first byte of the assignment ZIP download, streamed '
+        '(assignments.archive) vs built in memory or in a temp file first. Every mode runs in '
+        'its own process so its peak RSS is its own; needs a database the child processes can '
+        'share (not :memory:). Creates its own course, students, submissions (committed) and '
+        'files, and deletes them afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=40, help='Submissions with a file')
+        parser.add_argument('--size-mb', type=float, default=8, help='Size of each file in MiB')
+        parser.add_argument('--compressed', type=float, default=0.7,
+                            help='Share of files that are already compressed (stored, not deflated)')
+        parser.add_argument('--modes', default=','.join(MODES))
+        parser.add_argument('--seed', type=int, default=5)
+        parser.add_argument('--keep', action='store_true', help="Don't delete the test data")
+        # Internal: run one mode in this process and print its numbers as JSON
+        parser.add_argument('--child', choices=MODES, help='(internal)')
+        parser.add_argument('--assignment', help='(internal)')
+        parser.add_argument('--media-root', help='(internal)')
+        parser.add_argument('--output', help='(internal) save the archive here')
+
+    def handle(self, *args, **options):
+        if options['child']:
+            with override_settings(MEDIA_ROOT=options['media_root']):
+                self._child(options)
+            return
+
+        media_root = tempfile.mkdtemp(prefix='bench-zip-')
+        assignment, students = self._setup(media_root, options)
+        try:
+            total = sum(
+                os.path.getsize(os.path.join(media_root, name))
+                for name in Submission.objects.filter(assignment=assignment).values_list('file', flat=True)
+            )
+            self.stdout.write(
+                f'{options["files"]} files, {total / 2 ** 20:.0f} MiB '
+                f'({options["compressed"]:.0%} already compressed)'
+            )
+            self.stdout.write(
+                f'{"mode":<10} {"TTFB ms":>9} {"total s":>8} {"MiB/s":>7} {"zip MiB":>8} '
+                f'{"peak RSS MiB":>13} {"over base":>10}'
+            )
+            for mode in options['modes'].split(','):
+                output = os.path.join(media_root, 'streamed.zip') if mode == 'streaming' else None
+                result = self._spawn(mode, assignment, media_root, output)
+                self.stdout.write(
+                    f'{mode:<10} {result["ttfb"] * 1000:>9.1f} {result["total"]:>8.2f} '
+                    f'{total / 2 ** 20 / result["total"]:>7.0f} {result["bytes"] / 2 ** 20:>8.1f} '
+                    f'{result["peak_rss"]:>13.1f} {result["peak_rss"] - result["base_rss"]:>10.1f}'
+                )
+                if output:
+                    with zipfile.ZipFile(output) as archive:
+                        bad = archive.testzip()
+                        assert bad is None, f'Corrupt entry {bad} in the streamed archive'
+                        assert len(archive.namelist()) == options['files']
+                    os.remove(output)
+        finally:
+            if options['keep']:
+                self.stdout.write(f'Kept assignment {assignment.pk}, files in {media_root}')
+            else:
+                assignment.course.delete()
+                User.objects.filter(pk__in=[s.pk for s in students]).delete()
+                shutil.rmtree(media_root, ignore_errors=True)
+
+    def _spawn(self, mode, assignment, media_root, output):
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'bench_zip_export',
+            '--child', mode, '--assignment', str(assignment.pk), '--media-root', media_root,
+        ]
+        if output:
+            command += ['--output', output]
+        completed = subprocess.run(command, capture_output=True, text=True, check=True)
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def _child(self, options):
+        assignment = Assignment.objects.select_related('course').get(pk=options['assignment'])
+        base_rss = _memory_mib('VmRSS')
+        started = time.perf_counter()
+        response = getattr(self, f'_{options["child"]}')(assignment)
+
+        ttfb = None
+        sent = 0
+        out = open(options['output'], 'wb') if options['output'] else None
+        try:
+            # Drain the body the way the WSGI server would
+            for part in response:
+                if ttfb is None and part:
+                    ttfb = time.perf_counter() - started
+                sent += len(part)
+                if out:
+                    out.write(part)
+        finally:
+            response.close()
+            if out:
+                out.close()
+        self.stdout.write(json.dumps({
+            'ttfb': ttfb,
+            'total': time.perf_counter() - started,
+            'bytes': sent,
+            'base_rss': base_rss,
+            'peak_rss': _memory_mib('VmHWM'),
+        }))
+
+    def _streaming(self, assignment):
+        return StreamingHttpResponse(stream_archive(submission_files(assignment)), content_type='application/zip')
+
+    def _zip_into(self, f, assignment):
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for submission in Submission.objects.filter(assignment=assignment).select_related('student'):
+                name = submission.file.name
+                archive.write(
+                    os.path.join(settings.MEDIA_ROOT, name),
+                    f'{submission.student.username}{os.path.splitext(name)[1]}',
+                )
+
+    def _memory(self, assignment):
+        buffer = io.BytesIO()
+        self._zip_into(buffer, assignment)
+        return HttpResponse(buffer.getvalue(), content_type='application/zip')
+
+    def _tempfile(self, assignment):
+        f = tempfile.TemporaryFile()
+        self._zip_into(f, assignment)
+        f.seek(0)
+        return FileResponse(f, content_type='application/zip')
+
+    def _setup(self, media_root, options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        tag = f'zipbench{int(time.time())}'
+        course = Course.objects.create(name='ZIP export benchmark', code=tag[:20], term='bench', year=now.year)
+        assignment = Assignment.objects.create(
+            course=course, name='Project report', submission_type='file', total_points=10,
+            available_from=now - timedelta(days=1), due_date=now + timedelta(days=1),
+        )
+        password = make_password(None)
+        students = User.objects.bulk_create(
+            [User(username=f'{tag}_{i}', password=password) for i in range(options['files'])]
+        )
+        Enrollment.objects.bulk_create([Enrollment(student=s, course=course) for s in students])
+
+        size = int(options['size_mb'] * 2 ** 20)
+        os.makedirs(os.path.join(media_root, 'submissions', 'bench'))
+        submissions = []
+        for i, student in enumerate(students):
+            compressed = rng.random() < options['compressed']
+            extension = rng.choice(COMPRESSED_EXTENSIONS if compressed else TEXT_EXTENSIONS)
+            name = f'submissions/bench/{i}{extension}'
+            with open(os.path.join(media_root, name), 'wb') as f:
+                written = 0
+                while written < size:
+                    if compressed:
+                        chunk = os.urandom(min(2 ** 20, size - written))
+                    else:
+                        lines = (f'row {written + j},{rng.randint(0, 10 ** 6)},value {j % 97}\n' for j in range(20000))
+                        chunk = ''.join(lines).encode()[:size - written]
+                    f.write(chunk)
+                    written += len(chunk)
+            submissions.append(Submission(assignment=assignment, student=student, file=name, submitted_at=now))
+        Submission.objects.bulk_create(submissions)
+        return assignment, students
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from assignments.gradebook import check_course_gradebook, rebuild_course_gradebook
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = (
+        'Check the materialized gradebook against a fresh computation from submissions; '
+        'exits non-zero if any course differs'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', help='UUIDs of the courses to check (default: all)')
+        parser.add_argument('--fix', action='store_true', help='Rebuild the courses that differ')
+        parser.add_argument('--limit', type=int, default=20, help='Differences to print per course')
+
+    def handle(self, *args, **options):
+        course_ids = options['course_ids'] or list(Course.objects.values_list('pk', flat=True))
+        inconsistent = []
+        for course_id in course_ids:
+            problems = check_course_gradebook(course_id)
+            if not problems:
+                continue
+            inconsistent.append(course_id)
+            self.stdout.write(self.style.WARNING(f'{course_id}: {len(problems)} difference(s)'))
+            for problem in problems[:options['limit']]:
+                self.stdout.write(f'  {problem}')
+            if options['fix']:
+                rebuild_course_gradebook(course_id)
+                self.stdout.write('  rebuilt')
+
+        if inconsistent and not options['fix']:
+            raise CommandError(f'{len(inconsistent)} of {len(course_ids)} course gradebook(s) are inconsistent')
+        self.stdout.write(self.style.SUCCESS(f'Checked {len(course_ids)} course gradebook(s)'))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from assignments.gradebook import rebuild_course_gradebook
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized gradebook (assignment stats and student course totals) from submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', help='UUIDs of the courses to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        course_ids = options['course_ids'] or list(Course.objects.values_list('pk', flat=True))
+        started = time.perf_counter()
+        for course_id in course_ids:
+            gradebook = rebuild_course_gradebook(course_id)
+            self.stdout.write(
+                f"{course_id}: {len(gradebook['assignments'])} assignments, {len(gradebook['students'])} students"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(course_ids)} course gradebook(s) in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from assignments.models import Assignment, SubmissionSignature
+from assignments.similarity import similarity_report
+
+
+class Command(BaseCommand):
+    help = (
+        'Print the near-duplicate pairs of an assignment\'s text/code submissions, hashing any '
+        'submission whose signature is missing or stale first'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('assignment_id', help='UUID of the assignment')
+        parser.add_argument('--threshold', type=float, default=None, help='Default: SIMILARITY_THRESHOLD')
+        parser.add_argument('--rehash', action='store_true', help='Drop and recompute every signature first')
+        parser.add_argument('--limit', type=int, default=50, help='Pairs to print')
+
+    def handle(self, *args, **options):
+        assignment = Assignment.objects.select_related('course').filter(pk=options['assignment_id']).first()
+        if assignment is None:
+            raise CommandError(f'No assignment {options["assignment_id"]}')
+        if options['rehash']:
+            SubmissionSignature.objects.filter(assignment=assignment).delete()
+
+        report = similarity_report(assignment, options['threshold'])
+        self.stdout.write(
+            f'{assignment}: {report["compared"]} submission(s) compared, {report["candidates"]} candidate '
+            f'pair(s), {len(report["pairs"])} at or above {report["threshold"]:.0%}'
+        )
+        for pair in report['pairs'][:options['limit']]:
+            a, b = pair['a'], pair['b']
+            self.stdout.write(f'  {pair["similarity"]:4.0%}  {a["username"]} ({a["submission_id"]})  {b["username"]} ({b["submission_id"]})')
@@ -0,0 +1,115 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+
+from assignments.models import Assignment, Submission
+from assignments.submissions import submit
+from courses.models import Course, Enrollment
+
+
+class Command(BaseCommand):
+    help = (
+        'Concurrency check for the submission service: fire hundreds of parallel submits at one '
+        'assignment and verify that every student has exactly one submission whose '
+        'resubmission_count matches the number of submits, with no deadlocks. Creates its own '
+        'course and students (committed, since the submits run on separate connections) and '
+        'deletes them afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submits', type=int, default=300, help='Total submits')
+        parser.add_argument('--workers', type=int, default=50, help='Parallel threads (one DB connection each)')
+        parser.add_argument('--students', type=int, default=1, help='Spread the submits over this many students')
+        parser.add_argument('--late', action='store_true', help='Submit after the due date')
+        parser.add_argument('--keep', action='store_true', help="Don't delete the test data")
+
+    def handle(self, *args, **options):
+        course, assignment, students = self._setup(options)
+        try:
+            self._run(assignment, students, options)
+        finally:
+            if not options['keep']:
+                course.delete()
+                User.objects.filter(pk__in=[s.pk for s in students]).delete()
+
+    def _setup(self, options):
+        now = timezone.now()
+        tag = f'stress{int(time.time())}'
+        course = Course.objects.create(name='Submission stress test', code=tag[:20], term='stress', year=now.year)
+        due = now - timedelta(minutes=1) if options['late'] else now + timedelta(hours=1)
+        assignment = Assignment.objects.create(
+            course=course, name='Deadline rush', submission_type='text',
+            available_from=now - timedelta(days=1), due_date=due, total_points=10,
+        )
+        students = [User.objects.create_user(f'{tag}_{i}') for i in range(options['students'])]
+        Enrollment.objects.bulk_create([Enrollment(student=s, course=course) for s in students])
+        return course, assignment, students
+
+    def _run(self, assignment, students, options):
+        total = options['submits']
+
+        def attempt(i):
+            student = students[i % len(students)]
+            started = time.perf_counter()
+            try:
+                _, created = submit(assignment, student, text_content=f'attempt {i}')
+                return created, time.perf_counter() - started, None
+            except OperationalError as e:
+                return False, time.perf_counter() - started, e
+            finally:
+                close_old_connections()
+                connection.close()
+
+        self.stdout.write(
+            f'{total} submits from {options["workers"]} threads over {len(students)} student(s) '
+            f'({connection.vendor})'
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(attempt, range(total)))
+        elapsed = time.perf_counter() - started
+
+        errors = [e for _, _, e in results if e is not None]
+        latencies = sorted(latency for _, latency, _ in results)
+        created = sum(1 for c, _, _ in results if c)
+        self.stdout.write(
+            f'{elapsed:.2f}s, {total / elapsed:.0f} submits/s, '
+            f'p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, '
+            f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, '
+            f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms'
+        )
+
+        problems = [f'{type(e).__name__}: {e}' for e in errors[:5]]
+        if errors:
+            problems.insert(0, f'{len(errors)} submits failed')
+        if created != len(students):
+            problems.append(f'{created} submits created a row, expected {len(students)}')
+
+        rows = {
+            row['student_id']: row
+            for row in Submission.objects.filter(assignment=assignment).values(
+                'student_id', 'resubmission_count', 'is_late', 'status'
+            )
+        }
+        for index, student in enumerate(students):
+            expected = len(range(index, total, len(students))) - 1
+            row = rows.get(student.pk)
+            if row is None:
+                problems.append(f'{student.username}: no submission')
+            elif row['resubmission_count'] != expected:
+                problems.append(
+                    f'{student.username}: resubmission_count {row["resubmission_count"]}, expected {expected}'
+                )
+            elif row['is_late'] != options['late'] or row['status'] != ('late' if options['late'] else 'submitted'):
+                problems.append(f'{student.username}: is_late={row["is_late"]} status={row["status"]}')
+        if len(rows) != len(students):
+            problems.append(f'{len(rows)} submission rows, expected {len(students)}')
+
+        if problems:
+            raise CommandError('\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('All resubmission counts correct, no lost updates or deadlocks'))
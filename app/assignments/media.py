@@ -0,0 +1,122 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from django.views.static import was_modified_since
+from .uploads import CONTENT_ROOT
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CONTENT_ADDRESSED_RE = re.compile(r'/([0-9a-f]{64})(\.[a-z0-9]+)?$')
+
+
+def _etag(name, stat):
+    """
+    Strong ETag: the SHA-256 for content-addressed files, mtime+size otherwise
+    """
+    match = CONTENT_ADDRESSED_RE.search(name) if name.startswith(CONTENT_ROOT) else None
+    if match:
+        return quote_etag(match.group(1))
+    return quote_etag(f"{int(stat.st_mtime):x}-{stat.st_size:x}")
+
+
+def _attachment_headers(response, download_name, content_type):
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = content_disposition_header(True, download_name)
+    # Permission-checked per user: browsers may cache, shared caches must not
+    response['Cache-Control'] = 'private, max-age=3600'
+
+
+def serve_protected_file(request, name, download_name=None):
+    """
+    Serve a file under MEDIA_ROOT after the caller has checked permissions
+
+    With SUBMISSION_XACCEL_REDIRECT on, nginx sends the bytes from an
+    `internal` location (and handles Range and conditional GET itself), so
+    the worker is free as soon as the headers are out. Otherwise the file is
+    streamed by Django with ETag/Last-Modified and single-range support.
+    """
+    name = name.lstrip('/')
+    path = os.path.normpath(os.path.join(settings.MEDIA_ROOT, name))
+    if not path.startswith(os.path.normpath(settings.MEDIA_ROOT) + os.sep):
+        raise Http404("Invalid file path")
+
+    download_name = download_name or os.path.basename(name)
+    content_type = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+
+    if getattr(settings, 'SUBMISSION_XACCEL_REDIRECT', False):
+        response = HttpResponse()
+        prefix = getattr(settings, 'SUBMISSION_XACCEL_PREFIX', '/protected-media/')
+        # Percent-encoded: Django would MIME-encode a non-ASCII header value, which nginx can't resolve
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+        _attachment_headers(response, download_name, content_type)
+        return response
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404("File not found")
+
+    etag = _etag(name, stat)
+    last_modified = http_date(stat.st_mtime)
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+    elif not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    size = stat.st_size
+    start, end = 0, size - 1
+    status = 200
+    range_header = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    match = RANGE_RE.match(range_header.strip()) if range_header else None
+    if match and size and (not if_range or if_range in (etag, last_modified)):
+        first, last = match.groups()
+        ranged = True
+        if first and (not last or int(last) >= int(first)):
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        elif not first and last:
+            start = max(size - int(last), 0)
+        else:
+            # Malformed (bytes=5-3, bytes=-): ignored, the whole file is sent
+            ranged = False
+        if ranged:
+            if start >= size:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f"bytes */{size}"
+                return response
+            status = 206
+
+    f = open(path, 'rb')
+    f.seek(start)
+    length = end - start + 1
+    response = FileResponse(_read_range(f, length), status=status)
+    _attachment_headers(response, download_name, content_type)
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    if status == 206:
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    return response
+
+
+def _read_range(f, length, chunk_size=FileResponse.block_size):
+    try:
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
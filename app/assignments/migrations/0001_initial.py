@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('courses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Assignment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('assignment_type', models.CharField(choices=[('homework', 'Homework'), ('classwork', 'Classwork')], default='homework', max_length=10)),
+                ('submission_type', models.CharField(choices=[('file', 'File Upload'), ('text', 'Text Entry'), ('link', 'URL Link'), ('code', 'Code')], default='file', max_length=10)),
+                ('due_date', models.DateTimeField()),
+                ('available_from', models.DateTimeField()),
+                ('total_points', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='courses.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(blank=True, null=True, upload_to='submissions/')),
+                ('text_content', models.TextField(blank=True)),
+                ('link_url', models.URLField(blank=True)),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('is_late', models.BooleanField(default=False)),
+                ('resubmission_count', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('submitted', 'Submitted'), ('late', 'Late'), ('graded', 'Graded')], default='submitted', max_length=10)),
+                ('grade', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('feedback', models.TextField(blank=True)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='assignments.assignment')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('assignment', 'student')},
+            },
+        ),
+    ]
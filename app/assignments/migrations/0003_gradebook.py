@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0002_indexes'),
+        ('courses', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentStats',
+            fields=[
+                ('assignment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='assignments.assignment')),
+                ('submission_count', models.IntegerField(default=0)),
+                ('graded_count', models.IntegerField(default=0)),
+                ('late_count', models.IntegerField(default=0)),
+                ('mean_grade', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True)),
+                ('median_grade', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True)),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignment_stats', to='courses.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StudentCourseTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submitted_count', models.IntegerField(default=0)),
+                ('graded_count', models.IntegerField(default=0)),
+                ('late_count', models.IntegerField(default=0)),
+                ('points_earned', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('points_possible', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_totals', to='courses.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('course', 'student')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:12
+
+import ams.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0004_submission_time_from_service'),
+    ]
+
+    # The default is applied by Django, not the database: only the migration
+    # state changes, existing rows and their uuid4 keys are left as they are
+    # (no table rebuild on SQLite, no ALTER on Postgres)
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='assignment',
+                    name='id',
+                    field=models.UUIDField(default=ams.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='submission',
+                    name='id',
+                    field=models.UUIDField(default=ams.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
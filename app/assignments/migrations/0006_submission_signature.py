@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0005_time_ordered_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionSignature',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='assignments.submission')),
+                ('submitted_at', models.DateTimeField()),
+                ('content_hash', models.CharField(max_length=64)),
+                ('shingle_count', models.IntegerField(default=0)),
+                ('minhash', models.BinaryField()),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signatures', to='assignments.assignment')),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0006_submission_signature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestSuite',
+            fields=[
+                ('assignment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='test_suite', serialize=False, to='assignments.assignment')),
+                ('language', models.CharField(choices=[('python', 'Python 3')], default='python', max_length=10)),
+                ('cases', models.JSONField(default=list)),
+                ('time_limit', models.FloatField(default=2.0)),
+                ('memory_limit', models.IntegerField(default=256)),
+                ('grade_on_submit', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GradingResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('suite_hash', models.CharField(max_length=64)),
+                ('result', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('content_hash', 'suite_hash')},
+            },
+        ),
+    ]
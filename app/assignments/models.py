@@ -1,5 +1,6 @@
 from django.db import models
-import uuid
+from django.utils import timezone
+from ams.ids import uuid7
 from django.contrib.auth.models import User
 from courses.models import Course
 
@@ -19,7 +20,7 @@ class Assignment(models.Model):
         ('classwork', 'Classwork'),
     )
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='assignments')
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -31,6 +32,14 @@ class Assignment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Assignments in a course ordered by due date
+            models.Index(fields=['course', 'due_date'], name='assignment_course_due_idx'),
+            # Currently available assignments (available_from <= now <= due_date)
+            models.Index(fields=['due_date', 'available_from'], name='assignment_due_avail_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.name} - {self.course.code}"
 
@@ -44,13 +53,14 @@ class Submission(models.Model):
         ('graded', 'Graded'),
     )
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='submissions')
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='submissions')
     file = models.FileField(upload_to='submissions/', blank=True, null=True)
     text_content = models.TextField(blank=True)
     link_url = models.URLField(blank=True)
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    # Set by assignments.submissions on every (re)submission, from the server clock
+    submitted_at = models.DateTimeField(default=timezone.now)
     is_late = models.BooleanField(default=False)
     resubmission_count = models.IntegerField(default=0)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='submitted')
@@ -59,6 +69,122 @@ class Submission(models.Model):
     
     class Meta:
         unique_together = ('assignment', 'student')
+        indexes = [
+            # Grading queue: ungraded submissions for an assignment by submission time
+            models.Index(
+                fields=['assignment', 'submitted_at'],
+                name='submission_ungraded_idx',
+                condition=~models.Q(status='graded'),
+            ),
+            # Late submissions (per assignment, and per course via the assignment join)
+            models.Index(
+                fields=['assignment', 'submitted_at'],
+                name='submission_late_idx',
+                condition=models.Q(is_late=True),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.assignment.name}"
+
+class SubmissionSignature(models.Model):
+    """
+    MinHash signature of a text or code submission (see assignments.similarity)
+    """
+    submission = models.OneToOneField(Submission, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='signatures')
+    # The submission's submitted_at when this was computed; a newer one means it is stale
+    submitted_at = models.DateTimeField()
+    # SHA-256 of the hashed content, so resubmitting the same content isn't hashed again
+    content_hash = models.CharField(max_length=64)
+    shingle_count = models.IntegerField(default=0)
+    # NUM_PERM little-endian uint32 minimums; empty if the submission has nothing to compare
+    minhash = models.BinaryField()
+    
+    def __str__(self):
+        return f"Signature of {self.submission_id}"
+
+class TestSuite(models.Model):
+    """
+    Teacher-supplied test cases of a code assignment (see assignments.autograde)
+    """
+    LANGUAGES = (
+        ('python', 'Python 3'),
+    )
+    
+    assignment = models.OneToOneField(Assignment, on_delete=models.CASCADE, primary_key=True, related_name='test_suite')
+    language = models.CharField(max_length=10, choices=LANGUAGES, default='python')
+    # [{'name', 'stdin', 'expected_output', 'points'}]
+    cases = models.JSONField(default=list)
+    # Per case: CPU seconds and MiB of memory
+    time_limit = models.FloatField(default=2.0)
+    memory_limit = models.IntegerField(default=256)
+    # Grade every (re)submission as it comes in, not only when a teacher runs the suite
+    grade_on_submit = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Tests for {self.assignment_id}"
+
+class GradingResult(models.Model):
+    """
+    Outcome of one source against one test suite, shared by every identical
+    submission (see assignments.autograde)
+    """
+    # SHA-256 of the submitted source and of the suite's cases and limits
+    content_hash = models.CharField(max_length=64)
+    suite_hash = models.CharField(max_length=64)
+    result = models.JSONField()
+    created_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('content_hash', 'suite_hash')
+    
+    def __str__(self):
+        return f"{self.content_hash[:12]} on {self.suite_hash[:12]}"
+
+class AssignmentStats(models.Model):
+    """
+    Materialized grade statistics of one assignment (see assignments.gradebook)
+    """
+    HISTOGRAM_BUCKETS = 10
+    
+    assignment = models.OneToOneField(Assignment, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='assignment_stats')
+    submission_count = models.IntegerField(default=0)
+    graded_count = models.IntegerField(default=0)
+    late_count = models.IntegerField(default=0)
+    mean_grade = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    median_grade = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    # Graded submissions per 10% band of total_points (the last band includes 100%)
+    histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Stats for {self.assignment_id}"
+
+class StudentCourseTotal(models.Model):
+    """
+    Materialized per (course, student) grade totals (see assignments.gradebook)
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='student_totals')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='course_totals')
+    submitted_count = models.IntegerField(default=0)
+    graded_count = models.IntegerField(default=0)
+    late_count = models.IntegerField(default=0)
+    points_earned = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    # Sum of total_points over the graded assignments only
+    points_possible = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ('course', 'student')
+    
+    @property
+    def percentage(self):
+        if not self.points_possible:
+            return None
+        return round(self.points_earned * 100 / self.points_possible, 2)
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.course_id}"
@@ -0,0 +1,268 @@
+"""
+Run untrusted code against stdin/stdout test cases under OS limits.
+
+Each test case runs in a fresh interpreter (python -I -S: the standard
+library only, none of the app's site-packages, and a 5x faster start), in a
+throwaway directory, with an empty environment (no DATABASE_URL,
+TU_API_KEY, ...). Before the
+submission is loaded, a short bootstrap sets hard resource limits that the
+submission cannot raise again:
+
+    RLIMIT_CPU     time_limit CPU seconds, rounded up (SIGXCPU)
+    RLIMIT_AS      memory_limit MiB of address space (MemoryError)
+    RLIMIT_FSIZE   max_output bytes per file; stdout and stderr go to files
+    RLIMIT_NOFILE  a few descriptors
+    RLIMIT_NPROC   max_processes processes of the user (default 1: no
+                   forking, no threads)
+
+plus a wall clock limit (sleeping or blocked code) after which the whole
+process group is killed. A case is over its time limit when the CPU time
+the kernel reports for it (wait4, children included) exceeds time_limit,
+however it was stopped.
+
+The limits alone don't hide the worker: code running as the worker's user
+can read its environment (/proc/<pid>/environ), reach the database and the
+broker over the network, and fork a process that outlives the case in a
+session of its own. So nothing runs unless it is isolated (fail closed), by
+either or both of:
+
+    prefix  a command the sandbox starts under that gives it namespaces of
+            its own, e.g. `unshare --user --map-root-user --net --pid --fork
+            --kill-child --mount-proc` or a bwrap command line: no network,
+            no other processes in sight, and everything it started dies
+            with it
+    user    a dedicated unprivileged user (not root, not the worker's) to
+            run as, which needs the worker to run as root; the network is
+            still reachable, so keep it on a network of its own
+
+Without a prefix there is no PID namespace to take stray processes down, so
+max_processes must be 1.
+
+Nothing here imports Django, so the runner can be used (and benchmarked)
+on its own.
+"""
+
+import os
+import pwd
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+PASSED = 'passed'
+FAILED = 'failed'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+MEMORY = 'memory'
+OUTPUT_LIMIT = 'output_limit'
+
+STATUS_LABELS = {
+    PASSED: 'passed',
+    FAILED: 'wrong output',
+    ERROR: 'runtime error',
+    TIMEOUT: 'time limit exceeded',
+    MEMORY: 'memory limit exceeded',
+    OUTPUT_LIMIT: 'output limit exceeded',
+}
+
+# Runs in the sandboxed interpreter: limits first, then the submission as __main__
+BOOTSTRAP = """\
+import resource, runpy, sys
+cpu, memory, output, processes = (int(value) for value in sys.argv[1:5])
+resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+resource.setrlimit(resource.RLIMIT_FSIZE, (output, output))
+resource.setrlimit(resource.RLIMIT_NOFILE, (16, 16))
+if processes:
+    resource.setrlimit(resource.RLIMIT_NPROC, (processes, processes))
+sys.argv = sys.argv[5:]
+del resource, cpu, memory, output, processes
+runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+
+class SandboxError(Exception):
+    """
+    The sandbox isn't configured to isolate student code, or can't start
+    """
+
+
+def sandbox_ids(user):
+    """
+    (uid, gid) of the dedicated sandbox user, a name or a uid
+    """
+    try:
+        entry = pwd.getpwuid(int(user)) if str(user).isdigit() else pwd.getpwnam(str(user))
+    except KeyError:
+        raise SandboxError(f"Sandbox user {user!r} does not exist")
+    if entry.pw_uid in (0, os.getuid()):
+        raise SandboxError(f"Sandbox user {user!r} must not be root or the worker's own user")
+    return entry.pw_uid, entry.pw_gid
+
+
+def check_isolation(limits):
+    """
+    Refuse to run anything unless the suite's limits isolate it (see the
+    module docstring)
+    """
+    if not limits.get('prefix') and not limits.get('user'):
+        raise SandboxError(
+            'No sandbox configured: student code would run as the worker, with its environment '
+            'and network; set a prefix (AUTOGRADE_SANDBOX_PREFIX) or a user (AUTOGRADE_SANDBOX_USER)'
+        )
+    if not limits.get('prefix') and limits.get('max_processes', 1) != 1:
+        raise SandboxError('Without a prefix (no PID namespace) max_processes must be 1')
+    if limits.get('user'):
+        sandbox_ids(limits['user'])
+
+
+def normalize_output(text):
+    """
+    Output as compared: trailing whitespace on each line and trailing blank
+    lines don't matter
+    """
+    return '\n'.join(line.rstrip() for line in text.replace('\r\n', '\n').split('\n')).rstrip('\n')
+
+
+def _error_name(stderr):
+    """
+    Exception name from the last line of a Python traceback, if any
+    """
+    lines = [line for line in stderr.strip().splitlines() if line.strip()]
+    if not lines or ':' not in lines[-1] and not lines[-1].isidentifier():
+        return None
+    name = lines[-1].split(':', 1)[0].strip()
+    return name.rsplit('.', 1)[-1] if name.replace('.', '').isidentifier() else None
+
+
+def _wait(pid, timeout):
+    """
+    Wait for a child, killing its process group after timeout seconds
+
+    Returns:
+        tuple: (returncode as Popen reports it, rusage, bool timed out)
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        waited, status, usage = os.wait4(pid, os.WNOHANG)
+        if waited:
+            return os.waitstatus_to_exitcode(status), usage, False
+        if time.monotonic() > deadline:
+            os.killpg(pid, signal.SIGKILL)
+            _, status, usage = os.wait4(pid, 0)
+            return os.waitstatus_to_exitcode(status), usage, True
+        time.sleep(delay)
+        delay = min(delay * 2, 0.02)
+
+
+def run_case(workdir, case, limits):
+    """
+    Run main.py in workdir on one case's stdin
+
+    Returns:
+        dict: {'name', 'status', 'time', 'points', 'earned', 'error'}
+    """
+    cpu = max(1, int(limits['time_limit'] + 0.999))
+    memory = limits['memory_limit'] * 2 ** 20
+    command = [
+        *limits.get('prefix', []),
+        limits.get('python') or sys.executable, '-I', '-S', '-c', BOOTSTRAP,
+        str(cpu), str(memory), str(limits['max_output']), str(limits.get('max_processes', 1)),
+        'main.py',
+    ]
+    env = {'PATH': '/usr/bin:/bin', 'LANG': 'C.UTF-8', 'HOME': workdir, 'PYTHONHASHSEED': '0'}
+
+    stdin_path = os.path.join(workdir, 'stdin.txt')
+    with open(stdin_path, 'w') as f:
+        f.write(case.get('stdin', ''))
+    paths = {name: os.path.join(workdir, f'{name}.txt') for name in ('stdout', 'stderr')}
+
+    ids = {}
+    if limits.get('user'):
+        uid, gid = sandbox_ids(limits['user'])
+        ids = {'user': uid, 'group': gid, 'extra_groups': []}
+
+    with open(stdin_path, 'rb') as stdin, open(paths['stdout'], 'wb') as stdout, open(paths['stderr'], 'wb') as stderr:
+        try:
+            process = subprocess.Popen(
+                command, stdin=stdin, stdout=stdout, stderr=stderr, cwd=workdir, env=env,
+                close_fds=True, start_new_session=True, **ids,
+            )
+        except PermissionError as e:
+            raise SandboxError(f"Cannot start the sandbox as {limits.get('user')!r}: {e}")
+        try:
+            # RLIMIT_CPU stops busy code; the wall clock limit catches sleeping and blocked code
+            returncode, usage, timed_out = _wait(process.pid, limits['time_limit'] * 2 + 1)
+            process.returncode = returncode
+        finally:
+            # Take anything the submission started down with it
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            if process.returncode is None:
+                process.wait()
+    cpu_time = usage.ru_utime + usage.ru_stime
+
+    output = {}
+    for name, path in paths.items():
+        with open(path, 'rb') as f:
+            output[name] = f.read(limits['max_output']).decode('utf-8', errors='replace')
+
+    error = None
+    if timed_out or cpu_time > limits['time_limit'] or returncode == -signal.SIGXCPU:
+        status = TIMEOUT
+    elif os.path.getsize(paths['stdout']) >= limits['max_output']:
+        # Python ignores SIGXFSZ, so the write just fails
+        status = OUTPUT_LIMIT
+    elif returncode != 0:
+        error = _error_name(output['stderr'])
+        status = MEMORY if error == 'MemoryError' else ERROR
+    elif normalize_output(output['stdout']) == normalize_output(case.get('expected_output', '')):
+        status = PASSED
+    else:
+        status = FAILED
+
+    points = case.get('points', 1)
+    return {
+        'name': case.get('name', ''),
+        'status': status,
+        'time': round(cpu_time, 3),
+        'points': points,
+        'earned': points if status == PASSED else 0,
+        'error': error,
+    }
+
+
+def run_suite(source, suite):
+    """
+    Run a submission's source against every case of a suite (see
+    assignments.autograde.suite_spec for its keys)
+
+    Raises SandboxError unless the suite's limits isolate the code.
+
+    Returns:
+        dict: {'cases': [run_case results], 'earned': points, 'possible': points}
+    """
+    check_isolation(suite)
+    workdir = tempfile.mkdtemp(prefix='autograde-', dir=suite.get('tmp_dir'))
+    try:
+        if suite.get('user'):
+            try:
+                os.chown(workdir, *sandbox_ids(suite['user']))
+            except PermissionError as e:
+                raise SandboxError(f"Running as {suite['user']!r} needs the worker to run as root: {e}")
+        with open(os.path.join(workdir, 'main.py'), 'w') as f:
+            f.write(source)
+        cases = [run_case(workdir, case, suite) for case in suite['cases']]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'cases': cases,
+        'earned': sum(case['earned'] for case in cases),
+        'possible': sum(case['points'] for case in cases),
+    }
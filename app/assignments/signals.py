@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from courses.models import Course, Enrollment
+from .dashboard import invalidate_course_dashboards, invalidate_dashboards
+from .gradebook import schedule_course_rebuild, schedule_gradebook_refresh
+from .models import Assignment, Submission
+
+
+@receiver([post_save, post_delete], sender=Submission)
+def submission_changed(sender, instance, **kwargs):
+    """
+    A submission only shows up on its own student's dashboard
+    """
+    invalidate_dashboards([instance.student_id])
+
+
+@receiver([post_save, post_delete], sender=Submission)
+def submission_gradebook(sender, instance, **kwargs):
+    """
+    Keep the assignment's stats and the student's course totals current, in
+    the background so submitting never waits on the gradebook
+    """
+    assignment_id, student_id = instance.assignment_id, instance.student_id
+    transaction.on_commit(lambda: schedule_gradebook_refresh(assignment_id, [student_id]))
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    invalidate_dashboards([instance.student_id])
+
+
+@receiver([post_save, post_delete], sender=Assignment)
+def assignment_changed(sender, instance, **kwargs):
+    invalidate_course_dashboards(instance.course_id)
+
+
+@receiver(pre_save, sender=Assignment)
+def assignment_gradebook_fields(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the stored total_points and due date, for assignment_gradebook
+    """
+    instance._gradebook_fields = None
+    if update_fields is not None and not {'total_points', 'due_date'} & set(update_fields):
+        instance._gradebook_fields = (instance.total_points, instance.due_date)
+    elif instance.pk is not None and not instance._state.adding:
+        instance._gradebook_fields = (
+            Assignment.objects.filter(pk=instance.pk).values_list('total_points', 'due_date').first()
+        )
+
+
+@receiver(post_save, sender=Assignment)
+def assignment_gradebook(sender, instance, created, **kwargs):
+    """
+    A new assignment gets an empty stats row; a change of total_points (or
+    the due date) affects every student total in the course. Other edits
+    leave the gradebook alone.
+    """
+    assignment_id, course_id = instance.pk, instance.course_id
+    if created:
+        transaction.on_commit(lambda: schedule_gradebook_refresh(assignment_id, []))
+    elif getattr(instance, '_gradebook_fields', None) != (instance.total_points, instance.due_date):
+        transaction.on_commit(lambda: schedule_course_rebuild(course_id))
+
+
+@receiver(post_delete, sender=Assignment)
+def assignment_deleted_gradebook(sender, instance, **kwargs):
+    course_id = instance.course_id
+    transaction.on_commit(lambda: schedule_course_rebuild(course_id))
+
+
+@receiver(post_save, sender=Course)
+def course_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_course_dashboards(instance.pk)
+
+
+@receiver(m2m_changed, sender=Course.teachers.through)
+def course_teachers_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Course):
+        if action == 'pre_clear':
+            pk_set = set(instance.teachers.values_list('pk', flat=True))
+        invalidate_dashboards(pk_set or [])
+    else:
+        # Changed from the user side (user.teaching_courses.add(...))
+        invalidate_dashboards([instance.pk])
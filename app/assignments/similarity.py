@@ -0,0 +1,297 @@
+"""
+Near-duplicate detection for text and code submissions.
+
+Each submission is reduced once, when it is submitted, to a MinHash
+signature: NUM_PERM 32-bit minimums over the hashes of its token shingles
+(SHINGLE_SIZE consecutive tokens). The share of positions two signatures
+agree on estimates the Jaccard similarity of their shingle sets. A signature
+is stored as 512 bytes (SubmissionSignature), whatever the submission's size.
+
+Comparing every pair of an assignment's submissions is O(n^2). Instead the
+signatures go through locality-sensitive hashing: each one is cut into BANDS
+bands of ROWS values, and only submissions that agree on a whole band become
+candidate pairs. Pairs above roughly (1 / BANDS) ** (1 / ROWS) (about 0.42)
+similarity are very likely to share a band, so the work is linear in the
+number of submissions plus the number of candidates. The candidates are then
+checked against their full signatures.
+
+NumPy and the hash tables are loaded on first use (_tables), so web workers
+that only take submissions don't import NumPy at start-up.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import zlib
+
+from django.conf import settings
+from django.db.models import F
+from ams.celery import enqueue
+from .models import Submission, SubmissionSignature
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+# Changing any of the above (or the seed) invalidates every stored signature
+SEED = 20240601
+
+# Submission types that get a signature; 'file' only for TEXT_EXTENSIONS
+SIMILARITY_TYPES = ('text', 'code', 'file')
+TEXT_EXTENSIONS = (
+    '.txt', '.md', '.csv', '.py', '.ipynb', '.java', '.c', '.cpp', '.h', '.js', '.ts', '.html', '.css', '.sql',
+)
+
+TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+# Shingles hashed per block, bounding the NUM_PERM x block matrix to 4 MiB
+BLOCK = 4096
+
+# Created on first use (see _tables)
+_hash_tables = None
+
+
+def _tables():
+    """
+    The random multipliers drawn from SEED, as (perm_a, perm_b,
+    shingle_mult, band_mult, shift) uint64 arrays
+    """
+    global _hash_tables
+    if _hash_tables is None:
+        import numpy as np
+
+        rng = np.random.default_rng(SEED)
+        # Multiply-shift hash family: ((a * x + b) mod 2^64) >> 32, with odd a
+        perm_a = rng.integers(0, 2 ** 64, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+        perm_b = rng.integers(0, 2 ** 64, size=NUM_PERM, dtype=np.uint64)
+        shingle_mult = rng.integers(0, 2 ** 64, size=SHINGLE_SIZE, dtype=np.uint64) | np.uint64(1)
+        band_mult = rng.integers(0, 2 ** 64, size=ROWS, dtype=np.uint64) | np.uint64(1)
+        # Deterministic, so threads racing here build the same tables
+        _hash_tables = (perm_a, perm_b, shingle_mult, band_mult, np.uint64(32))
+    return _hash_tables
+
+
+def shingle_hashes(text):
+    """
+    Distinct 32-bit hashes of the SHINGLE_SIZE-token shingles of text
+
+    Tokens are lowercased words and single punctuation characters, so
+    whitespace, indentation and case don't matter.
+    """
+    import numpy as np
+
+    _, _, shingle_mult, _, shift = _tables()
+    tokens = TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    ids = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+    if len(ids) < SHINGLE_SIZE:
+        windows = ids[np.newaxis, :]
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(ids, SHINGLE_SIZE)
+    # Integer arrays wrap around on overflow, which is the mod 2^64 we want
+    hashes = (windows * shingle_mult[:windows.shape[1]]).sum(axis=1, dtype=np.uint64)
+    return np.unique(hashes >> shift)
+
+
+def minhash(hashes):
+    """
+    NUM_PERM uint32 signature of a set of shingle hashes
+    """
+    import numpy as np
+
+    perm_a, perm_b, _, _, shift = _tables()
+    signature = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+    for start in range(0, len(hashes), BLOCK):
+        block = hashes[start:start + BLOCK]
+        values = (np.outer(perm_a, block) + perm_b[:, np.newaxis]) >> shift
+        np.minimum(signature, values.min(axis=1).astype(np.uint32), out=signature)
+    return signature
+
+
+def signature_of(text):
+    """
+    (signature, shingle count) of text, or (None, 0) if it has no tokens
+    """
+    hashes = shingle_hashes(text)
+    if not len(hashes):
+        return None, 0
+    return minhash(hashes), len(hashes)
+
+
+def candidate_pairs(signatures):
+    """
+    Index pairs (i, j), i < j, of rows of an n x NUM_PERM signature matrix
+    that are equal on at least one band
+    """
+    import numpy as np
+
+    n = len(signatures)
+    pairs = set()
+    if n < 2:
+        return pairs
+    bands = signatures.reshape(n, BANDS, ROWS).astype(np.uint64)
+    keys = (bands * _tables()[3]).sum(axis=2, dtype=np.uint64)
+    for band in range(BANDS):
+        order = np.argsort(keys[:, band], kind='stable')
+        sorted_keys = keys[order, band]
+        boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [n]))
+        for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            bucket = sorted(order[start:end].tolist())
+            pairs.update((a, b) for i, a in enumerate(bucket) for b in bucket[i + 1:])
+    return pairs
+
+
+def similar_pairs(signatures, threshold, pairs=None):
+    """
+    (i, j, estimated similarity) for the candidate pairs (computed unless
+    given) at or above threshold, most similar first
+    """
+    import numpy as np
+
+    if pairs is None:
+        pairs = candidate_pairs(signatures)
+    if not pairs:
+        return []
+    index = np.array(sorted(pairs))
+    similarity = (signatures[index[:, 0]] == signatures[index[:, 1]]).mean(axis=1)
+    keep = np.flatnonzero(similarity >= threshold)
+    keep = keep[np.argsort(-similarity[keep], kind='stable')]
+    return [(int(index[k, 0]), int(index[k, 1]), float(similarity[k])) for k in keep]
+
+
+def submission_content(submission, submission_type):
+    """
+    Text to compare for a submission: its text entry, or the contents of an
+    uploaded text/code file (the first SIMILARITY_MAX_BYTES of it)
+    """
+    if submission_type in ('text', 'code'):
+        return submission.text_content
+    if submission_type != 'file' or not submission.file:
+        return ''
+    name = submission.file.name
+    if os.path.splitext(name)[1].lower() not in TEXT_EXTENSIONS:
+        return ''
+    max_bytes = getattr(settings, 'SIMILARITY_MAX_BYTES', 2 ** 20)
+    try:
+        with open(os.path.join(settings.MEDIA_ROOT, name), 'rb') as f:
+            return f.read(max_bytes).decode('utf-8', errors='replace')
+    except OSError as e:
+        logger.warning("Cannot read %s of submission %s: %s", name, submission.pk, e)
+        return ''
+
+
+def update_signature(submission_id):
+    """
+    Compute the signature of a submission from its current content
+
+    A submission with nothing to compare (empty, whitespace only, not a text
+    file) gets a row without a minhash, so it isn't read and hashed again
+    for every report until it is resubmitted.
+
+    Returns:
+        SubmissionSignature or None if the submission has nothing to compare
+    """
+    submission = Submission.objects.select_related('assignment').filter(pk=submission_id).first()
+    if submission is None:
+        return None
+    content = submission_content(submission, submission.assignment.submission_type)
+
+    content_hash = hashlib.sha256(content.encode('utf-8', errors='replace')).hexdigest()
+    existing = SubmissionSignature.objects.filter(submission_id=submission_id).first()
+    if existing is not None and existing.content_hash == content_hash:
+        if existing.submitted_at != submission.submitted_at:
+            existing.submitted_at = submission.submitted_at
+            existing.save(update_fields=['submitted_at'])
+        return existing if existing.shingle_count else None
+
+    signature, shingle_count = signature_of(content) if content.strip() else (None, 0)
+    signature_row, _ = SubmissionSignature.objects.update_or_create(
+        submission_id=submission_id,
+        defaults={
+            'assignment_id': submission.assignment_id,
+            'submitted_at': submission.submitted_at,
+            'content_hash': content_hash,
+            'shingle_count': shingle_count,
+            'minhash': signature.astype('<u4').tobytes() if signature is not None else b'',
+        },
+    )
+    return signature_row if signature is not None else None
+
+
+def schedule_signature(submission_id):
+    """
+    Hash a new or changed submission in the background; a dropped task is
+    made up for by refresh_signatures when the report is next built
+    """
+    from .tasks import update_signature_task
+
+    enqueue(update_signature_task, str(submission_id), run_inline=False)
+
+
+def refresh_signatures(assignment):
+    """
+    Compute the missing and stale signatures of an assignment's submissions
+
+    Returns:
+        int: number of submissions hashed
+    """
+    if assignment.submission_type not in SIMILARITY_TYPES:
+        return 0
+    stale = Submission.objects.filter(assignment=assignment).exclude(
+        signature__submitted_at=F('submitted_at')
+    ).values_list('pk', flat=True)
+    count = 0
+    for submission_id in stale:
+        update_signature(submission_id)
+        count += 1
+    if count:
+        logger.info("Hashed %s submission(s) of %s for the similarity report", count, assignment.pk)
+    return count
+
+
+def similarity_report(assignment, threshold=None):
+    """
+    Pairs of an assignment's submissions that look like near-duplicates
+
+    Returns:
+        dict: {
+            'threshold': float,
+            'compared': number of submissions with a signature,
+            'candidates': number of LSH candidate pairs checked,
+            'pairs': [{'similarity', 'a', 'b'}], most similar first, where a
+                and b are {'submission_id', 'student_id', 'username'}
+        }
+    """
+    import numpy as np
+
+    if threshold is None:
+        threshold = getattr(settings, 'SIMILARITY_THRESHOLD', 0.5)
+    refresh_signatures(assignment)
+
+    rows = [
+        row for row in SubmissionSignature.objects.filter(assignment=assignment).values_list(
+            'submission_id', 'submission__student_id', 'submission__student__username', 'minhash'
+        )
+        # Rows of submissions with nothing to compare have no minhash
+        if len(row[3]) == NUM_PERM * 4
+    ]
+    signatures = np.frombuffer(b''.join(bytes(row[3]) for row in rows), dtype='<u4').reshape(len(rows), NUM_PERM)
+    candidates = candidate_pairs(signatures)
+    pairs = similar_pairs(signatures, threshold, candidates)
+
+    def side(i):
+        submission_id, student_id, username, _ = rows[i]
+        return {'submission_id': submission_id, 'student_id': student_id, 'username': username}
+
+    return {
+        'threshold': threshold,
+        'compared': len(rows),
+        'candidates': len(candidates),
+        'pairs': [{'similarity': similarity, 'a': side(i), 'b': side(j)} for i, j, similarity in pairs],
+    }
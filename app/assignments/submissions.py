@@ -0,0 +1,101 @@
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .autograde import schedule_autograde
+from .dashboard import invalidate_dashboards
+from .gradebook import schedule_gradebook_refresh
+from .models import Submission
+from .similarity import SIMILARITY_TYPES, schedule_signature
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class SubmissionNotOpen(Exception):
+    """
+    The assignment does not accept submissions yet
+    """
+
+
+def lateness(assignment, now=None):
+    """
+    Whether a submission made now is late, by the server clock
+
+    Raises:
+        SubmissionNotOpen: before the assignment's available_from
+    """
+    now = now or timezone.now()
+    if now < assignment.available_from:
+        raise SubmissionNotOpen(f"Submissions open at {assignment.available_from.isoformat()}")
+    return now > assignment.due_date
+
+
+def submit(assignment, student, file=None, text_content=None, link_url=None, now=None):
+    """
+    Record a submission (or resubmission) of an assignment by a student
+
+    Lateness and the submission time come from the server clock, never from
+    the client. A resubmission increments resubmission_count with an F()
+    expression inside the UPDATE, so concurrent submits (double clicks in
+    the last minute) each count once without a read-modify-write. The first
+    submission is an INSERT; if a concurrent request inserts first, the
+    unique (assignment, student) constraint turns ours into a resubmission.
+    Only the one submission row is ever locked, and only for the length of
+    its UPDATE. Once the submission is committed the gradebook is refreshed
+    on the grading queue (schedule_gradebook_refresh) whichever way it was
+    written, text and code content is MinHashed for the similarity report,
+    and code is run against the assignment's test suite, all in the
+    background.
+
+    Returns:
+        tuple: (Submission, bool created)
+    """
+    now = now or timezone.now()
+    is_late = lateness(assignment, now)
+    values = {
+        'submitted_at': now,
+        'is_late': is_late,
+        'status': 'late' if is_late else 'submitted',
+    }
+    if file is not None:
+        values['file'] = file
+    if text_content is not None:
+        values['text_content'] = text_content
+    if link_url is not None:
+        values['link_url'] = link_url
+
+    existing = Submission.objects.filter(assignment=assignment, student=student)
+    created = False
+    with transaction.atomic():
+        updated = existing.update(resubmission_count=F('resubmission_count') + 1, **values)
+        if not updated:
+            try:
+                # Savepoint: a lost race must not break the outer transaction
+                with transaction.atomic():
+                    submission = Submission(assignment=assignment, student=student, **values)
+                    submission.save(force_insert=True)
+                    created = True
+            except IntegrityError:
+                updated = existing.update(resubmission_count=F('resubmission_count') + 1, **values)
+                if not updated:
+                    raise
+
+        if not created:
+            submission = existing.get()
+            student_id = submission.student_id
+            # update() sends no post_save, so do what the signal handlers do
+            # for the INSERT (assignments.signals)
+            transaction.on_commit(lambda: invalidate_dashboards([student_id]))
+            transaction.on_commit(lambda: schedule_gradebook_refresh(assignment.pk, [student_id]))
+
+        if assignment.submission_type in SIMILARITY_TYPES:
+            submission_id = submission.pk
+            transaction.on_commit(lambda: schedule_signature(submission_id))
+        if assignment.submission_type == 'code':
+            # Only graded if the assignment has a test suite with grade_on_submit
+            transaction.on_commit(lambda: schedule_autograde(assignment.pk, [submission.pk], on_submit=True))
+
+    if is_late:
+        logger.info("Late submission of %s by %s", assignment.pk, student.pk)
+    return submission, created
@@ -0,0 +1,65 @@
+import logging
+from celery import shared_task
+from django.conf import settings
+from django.db import OperationalError
+from .autograde import grade_submissions
+from .gradebook import rebuild_course_gradebook, refresh_gradebook, release_course_rebuild, release_stats_refresh
+from .models import TestSuite
+from .similarity import update_signature
+from .uploads import cleanup_incoming
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, retry_jitter=True, max_retries=5)
+def refresh_gradebook_task(assignment_id, student_ids, stats=True):
+    """
+    Refresh the gradebook rows touched by submitting or grading (recomputed
+    from the submissions, so safe to run again)
+    """
+    if stats:
+        release_stats_refresh(assignment_id)
+    refresh_gradebook(assignment_id, student_ids, stats=stats)
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, retry_jitter=True, max_retries=5)
+def rebuild_course_gradebook_task(course_id):
+    """
+    Recompute a course's gradebook after an assignment's points or due date
+    changed or it was deleted
+    """
+    release_course_rebuild(course_id)
+    rebuild_course_gradebook(course_id)
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, retry_jitter=True, max_retries=5)
+def update_signature_task(submission_id):
+    """
+    MinHash a new or resubmitted text/code submission for the similarity
+    report (skipped when the content didn't change)
+    """
+    update_signature(submission_id)
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, retry_jitter=True, max_retries=5)
+def autograde_task(assignment_id, submission_ids=None, on_submit=False):
+    """
+    Run a code assignment's test suite on its submissions (or the given
+    ones); cached outcomes make running it again cheap
+    """
+    suite = TestSuite.objects.select_related('assignment').filter(assignment_id=assignment_id).first()
+    if suite is None or (on_submit and not suite.grade_on_submit):
+        return None
+    return grade_submissions(suite.assignment, submission_ids)
+
+
+@shared_task
+def cleanup_incoming_uploads():
+    """
+    Remove stale partial uploads (scheduled hourly by celery beat)
+    """
+    removed = cleanup_incoming(getattr(settings, 'SUBMISSION_INCOMING_MAX_AGE', 6 * 60 * 60))
+    if removed:
+        logger.info("Removed %s stale partial upload(s)", removed)
+    return removed
@@ -0,0 +1,815 @@
+import csv
+import importlib.util
+import os
+import pwd
+import random
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
+from unittest import SkipTest, mock, skipUnless
+from xml.etree import ElementTree
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Course, Enrollment
+from . import exports, gradebook, sandbox, similarity
+from .dashboard import build_dashboard, get_dashboard
+from .archive import stream_archive, submission_files
+from .grading import GradingError, _clean_grade, apply_grades, parse_grade_sheet
+from .media import serve_protected_file
+from .models import Assignment, AssignmentStats, StudentCourseTotal, Submission
+from .submissions import submit
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_course(**kwargs):
+    return Course.objects.create(**{'name': 'Programming', 'code': 'CS101', 'term': '1', 'year': 2025, **kwargs})
+
+
+def make_assignment(course, **kwargs):
+    now = timezone.now()
+    return Assignment.objects.create(**{
+        'course': course,
+        'name': 'Homework 1',
+        'submission_type': 'link',
+        'total_points': 10,
+        'available_from': now - timedelta(days=1),
+        'due_date': now + timedelta(days=1),
+        **kwargs,
+    })
+
+
+@override_settings(CACHES=LOCMEM_CACHE, GRADEBOOK_REFRESH_DELAY=5)
+class GradebookSchedulingTests(TestCase):
+    """
+    Submitting and editing assignments queue gradebook work instead of doing
+    it on the request path
+    """
+    def setUp(self):
+        self.queued = []
+        patcher = mock.patch.object(
+            gradebook, 'enqueue', side_effect=lambda task, *args, **kwargs: self.queued.append((task.name, args))
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(gradebook.cache.clear)
+        self.course = make_course()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assignment = make_assignment(self.course)
+        self.queued.clear()
+
+    def test_submits_queue_totals_and_one_stats_refresh(self):
+        gradebook.release_stats_refresh(self.assignment.pk)
+        with mock.patch.object(gradebook, 'refresh_gradebook', side_effect=AssertionError('refreshed inline')):
+            for i in range(3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    submit(self.assignment, User.objects.create_user(f'640000000{i}'), link_url='https://example.com')
+
+        task = 'assignments.tasks.refresh_gradebook_task'
+        stats = [args for name, args in self.queued if name == task and args[2]]
+        totals = [args for name, args in self.queued if name == task and not args[2]]
+        self.assertEqual(stats, [(str(self.assignment.pk), [], True)])
+        self.assertEqual(len(totals), 3)
+
+    def test_resubmit_queues_like_first_submit(self):
+        student = User.objects.create_user('6400000000')
+        for _ in range(2):
+            self.queued.clear()
+            gradebook.release_stats_refresh(self.assignment.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                submit(self.assignment, student, link_url='https://example.com')
+            self.assertEqual(sorted(args[2] for _, args in self.queued), [False, True])
+
+    def test_description_edit_leaves_gradebook_alone(self):
+        self.assignment.description = 'Now with hints'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assignment.save()
+        self.assertEqual(self.queued, [])
+
+    def test_points_or_due_date_change_queues_course_rebuild(self):
+        for field, value in (('total_points', 20), ('due_date', self.assignment.due_date + timedelta(days=1))):
+            self.queued.clear()
+            gradebook.release_course_rebuild(self.course.pk)
+            setattr(self.assignment, field, value)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assignment.save()
+            self.assertEqual(self.queued, [('assignments.tasks.rebuild_course_gradebook_task', (str(self.course.pk),))])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CheckCourseGradebookTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(gradebook, 'enqueue')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.course = make_course()
+        self.assignment = make_assignment(self.course)
+        self.students = [User.objects.create_user(f'640000000{i}') for i in range(2)]
+        for student in self.students:
+            submit(self.assignment, student, link_url='https://example.com')
+        Submission.objects.update(grade=8, status='graded')
+        gradebook.rebuild_course_gradebook(self.course.pk)
+
+    def test_rebuilt_gradebook_is_consistent(self):
+        self.assertEqual(gradebook.check_course_gradebook(self.course.pk), [])
+
+    def test_detects_drift(self):
+        other = User.objects.create_user('6400000009')
+        AssignmentStats.objects.filter(assignment=self.assignment).update(mean_grade=5)
+        StudentCourseTotal.objects.filter(student=self.students[0]).update(points_earned=3)
+        StudentCourseTotal.objects.filter(student=self.students[1]).delete()
+        StudentCourseTotal.objects.create(course=self.course, student=other)
+
+        self.assertEqual(sorted(gradebook.check_course_gradebook(self.course.pk)), sorted([
+            f"assignment {self.assignment.pk}: mean_grade is 5.00, expected 8.00",
+            f"student {self.students[0].pk}: points_earned is 3.00, expected 8.00",
+            f"student {self.students[1].pk}: no totals row",
+            f"student {other.pk}: totals row without submissions",
+        ]))
+
+    def test_detects_missed_submission(self):
+        Submission.objects.filter(student=self.students[0]).update(grade=None, status='submitted')
+
+        problems = gradebook.check_course_gradebook(self.course.pk)
+        self.assertIn(f"assignment {self.assignment.pk}: graded_count is 2, expected 1", problems)
+        self.assertIn(f"student {self.students[0].pk}: graded_count is 1, expected 0", problems)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DashboardQueryTests(TestCase):
+    """
+    The home page dashboard takes the same number of queries however many
+    courses the user has
+    """
+    def setUp(self):
+        patcher = mock.patch.object(gradebook, 'enqueue')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(gradebook.cache.clear)
+        self.student = User.objects.create_user('6400000001')
+        self.teacher = User.objects.create_user('teacher')
+        self.courses = 0
+
+    def add_courses(self, count):
+        for _ in range(count):
+            self.courses += 1
+            course = make_course(code=f'CS{100 + self.courses}')
+            Enrollment.objects.create(student=self.student, course=course)
+            course.teachers.add(self.teacher)
+            for i in range(2):
+                assignment = make_assignment(course, name=f'Homework {i + 1}')
+                submit(assignment, self.student, link_url='https://example.com')
+        gradebook.cache.clear()
+
+    def test_build_dashboard(self):
+        for count in (1, 9):
+            self.add_courses(count - self.courses)
+            for user, courses in ((self.student, 'enrolled_courses'), (self.teacher, 'teaching_courses')):
+                with self.subTest(courses=count, user=user.username), self.assertNumQueries(3):
+                    dashboard = build_dashboard(user)
+                self.assertEqual(len(dashboard[courses]), count)
+                self.assertEqual(len(dashboard['upcoming_assignments']), 2 * count)
+
+    def test_cached_dashboard(self):
+        self.add_courses(3)
+        with self.assertNumQueries(3):
+            get_dashboard(self.student)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_dashboard(self.student)['upcoming_assignments']), 6)
+
+    def test_home_page(self):
+        self.client.force_login(self.student)
+        # Loads the logged-in user into the per-process cache (accounts.user_cache)
+        self.client.get(reverse('home'))
+        for count in (1, 9):
+            self.add_courses(count - self.courses)
+            with self.subTest(courses=count), self.assertNumQueries(3):
+                response = self.client.get(reverse('home'))
+            self.assertContains(response, f'CS{100 + count}')
+
+
+class ParseGradeSheetTests(SimpleTestCase):
+    def test_csv(self):
+        rows = parse_grade_sheet('\ufeffStudent_ID,Grade,Feedback\n6400000001,8.5,Good\n 6400000002 ,,\n'.encode())
+        self.assertEqual(rows, [
+            {'row': 2, 'student': '6400000001', 'grade': '8.5', 'feedback': 'Good'},
+            {'row': 3, 'student': '6400000002', 'grade': '', 'feedback': ''},
+        ])
+
+    def test_csv_without_feedback_keeps_feedback(self):
+        rows = parse_grade_sheet(b'username,grade\n6400000001,7\n')
+        self.assertIsNone(rows[0]['feedback'])
+
+    def test_csv_needs_student_and_grade_columns(self):
+        for data in (b'name,grade\nSomchai,7\n', b'student,score\n6400000001,7\n', b''):
+            with self.subTest(data), self.assertRaises(GradingError) as cm:
+                parse_grade_sheet(data)
+            self.assertIsNone(cm.exception.errors[0]['row'])
+
+    def test_json(self):
+        expected = [{'row': 1, 'student': '6400000001', 'grade': 9, 'feedback': None}]
+        self.assertEqual(parse_grade_sheet(b'[{"tu_id": 6400000001, "grade": 9}]'), expected)
+        self.assertEqual(parse_grade_sheet('{"grades": [{"student": "6400000001", "grade": 9}]}'), expected)
+
+    def test_invalid_json(self):
+        for data in ('[{"student": ', '{"rows": []}', '[1]'):
+            with self.subTest(data), self.assertRaises(GradingError):
+                parse_grade_sheet(data, 'application/json')
+
+
+class CleanGradeTests(SimpleTestCase):
+    def test_valid(self):
+        for value, grade in (('7', Decimal('7')), (' 9.25 ', Decimal('9.25')), (0, Decimal('0')), ('10.00', Decimal('10'))):
+            with self.subTest(value):
+                self.assertEqual(_clean_grade(value, Decimal('10')), grade)
+
+    def test_invalid(self):
+        for value, message in (
+            (None, 'required'), (' ', 'required'), ('abc', 'not a number'), ('7.555', 'decimal places'),
+            ('NaN', 'decimal places'), ('Infinity', 'decimal places'), ('-1', 'outside'), ('10.01', 'outside'),
+        ):
+            with self.subTest(value), self.assertRaisesRegex(ValueError, message):
+                _clean_grade(value, Decimal('10'))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ApplyGradesTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(gradebook, 'enqueue')
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.assignment = make_assignment(make_course())
+        for username in ('6400000001', '6400000002'):
+            submit(self.assignment, User.objects.create_user(username), link_url='https://example.com')
+        Submission.objects.filter(student__username='6400000002').update(feedback='See me')
+
+    def row(self, number, student, grade, feedback=None):
+        return {'row': number, 'student': student, 'grade': grade, 'feedback': feedback}
+
+    def grades(self):
+        return dict(Submission.objects.values_list('student__username', 'grade'))
+
+    def test_writes_grades(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = apply_grades(self.assignment, [
+                self.row(2, '6400000001', '8.5', 'Good'),
+                self.row(3, '6400000002', '10'),
+            ])
+
+        self.assertEqual(result, {'updated': 2, 'unchanged': 0})
+        submissions = {s.student.username: s for s in Submission.objects.select_related('student')}
+        self.assertEqual(submissions['6400000001'].grade, Decimal('8.5'))
+        self.assertEqual(submissions['6400000001'].feedback, 'Good')
+        self.assertEqual(submissions['6400000002'].feedback, 'See me')
+        self.assertEqual({s.status for s in submissions.values()}, {'graded'})
+        self.assertTrue(self.enqueue.called)
+
+    def test_unchanged_rows_are_skipped(self):
+        rows = [self.row(2, '6400000001', '8.5', 'Good'), self.row(3, '6400000002', '10')]
+        apply_grades(self.assignment, rows)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(apply_grades(self.assignment, rows), {'updated': 0, 'unchanged': 2})
+        self.assertFalse([q['sql'] for q in queries if q['sql'].lstrip().upper().startswith('UPDATE')])
+
+    def test_row_errors_write_nothing(self):
+        with self.assertRaises(GradingError) as cm:
+            apply_grades(self.assignment, [
+                self.row(2, '6400000001', '8'),
+                self.row(3, '6499999999', '8'),
+                self.row(4, '', '8'),
+                self.row(5, '6400000002', '11'),
+                self.row(6, '6400000001', '9'),
+            ])
+
+        self.assertEqual(
+            [(e['row'], e['student']) for e in cm.exception.errors],
+            [(3, '6499999999'), (4, ''), (5, '6400000002'), (6, '6400000001')],
+        )
+        messages = [e['error'] for e in cm.exception.errors]
+        self.assertEqual(messages[0], 'No submission for this assignment')
+        self.assertEqual(messages[1], 'Student is required')
+        self.assertIn('outside', messages[2])
+        self.assertEqual(messages[3], 'Student appears more than once')
+        self.assertEqual(self.grades(), {'6400000001': None, '6400000002': None})
+
+
+def make_essay(seed, words=300):
+    rng = random.Random(seed)
+    vocabulary = [f'word{i}' for i in range(2000)]
+    return ' '.join(rng.choice(vocabulary) for _ in range(words))
+
+
+def edit_essay(text, every):
+    """
+    text with every every-th word replaced
+    """
+    words = text.split()
+    return ' '.join('changed' if i % every == 0 else word for i, word in enumerate(words))
+
+
+class MinHashTests(SimpleTestCase):
+    def signatures(self, *texts):
+        import numpy as np
+
+        return np.stack([similarity.signature_of(text)[0] for text in texts])
+
+    def test_case_and_whitespace_do_not_matter(self):
+        a, _ = similarity.signature_of('def area(r):\n    return 3.14 * r * r\n')
+        b, _ = similarity.signature_of('DEF area ( r ) :   return 3.14*r*r')
+        self.assertEqual(a.tolist(), b.tolist())
+
+    def test_no_tokens(self):
+        for text in ('', '   \n\t'):
+            with self.subTest(text):
+                self.assertEqual(similarity.signature_of(text), (None, 0))
+
+    def test_short_text_gets_a_signature(self):
+        signature, shingle_count = similarity.signature_of('print(1)')
+        self.assertEqual(len(signature), similarity.NUM_PERM)
+        self.assertEqual(shingle_count, 1)
+
+    def test_estimate_follows_jaccard_similarity(self):
+        original = make_essay(1)
+        for every in (50, 10, 4):
+            edited = edit_essay(original, every)
+            with self.subTest(every=every):
+                a = set(similarity.shingle_hashes(original).tolist())
+                b = set(similarity.shingle_hashes(edited).tolist())
+                jaccard = len(a & b) / len(a | b)
+                [(_, _, estimate)] = similarity.similar_pairs(self.signatures(original, edited), 0, {(0, 1)})
+                self.assertAlmostEqual(estimate, jaccard, delta=0.15)
+
+    def test_near_duplicates_pair_up(self):
+        original, other = make_essay(1), make_essay(2)
+        signatures = self.signatures(original, other, edit_essay(original, 50), make_essay(3))
+
+        self.assertEqual(similarity.candidate_pairs(signatures), {(0, 2)})
+        [(i, j, estimate)] = similarity.similar_pairs(signatures, 0.5)
+        self.assertEqual((i, j), (0, 2))
+        self.assertGreater(estimate, 0.7)
+
+    def test_identical_rows_are_all_candidates(self):
+        text = make_essay(1)
+        signatures = self.signatures(text, make_essay(2), text, text)
+        self.assertEqual(similarity.candidate_pairs(signatures), {(0, 2), (0, 3), (2, 3)})
+        self.assertEqual(similarity.candidate_pairs(signatures[:1]), set())
+
+    def test_similar_pairs_most_similar_first(self):
+        original = make_essay(1)
+        signatures = self.signatures(original, edit_essay(original, 5), edit_essay(original, 100))
+
+        pairs = similarity.similar_pairs(signatures, 0.3, {(0, 1), (0, 2), (1, 2)})
+        self.assertEqual([(i, j) for i, j, _ in pairs[:1]], [(0, 2)])
+        self.assertEqual([p[2] for p in pairs], sorted((p[2] for p in pairs), reverse=True))
+        self.assertEqual(similarity.similar_pairs(signatures, 1.01, {(0, 1)}), [])
+
+
+class SimilarityReportTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(gradebook, 'enqueue')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.assignment = make_assignment(make_course(), submission_type='text')
+
+    def test_report(self):
+        original = make_essay(1)
+        for username, text in (
+            ('6400000001', original),
+            ('6400000002', edit_essay(original, 50)),
+            ('6400000003', make_essay(2)),
+            ('6400000004', '  '),
+        ):
+            submit(self.assignment, User.objects.create_user(username), text_content=text)
+
+        report = similarity.similarity_report(self.assignment, 0.5)
+
+        self.assertEqual(report['compared'], 3)
+        [pair] = report['pairs']
+        self.assertEqual({pair['a']['username'], pair['b']['username']}, {'6400000001', '6400000002'})
+        # The empty submission has a row so it isn't read again
+        self.assertEqual(similarity.refresh_signatures(self.assignment), 0)
+
+
+class SandboxIsolationTests(SimpleTestCase):
+    def test_refuses_without_prefix_or_user(self):
+        for limits in ({}, {'prefix': [], 'user': ''}):
+            with self.subTest(limits), self.assertRaisesRegex(sandbox.SandboxError, 'No sandbox configured'):
+                sandbox.check_isolation(limits)
+
+    def test_prefix(self):
+        sandbox.check_isolation({'prefix': ['unshare', '--net'], 'max_processes': 4})
+
+    def test_more_processes_need_a_prefix(self):
+        with self.assertRaisesRegex(sandbox.SandboxError, 'max_processes must be 1'):
+            sandbox.check_isolation({'user': 'nobody', 'max_processes': 2})
+
+    def test_user_must_be_someone_else(self):
+        for user in ('root', '0', str(os.getuid()), pwd.getpwuid(os.getuid()).pw_name, 'no-such-user-ams'):
+            with self.subTest(user), self.assertRaises(sandbox.SandboxError):
+                sandbox.check_isolation({'user': user})
+
+    def test_other_user(self):
+        try:
+            entry = pwd.getpwnam('nobody')
+        except KeyError:
+            self.skipTest('no nobody user')
+        if entry.pw_uid == os.getuid():
+            self.skipTest('running as nobody')
+        sandbox.check_isolation({'user': 'nobody'})
+        sandbox.check_isolation({'user': str(entry.pw_uid)})
+
+    def test_run_suite_runs_nothing_unless_isolated(self):
+        with mock.patch.object(sandbox.subprocess, 'Popen') as popen, self.assertRaises(sandbox.SandboxError):
+            sandbox.run_suite('print(1)', {'cases': [{'stdin': ''}], 'time_limit': 1, 'memory_limit': 64, 'max_output': 1024})
+        popen.assert_not_called()
+
+
+class SandboxOutputTests(SimpleTestCase):
+    def test_normalize_output(self):
+        for text, expected in (
+            ('1\n2\n', '1\n2'),
+            ('1  \r\n2\t\r\n\r\n\n', '1\n2'),
+            ('', ''),
+            ('\n\n', ''),
+            ('  indented\n\nafter blank', '  indented\n\nafter blank'),
+        ):
+            with self.subTest(text):
+                self.assertEqual(sandbox.normalize_output(text), expected)
+
+    def test_error_name(self):
+        traceback = 'Traceback (most recent call last):\n  File "main.py", line 1\nnumpy.linalg.LinAlgError: singular\n'
+        self.assertEqual(sandbox._error_name(traceback), 'LinAlgError')
+        self.assertEqual(sandbox._error_name('MemoryError\n'), 'MemoryError')
+        self.assertIsNone(sandbox._error_name(''))
+        self.assertIsNone(sandbox._error_name('Killed by signal 9'))
+
+    def test_cases(self):
+        """
+        Runs real cases, under a stand-in prefix as no namespaces are needed
+        to check how output is compared
+        """
+        source = 'n = int(input())\nif n < 0:\n    raise ValueError(n)\nprint(n * 2, "  ")\nprint()\n'
+        cases = [
+            {'name': 'double', 'stdin': '21\n', 'expected_output': '42\n', 'points': 2},
+            {'name': 'crlf', 'stdin': '1\n', 'expected_output': '2\r\n\r\n'},
+            {'name': 'wrong', 'stdin': '2\n', 'expected_output': '5'},
+            {'name': 'raises', 'stdin': '-1\n', 'expected_output': ''},
+        ]
+        result = sandbox.run_suite(source, {
+            'prefix': ['env'], 'cases': cases, 'time_limit': 5, 'memory_limit': 256, 'max_output': 4096,
+        })
+
+        self.assertEqual(
+            [(case['name'], case['status'], case['earned'], case['error']) for case in result['cases']],
+            [('double', 'passed', 2, None), ('crlf', 'passed', 1, None), ('wrong', 'failed', 0, None),
+             ('raises', 'error', 0, 'ValueError')],
+        )
+        self.assertEqual((result['earned'], result['possible']), (3, 5))
+
+
+class ConcurrentSubmitTests(TransactionTestCase):
+    """
+    Parallel submits (double clicks at the deadline) each count once, as
+    stress_submissions checks at scale
+
+    Needs a test database every thread's connection can write to: Postgres
+    or SQLite with a file (DATABASES['default']['TEST']['NAME']), not the
+    in-memory SQLite database Django tests on by default.
+    """
+    SUBMITS = 40
+    STUDENTS = 4
+
+    @classmethod
+    def setUpClass(cls):
+        # Checked here, once the test database is set up
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise SkipTest('needs a database shared between connections (Postgres or file-backed SQLite)')
+        super().setUpClass()
+
+    def setUp(self):
+        patcher = mock.patch.object(gradebook, 'enqueue')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.course = make_course()
+        self.students = [User.objects.create_user(f'64000000{i:02d}') for i in range(self.STUDENTS)]
+
+    def fire(self, assignment):
+        def attempt(i):
+            try:
+                return submit(assignment, self.students[i % self.STUDENTS], link_url=f'https://example.com/{i}')[1]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            return list(pool.map(attempt, range(self.SUBMITS)))
+
+    def check(self, assignment, late):
+        created = self.fire(assignment)
+
+        self.assertEqual(sum(created), self.STUDENTS)
+        rows = list(Submission.objects.filter(assignment=assignment).values(
+            'student_id', 'resubmission_count', 'is_late', 'status'
+        ))
+        self.assertEqual(len(rows), self.STUDENTS)
+        self.assertEqual({row['student_id'] for row in rows}, {student.pk for student in self.students})
+        for row in rows:
+            self.assertEqual(row['resubmission_count'], self.SUBMITS // self.STUDENTS - 1)
+            self.assertEqual(row['is_late'], late)
+            self.assertEqual(row['status'], 'late' if late else 'submitted')
+
+    def test_concurrent_submits_count_once_each(self):
+        self.check(make_assignment(self.course), late=False)
+
+    def test_concurrent_late_submits_are_flagged(self):
+        self.check(make_assignment(self.course, due_date=timezone.now() - timedelta(minutes=1)), late=True)
+
+
+class ProtectedFileTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root, SUBMISSION_XACCEL_REDIRECT=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.name = 'submissions/report.txt'
+        os.makedirs(os.path.join(self.media_root, 'submissions'))
+        with open(os.path.join(self.media_root, self.name), 'wb') as f:
+            f.write(b'0123456789')
+
+    def get(self, name=None, **headers):
+        response = serve_protected_file(RequestFactory().get('/', **headers), name or self.name)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_range(self):
+        for header, content_range, body in (
+            ('bytes=2-4', 'bytes 2-4/10', b'234'),
+            ('bytes=7-', 'bytes 7-9/10', b'789'),
+            ('bytes=-3', 'bytes 7-9/10', b'789'),
+            ('bytes=8-100', 'bytes 8-9/10', b'89'),
+        ):
+            with self.subTest(header):
+                response, content = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(content, body)
+
+    def test_malformed_range_sends_the_whole_file(self):
+        for header in ('bytes=5-3', 'bytes=-', 'bytes=a-b', 'items=0-1'):
+            with self.subTest(header):
+                response, content = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(content, b'0123456789')
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get(HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    @override_settings(SUBMISSION_XACCEL_REDIRECT=True, SUBMISSION_XACCEL_PREFIX='/protected-media/')
+    def test_xaccel_redirect_is_percent_encoded(self):
+        response, _ = self.get('submissions/รายงาน ฉบับที่ 1?.pdf')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected-media/submissions/%E0%B8%A3%E0%B8%B2%E0%B8%A2%E0%B8%87%E0%B8%B2%E0%B8%99'
+            '%20%E0%B8%89%E0%B8%9A%E0%B8%B1%E0%B8%9A%E0%B8%97%E0%B8%B5%E0%B9%88%201%3F.pdf',
+        )
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        os.makedirs(os.path.join(self.media_root, 'submissions'))
+        self.files = {
+            'submissions/a.py': b'print("hello")\n' * 1000,
+            'submissions/b.PNG': os.urandom(5000),
+        }
+        for name, content in self.files.items():
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(content)
+
+    def archive(self, files, **kwargs):
+        chunks = list(stream_archive(files, **kwargs))
+        archive = zipfile.ZipFile(BytesIO(b''.join(chunks)))
+        self.addCleanup(archive.close)
+        self.assertIsNone(archive.testzip())
+        return chunks, archive
+
+    def test_archive(self):
+        chunks, archive = self.archive([('hw/6400000001.py', 'submissions/a.py'), ('hw/6400000002.png', 'submissions/b.PNG')])
+
+        self.assertEqual(archive.namelist(), ['hw/6400000001.py', 'hw/6400000002.png'])
+        self.assertEqual(archive.read('hw/6400000001.py'), self.files['submissions/a.py'])
+        self.assertEqual(archive.read('hw/6400000002.png'), self.files['submissions/b.PNG'])
+        self.assertEqual(archive.getinfo('hw/6400000001.py').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(archive.getinfo('hw/6400000002.png').compress_type, zipfile.ZIP_STORED)
+
+    def test_streams_in_chunks(self):
+        chunks, archive = self.archive([('a.py', 'submissions/a.py')] * 3, chunk_size=1024)
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(len(archive.namelist()), 3)
+
+    def test_missing_and_outside_files_are_listed(self):
+        _, archive = self.archive([
+            ('hw/1.py', 'submissions/a.py'),
+            ('hw/2.py', 'submissions/gone.py'),
+            ('hw/3.txt', '../../etc/passwd'),
+        ])
+
+        self.assertEqual(archive.namelist(), ['hw/1.py', 'MISSING.txt'])
+        self.assertEqual(archive.read('MISSING.txt').decode().splitlines()[1:], ['hw/2.py', 'hw/3.txt'])
+
+    def test_empty(self):
+        _, archive = self.archive([])
+        self.assertEqual(archive.namelist(), [])
+
+    def test_submission_files(self):
+        with mock.patch.object(gradebook, 'enqueue'):
+            assignment = make_assignment(make_course(), name='Lab 2: Loops', submission_type='file')
+            for username, name in (('6400000002', 'submissions/b.PNG'), ('6400000001', 'submissions/a.py')):
+                submit(assignment, User.objects.create_user(username), file=name)
+            submit(assignment, User.objects.create_user('6400000003'), link_url='https://example.com')
+
+        self.assertEqual(list(submission_files(assignment)), [
+            ('lab-2-loops/6400000001.py', 'submissions/a.py'),
+            ('lab-2-loops/6400000002.png', 'submissions/b.PNG'),
+        ])
+
+
+XLSX_NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def export_row(**values):
+    """
+    A row of exports.COLUMNS, with sample values for the columns not given
+    """
+    row = {
+        'faculty': 'Engineering', 'department': 'Computer Engineering', 'year': 2025, 'term': '1',
+        'course_code': 'CS101', 'course_name': 'Programming', 'assignment': 'Homework 1',
+        'due_date': datetime(2025, 9, 1, 23, 59), 'total_points': Decimal('10.00'), 'tu_id': '6400000001',
+        'username': '6400000001', 'first_name': 'สมชาย', 'last_name': 'ใจดี', 'status': 'graded',
+        'submitted_at': datetime(2025, 9, 1, 12, 0), 'late': False, 'grade': Decimal('8.50'),
+        **values,
+    }
+    return tuple(row[header] for header in exports.HEADERS)
+
+
+@override_settings(USE_TZ=False)
+class StreamXlsxTests(SimpleTestCase):
+    def workbook(self, rows, **kwargs):
+        chunks = list(exports.stream_xlsx(rows, **kwargs))
+        book = zipfile.ZipFile(BytesIO(b''.join(chunks)))
+        self.addCleanup(book.close)
+        self.assertIsNone(book.testzip())
+        # Every part is well-formed XML
+        parts = {name: ElementTree.fromstring(book.read(name)) for name in book.namelist()}
+        return chunks, parts
+
+    def sheet_names(self, parts):
+        sheets = parts['xl/workbook.xml'].findall('s:sheets/s:sheet', XLSX_NS)
+        return [sheet.get('name') for sheet in sheets]
+
+    def rows(self, sheet):
+        return [
+            {cell.get('r'): cell for cell in row.findall('s:c', XLSX_NS)}
+            for row in sheet.findall('s:sheetData/s:row', XLSX_NS)
+        ]
+
+    def text(self, cell):
+        return cell.find('s:is/s:t', XLSX_NS).text
+
+    def test_parts(self):
+        _, parts = self.workbook([export_row()])
+
+        self.assertEqual(set(parts), {
+            '[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml', 'xl/_rels/workbook.xml.rels',
+            'xl/styles.xml', 'xl/worksheets/sheet1.xml',
+        })
+        self.assertEqual(self.sheet_names(parts), ['Grades'])
+        targets = [rel.get('Target') for rel in parts['xl/_rels/workbook.xml.rels']]
+        self.assertEqual(targets, ['worksheets/sheet1.xml', 'styles.xml'])
+
+    def test_cells(self):
+        _, parts = self.workbook([export_row(first_name='A & <B>\x01', grade=None, late=True)])
+
+        header, row = self.rows(parts['xl/worksheets/sheet1.xml'])
+        self.assertEqual([self.text(cell) for cell in header.values()], exports.HEADERS)
+        self.assertEqual(self.text(row['L2']), 'A & <B>')
+        self.assertEqual(self.text(row['M2']), 'ใจดี')
+        self.assertEqual(row['C2'].find('s:v', XLSX_NS).text, '2025')
+        self.assertEqual(row['I2'].find('s:v', XLSX_NS).text, '10.00')
+        self.assertEqual((row['P2'].get('t'), row['P2'].find('s:v', XLSX_NS).text), ('b', '1'))
+        # 2025-09-01 23:59 as days since 1899-12-30
+        self.assertEqual(row['H2'].get('s'), str(exports.XLSX_DATE_STYLE))
+        self.assertAlmostEqual(float(row['H2'].find('s:v', XLSX_NS).text), 45901 + 1439 / 1440, places=5)
+        self.assertNotIn('Q2', row)
+
+    def test_sheets_are_split(self):
+        _, parts = self.workbook([export_row(username=str(i)) for i in range(5)], sheet_rows=2)
+
+        self.assertEqual(self.sheet_names(parts), ['Grades', 'Grades 2', 'Grades 3'])
+        usernames = []
+        for n in (1, 2, 3):
+            header, *rows = self.rows(parts[f'xl/worksheets/sheet{n}.xml'])
+            self.assertEqual(self.text(header['K1']), 'username')
+            self.assertEqual([list(row)[0] for row in rows], [f'A{i}' for i in range(2, len(rows) + 2)])
+            usernames += [self.text(row[f'K{i}']) for i, row in enumerate(rows, start=2)]
+        self.assertEqual(usernames, ['0', '1', '2', '3', '4'])
+
+    def test_no_rows(self):
+        _, parts = self.workbook([])
+        self.assertEqual(len(self.rows(parts['xl/worksheets/sheet1.xml'])), 1)
+
+    def test_streams_in_chunks(self):
+        chunks, parts = self.workbook(export_row(username=os.urandom(8).hex()) for _ in range(3000))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(len(self.rows(parts['xl/worksheets/sheet1.xml'])), 3001)
+
+    @skipUnless(importlib.util.find_spec('openpyxl'), 'openpyxl is not installed')
+    def test_opens_in_openpyxl(self):
+        import openpyxl
+
+        rows = [export_row(username=str(i), submitted_at=datetime(2025, 9, 1, 12, 34, 56)) for i in range(3)]
+        data = b''.join(exports.stream_xlsx(rows, sheet_rows=2))
+        book = openpyxl.load_workbook(BytesIO(data), read_only=True)
+        self.addCleanup(book.close)
+        self.assertEqual(book.sheetnames, ['Grades', 'Grades 2'])
+        rows = list(book['Grades'].iter_rows(values_only=True))
+        self.assertEqual(rows[0], tuple(exports.HEADERS))
+        self.assertEqual(rows[1][7], datetime(2025, 9, 1, 23, 59))
+        self.assertEqual(rows[1][14], datetime(2025, 9, 1, 12, 34, 56))
+        self.assertEqual(rows[1][10:13], ('0', 'สมชาย', 'ใจดี'))
+
+
+@override_settings(USE_TZ=False)
+class StreamCsvTests(SimpleTestCase):
+    def test_csv(self):
+        data = b''.join(exports.stream_csv([export_row(grade=None, late=True, first_name='Somchai, Jr.')]))
+
+        self.assertTrue(data.startswith('\ufeff'.encode()))
+        header, row = csv.reader(data.decode('utf-8-sig').splitlines())
+        self.assertEqual(header, exports.HEADERS)
+        values = dict(zip(header, row))
+        self.assertEqual(values['first_name'], 'Somchai, Jr.')
+        self.assertEqual(values['last_name'], 'ใจดี')
+        self.assertEqual(values['due_date'], '2025-09-01 23:59:00')
+        self.assertEqual((values['late'], values['grade'], values['total_points']), ('yes', '', '10.00'))
+
+    def test_streams_in_chunks(self):
+        chunks = list(exports.stream_csv(export_row(username=os.urandom(8).hex()) for _ in range(3000)))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(len(b''.join(chunks).decode('utf-8-sig').splitlines()), 3001)
+
+    def test_unknown_format(self):
+        with self.assertRaises(exports.ExportError):
+            exports.stream_export([], 'ods')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SubmitFileViewTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        course = make_course()
+        self.assignment = make_assignment(course, submission_type='file')
+        self.url = reverse('submit', args=[self.assignment.pk])
+
+    def upload(self, username, content=b'print("hello")\n', **extra):
+        student = User.objects.create_user(username)
+        Enrollment.objects.create(student=student, course=self.assignment.course)
+        self.client.force_login(student)
+        return self.client.post(self.url, {'file': SimpleUploadedFile('main.py', content)}, **extra)
+
+    def test_upload(self):
+        response = self.upload('6400000001')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['size'], 15)
+
+    def test_response_does_not_reveal_identical_uploads(self):
+        first = self.upload('6400000001').json()
+        second = self.upload('6400000002').json()
+        self.assertEqual(first.keys(), second.keys())
+        self.assertNotIn('deduplicated', second)
+
+    def test_malformed_content_length(self):
+        response = self.upload('6400000001', CONTENT_LENGTH='12abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Submission.objects.exists())
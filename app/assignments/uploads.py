@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Relative to MEDIA_ROOT
+CONTENT_ROOT = 'submissions/sha256'
+INCOMING_DIR = 'submissions/.incoming'
+
+
+def content_path(digest, extension):
+    """
+    Storage name (relative to MEDIA_ROOT) of a file with the given SHA-256
+    """
+    return f"{CONTENT_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def allowed_extension(file_name):
+    """
+    Lower-cased extension of the file name if uploads of that type are
+    allowed, None otherwise
+    """
+    extension = os.path.splitext(file_name or '')[1].lower()
+    allowed = getattr(settings, 'SUBMISSION_ALLOWED_EXTENSIONS', None)
+    if allowed and extension not in allowed:
+        return None
+    # The extension ends up in the storage path, so keep it tame
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,10}', extension) else ''
+
+
+def cleanup_incoming(max_age):
+    """
+    Delete partial uploads older than max_age seconds, left behind by
+    workers that died mid-upload
+
+    Returns:
+        int: Number of files removed
+    """
+    incoming = os.path.join(settings.MEDIA_ROOT, INCOMING_DIR)
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        entries = list(os.scandir(incoming))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.endswith('.part') and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            # Finished or removed since the scan
+            continue
+    return removed
+
+
+class StoredUploadedFile(UploadedFile):
+    """
+    An upload that has already been written to its final, content-addressed
+    place under MEDIA_ROOT; assign `storage_name` to a FileField to use it
+    """
+    def __init__(self, storage_name, digest, size, name, content_type, deduplicated):
+        super().__init__(file=None, name=name, content_type=content_type, size=size)
+        self.storage_name = storage_name
+        self.sha256 = digest
+        self.deduplicated = deduplicated
+
+    def open(self, mode='rb'):
+        self.file = open(os.path.join(settings.MEDIA_ROOT, self.storage_name), mode)
+        return self
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class ContentAddressedUploadHandler(FileUploadHandler):
+    """
+    Streams uploaded files straight into content-addressed storage
+
+    Each chunk is written once to a temp file inside MEDIA_ROOT while its
+    SHA-256 and size are computed on the fly; on completion the temp file is
+    renamed (same filesystem, no copy) to submissions/sha256/ab/cd/<hash>.
+    An identical file that is already stored is reused and the new bytes are
+    dropped. Disallowed types are skipped before any of their data is read,
+    and an upload is aborted as soon as it passes the size limit (callers
+    should also reject an oversized Content-Length before parsing).
+    """
+    chunk_size = 256 * 2 ** 10
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or getattr(settings, 'SUBMISSION_MAX_UPLOAD_SIZE', 100 * 2 ** 20)
+        self.rejection = None
+        self._reset()
+
+    def _reset(self):
+        self.temp_file = None
+        self.temp_path = None
+        self.hasher = None
+        self.size = 0
+        self.extension = ''
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        extension = allowed_extension(file_name)
+        if extension is None:
+            self.rejection = 'type_not_allowed'
+            raise SkipFile()
+
+        incoming = os.path.join(settings.MEDIA_ROOT, INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        self.extension = extension
+        self.temp_path = os.path.join(incoming, f"{uuid.uuid4().hex}.part")
+        self.temp_file = open(self.temp_path, 'wb')
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.rejection = 'too_large'
+            self._discard()
+            raise StopUpload(connection_reset=True)
+        self.hasher.update(raw_data)
+        self.temp_file.write(raw_data)
+        # Nothing left for later handlers: this one owns the bytes
+        return None
+
+    def file_complete(self, file_size):
+        if self.temp_file is None:
+            return None
+        self.temp_file.close()
+
+        digest = self.hasher.hexdigest()
+        storage_name = content_path(digest, self.extension)
+        final_path = os.path.join(settings.MEDIA_ROOT, storage_name)
+
+        deduplicated = os.path.exists(final_path)
+        if deduplicated:
+            os.remove(self.temp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            # Atomic rename; concurrent uploads of the same bytes land on the same name
+            os.replace(self.temp_path, final_path)
+
+        uploaded = StoredUploadedFile(
+            storage_name=storage_name,
+            digest=digest,
+            size=self.size,
+            name=self.file_name,
+            content_type=self.content_type,
+            deduplicated=deduplicated,
+        )
+        self._reset()
+        return uploaded
+
+    def upload_interrupted(self):
+        self._discard()
+
+    def _discard(self):
+        if self.temp_file is not None:
+            self.temp_file.close()
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                logger.warning("Could not remove partial upload %s", self.temp_path)
+        self._reset()
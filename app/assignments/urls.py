@@ -0,0 +1,13 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('<uuid:assignment_id>/submit/', views.submit_view, name='submit'),
+    path('<uuid:assignment_id>/grades/', views.bulk_grade_view, name='bulk_grade'),
+    path('<uuid:assignment_id>/similarity/', views.similarity_report_view, name='similarity_report'),
+    path('<uuid:assignment_id>/autograde/', views.autograde_view, name='autograde'),
+    path('<uuid:assignment_id>/files.zip', views.submission_archive_view, name='submission_archive'),
+    path('courses/<uuid:course_id>/gradebook/', views.course_gradebook_view, name='course_gradebook'),
+    path('gradebook/export/', views.gradebook_export_view, name='gradebook_export'),
+    path('submissions/<uuid:submission_id>/file/', views.submission_file_view, name='submission_file'),
+]
@@ -0,0 +1,312 @@
+import json
+import os
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.validators import URLValidator
+from django.db.models import Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils.http import content_disposition_header
+from django.utils.text import slugify
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from courses.models import Course, Enrollment
+from .archive import archive_name, stream_archive, submission_files
+from .gradebook import get_course_overview
+from .autograde import AutogradeError, clean_suite, schedule_autograde
+from .exports import FORMATS, ExportError, clean_export_filters, export_filename, export_rows, stream_export
+from .grading import GradingError, apply_grades, parse_grade_sheet
+from .media import serve_protected_file
+from .models import Assignment, Submission, TestSuite
+from .similarity import similarity_report
+from .submissions import SubmissionNotOpen, lateness, submit
+from .uploads import ContentAddressedUploadHandler
+
+# Room for multipart boundaries and the non-file form fields
+MULTIPART_OVERHEAD = 64 * 2 ** 10
+
+
+@csrf_exempt
+@login_required
+def submit_view(request, assignment_id):
+    """
+    Accept a submission or resubmission of an assignment
+    
+    File uploads are streamed straight into content-addressed storage under
+    MEDIA_ROOT; text, code and link entries come from the form fields.
+    Permission, availability, type and size checks all happen before the
+    body is read. CSRF is still enforced (by _submit_file/_submit_entry),
+    but only after the upload handlers are swapped in, which has to happen
+    before anything touches request.POST.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    assignment = get_object_or_404(Assignment, pk=assignment_id)
+    enrolled = Enrollment.objects.filter(
+        course_id=assignment.course_id, student=request.user, status='enrolled'
+    ).exists()
+    if not enrolled:
+        return JsonResponse({'error': 'You are not enrolled in this course'}, status=403)
+    
+    try:
+        lateness(assignment)
+    except SubmissionNotOpen as e:
+        return JsonResponse({'error': str(e)}, status=403)
+    
+    if assignment.submission_type != 'file':
+        return _submit_entry(request, assignment)
+    
+    max_size = settings.SUBMISSION_MAX_UPLOAD_SIZE
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid Content-Length'}, status=400)
+    if content_length > max_size + MULTIPART_OVERHEAD:
+        return JsonResponse({'error': 'File is too large'}, status=413)
+    
+    handler = ContentAddressedUploadHandler(request, max_size=max_size)
+    request.upload_handlers = [handler]
+    return _submit_file(request, assignment, handler)
+
+
+def _submission_response(submission, created, **extra):
+    return JsonResponse({
+        'submission_id': str(submission.pk),
+        'submitted_at': submission.submitted_at.isoformat(),
+        'is_late': submission.is_late,
+        'resubmission_count': submission.resubmission_count,
+        **extra,
+    }, status=201 if created else 200)
+
+
+@csrf_protect
+def _submit_file(request, assignment, handler):
+    uploaded = request.FILES.get('file')
+    if uploaded is None:
+        if handler.rejection == 'too_large':
+            return JsonResponse({'error': 'File is too large'}, status=413)
+        if handler.rejection == 'type_not_allowed':
+            return JsonResponse({'error': 'File type is not allowed'}, status=415)
+        return JsonResponse({'error': 'No file uploaded'}, status=400)
+    
+    # The bytes are already in place; only the storage name is saved
+    try:
+        submission, created = submit(assignment, request.user, file=uploaded.storage_name)
+    except SubmissionNotOpen as e:
+        return JsonResponse({'error': str(e)}, status=403)
+    
+    # Not whether the bytes were already stored: that would tell the student
+    # someone else uploaded the same file
+    return _submission_response(submission, created, sha256=uploaded.sha256, size=uploaded.size)
+
+
+@csrf_protect
+def _submit_entry(request, assignment):
+    if assignment.submission_type == 'link':
+        link_url = request.POST.get('link_url', '').strip()
+        try:
+            URLValidator(schemes=['http', 'https'])(link_url)
+        except ValidationError:
+            return JsonResponse({'error': 'A valid http(s) link_url is required'}, status=400)
+        fields = {'link_url': link_url}
+    else:
+        text_content = request.POST.get('text_content', '')
+        if not text_content.strip():
+            return JsonResponse({'error': 'text_content is required'}, status=400)
+        fields = {'text_content': text_content}
+    
+    try:
+        submission, created = submit(assignment, request.user, **fields)
+    except SubmissionNotOpen as e:
+        return JsonResponse({'error': str(e)}, status=403)
+    return _submission_response(submission, created)
+
+
+@login_required
+def submission_file_view(request, submission_id):
+    """
+    Download the file of a submission: its student, the course teachers and
+    staff only
+
+    The permission check is a single query; the bytes themselves are sent by
+    nginx (X-Accel-Redirect) or streamed with Range/ETag support.
+    """
+    submissions = Submission.objects.filter(pk=submission_id)
+    user = request.user
+    if not (user.is_staff or user.is_superuser):
+        submissions = submissions.filter(Q(student=user) | Q(assignment__course__teachers=user))
+    
+    row = submissions.values_list('file', 'student__username', 'assignment__name').first()
+    if row is None or not row[0]:
+        raise Http404("Submission file not found")
+    
+    name, username, assignment_name = row
+    extension = os.path.splitext(name)[1]
+    download_name = f"{username}_{slugify(assignment_name) or 'submission'}{extension}"
+    return serve_protected_file(request, name, download_name=download_name)
+
+
+@login_required
+def submission_archive_view(request, assignment_id):
+    """
+    Download every submitted file of an assignment as one ZIP: course
+    teachers and staff only
+
+    The archive is built while it is sent (see assignments.archive), so the
+    worker holds one chunk in memory and the first bytes go out at once.
+    There is no Content-Length; browsers show the download without a total.
+    """
+    assignment = get_object_or_404(Assignment.objects.select_related('course'), pk=assignment_id)
+    user = request.user
+    if not (user.is_staff or user.is_superuser or assignment.course.teachers.filter(pk=user.pk).exists()):
+        raise PermissionDenied
+    
+    response = StreamingHttpResponse(stream_archive(submission_files(assignment)), content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(True, archive_name(assignment))
+    # Changes as students submit; and let nginx pass it through rather than spool it to disk
+    response['Cache-Control'] = 'private, no-store'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def bulk_grade_view(request, assignment_id):
+    """
+    Grade many submissions of an assignment at once
+
+    Accepts a CSV or JSON grade sheet of (student, grade, feedback), either
+    as the `file` field of a form or as the request body. All rows are
+    validated first and written in one transaction, or none are.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    assignment = get_object_or_404(Assignment.objects.select_related('course'), pk=assignment_id)
+    user = request.user
+    if not (user.is_staff or user.is_superuser or assignment.course.teachers.filter(pk=user.pk).exists()):
+        return JsonResponse({'error': 'Only teachers of this course can grade it'}, status=403)
+    
+    uploaded = request.FILES.get('file')
+    if uploaded is not None:
+        data, content_type = uploaded.read(), uploaded.content_type
+    else:
+        data, content_type = request.body, request.content_type
+    
+    try:
+        rows = parse_grade_sheet(data, content_type)
+        result = apply_grades(assignment, rows)
+    except UnicodeDecodeError:
+        return JsonResponse({'error': 'Grade sheet must be UTF-8'}, status=400)
+    except GradingError as e:
+        return JsonResponse({'error': str(e), 'errors': e.errors}, status=400)
+    
+    return JsonResponse(result)
+
+
+@login_required
+def course_gradebook_view(request, course_id):
+    """
+    Teacher's course overview, read from the materialized gradebook rows
+    """
+    course = get_object_or_404(Course, pk=course_id)
+    user = request.user
+    if not (user.is_staff or user.is_superuser or course.teachers.filter(pk=user.pk).exists()):
+        raise PermissionDenied
+    
+    return render(request, 'assignments/course_gradebook.html', {
+        'course': course,
+        'overview': get_course_overview(course.pk),
+    })
+
+
+@login_required
+def gradebook_export_view(request):
+    """
+    Grades of every submission matching ?term=&year=&faculty=&department=
+    &course= as ?format=csv (default) or xlsx
+
+    Staff can export anything; teachers get rows of the courses they teach
+    only. Rows are read in chunks and written as they come (see
+    assignments.exports), so the size of the export doesn't matter.
+    """
+    user = request.user
+    teacher = None
+    if not (user.is_staff or user.is_superuser):
+        if not user.teaching_courses.exists():
+            raise PermissionDenied
+        teacher = user
+    
+    export_format = request.GET.get('format', 'csv')
+    try:
+        filters = clean_export_filters(request.GET)
+        content = stream_export(export_rows(filters, teacher=teacher), export_format)
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    response = StreamingHttpResponse(content, content_type=FORMATS[export_format])
+    response['Content-Disposition'] = content_disposition_header(True, export_filename(filters, export_format))
+    response['Cache-Control'] = 'private, no-store'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def similarity_report_view(request, assignment_id):
+    """
+    Teacher's list of near-duplicate text/code submissions of an assignment
+
+    ?threshold=0.7 overrides SIMILARITY_THRESHOLD for this report.
+    """
+    assignment = get_object_or_404(Assignment.objects.select_related('course'), pk=assignment_id)
+    user = request.user
+    if not (user.is_staff or user.is_superuser or assignment.course.teachers.filter(pk=user.pk).exists()):
+        raise PermissionDenied
+    
+    threshold = None
+    if request.GET.get('threshold'):
+        try:
+            threshold = min(max(float(request.GET['threshold']), 0.0), 1.0)
+        except ValueError:
+            return JsonResponse({'error': 'threshold must be a number between 0 and 1'}, status=400)
+    
+    return render(request, 'assignments/similarity_report.html', {
+        'assignment': assignment,
+        'report': similarity_report(assignment, threshold),
+    })
+
+
+@login_required
+def autograde_view(request, assignment_id):
+    """
+    Run a code assignment's test suite on every submission, in the background
+
+    A JSON test suite in the body (application/json, see
+    assignments.autograde.clean_suite) replaces the assignment's suite
+    first; without one the current suite is re-run, which only executes
+    code that hasn't been run against it.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    assignment = get_object_or_404(Assignment.objects.select_related('course'), pk=assignment_id)
+    user = request.user
+    if not (user.is_staff or user.is_superuser or assignment.course.teachers.filter(pk=user.pk).exists()):
+        return JsonResponse({'error': 'Only teachers of this course can grade it'}, status=403)
+    if assignment.submission_type != 'code':
+        return JsonResponse({'error': 'Only code assignments can be auto-graded'}, status=400)
+    
+    if request.content_type == 'application/json' and request.body.strip():
+        try:
+            values = clean_suite(json.loads(request.body))
+        except ValueError:
+            return JsonResponse({'error': 'Test suite must be UTF-8 JSON'}, status=400)
+        except AutogradeError as e:
+            return JsonResponse({'error': 'Invalid test suite', 'errors': e.errors}, status=400)
+        TestSuite.objects.update_or_create(assignment=assignment, defaults=values)
+    elif not TestSuite.objects.filter(assignment=assignment).exists():
+        return JsonResponse({'error': 'This assignment has no test suite yet'}, status=400)
+    
+    if schedule_autograde(assignment.pk) is None:
+        return JsonResponse({'error': 'Grading queue unavailable, try again later'}, status=503)
+    return JsonResponse({'queued': True}, status=202)
@@ -0,0 +1,62 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from courses.services import import_roster, read_roster_csv
+
+
+class Command(BaseCommand):
+    help = 'Import a course roster: prefetch TU profiles, create accounts and enroll students'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', help='UUID of the course to enroll students in')
+        parser.add_argument('tu_ids', nargs='*', help='Student TU IDs')
+        parser.add_argument('--csv', dest='csv_path', help='Roster CSV (tu_id column or first column)')
+        parser.add_argument('--workers', type=int, default=8, help='Max concurrent TU API calls')
+        parser.add_argument(
+            '--rate', type=float,
+            help='Max TU API calls per second (0 = unlimited; default: TU_ROSTER_RATE)',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk write')
+        parser.add_argument(
+            '--skip-existing', action='store_true',
+            help="Don't refetch profiles for students who already have an account",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(pk=options['course_id'])
+        except (Course.DoesNotExist, ValidationError):
+            raise CommandError(f"Course {options['course_id']} does not exist")
+
+        tu_ids = list(options['tu_ids'])
+        if options['csv_path']:
+            with open(options['csv_path'], newline='', encoding='utf-8-sig') as f:
+                tu_ids += read_roster_csv(f)
+        tu_ids = list(dict.fromkeys(tu_ids))
+        if not tu_ids:
+            raise CommandError('No TU IDs given; pass them as arguments or with --csv')
+
+        self.stdout.write(f'Importing {len(tu_ids)} students into {course}...')
+        result = import_roster(
+            course,
+            tu_ids,
+            workers=options['workers'],
+            rate=options['rate'],
+            batch_size=options['batch_size'],
+            skip_existing=options['skip_existing'],
+        )
+
+        elapsed = result['elapsed_seconds'] or 1e-9
+        self.stdout.write(
+            f"Fetched {result['fetched']} profiles in {result['fetch_seconds']:.2f}s, "
+            f"wrote rows in {result['write_seconds']:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']}, updated {result['updated']}, enrolled {result['enrolled']} "
+            f"in {elapsed:.2f}s ({result['requested'] / elapsed:.1f} students/s)"
+        ))
+        if result['failed']:
+            preview = ', '.join(result['failed_ids'][:20])
+            more = '...' if result['failed'] > 20 else ''
+            self.stdout.write(self.style.WARNING(f"{result['failed']} students could not be fetched: {preview}{more}"))
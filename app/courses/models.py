@@ -1,12 +1,12 @@
 from django.db import models
-import uuid
+from ams.ids import uuid7
 from django.contrib.auth.models import User
 
 class Course(models.Model):
     """
     Model representing a course/class
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=20)
     description = models.TextField(blank=True)
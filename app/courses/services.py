@@ -0,0 +1,286 @@
+import csv
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from accounts.models import UserProfile
+from accounts.user_cache import invalidate_user
+from accounts.tu_api import (
+    TUServiceUnavailable,
+    apply_changes,
+    extract_user_fields,
+    get_tu_api,
+    student_info_to_user_data,
+)
+from assignments.dashboard import invalidate_dashboards
+from .models import Enrollment
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter spacing calls at most `rate` per second across all
+    worker threads
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def read_roster_csv(file):
+    """
+    Read TU IDs from a roster CSV
+
+    Uses the `tu_id` (or `student_id` / `username`) column if there is a
+    header row, otherwise the first column.
+
+    Returns:
+        list: TU IDs in file order, without blanks or duplicates
+    """
+    if isinstance(file, (bytes, str)):
+        text = file.decode('utf-8-sig') if isinstance(file, bytes) else file
+        file = io.StringIO(text)
+
+    rows = list(csv.reader(file))
+    if not rows:
+        return []
+
+    column = 0
+    header = [cell.strip().lower() for cell in rows[0]]
+    for name in ('tu_id', 'student_id', 'username'):
+        if name in header:
+            column = header.index(name)
+            rows = rows[1:]
+            break
+
+    tu_ids = []
+    seen = set()
+    for row in rows:
+        if len(row) <= column:
+            continue
+        tu_id = row[column].strip()
+        if tu_id and tu_id not in seen:
+            seen.add(tu_id)
+            tu_ids.append(tu_id)
+    return tu_ids
+
+
+def fetch_student_profiles(tu_ids, workers=8, rate=None):
+    """
+    Fetch TU profiles for many students concurrently
+
+    Calls go through a bounded thread pool sharing the pooled TU client and
+    are rate limited (TU_ROSTER_RATE calls per second unless `rate` is
+    given) so a big roster doesn't flood the upstream API.
+
+    Returns:
+        tuple: (dict of tu_id -> Ad/verify style user data, list of failed tu_ids)
+    """
+    tu_api = get_tu_api()
+    if rate is None:
+        rate = getattr(settings, 'TU_ROSTER_RATE', 20)
+    limiter = RateLimiter(rate)
+    stop = threading.Event()
+
+    def fetch(tu_id):
+        if stop.is_set():
+            return tu_id, None
+        limiter.wait()
+        try:
+            return tu_id, student_info_to_user_data(tu_api.get_student_info(tu_id))
+        except TUServiceUnavailable:
+            # Circuit is open: don't keep hammering a failing upstream
+            stop.set()
+            return tu_id, None
+
+    profiles = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for tu_id, user_data in pool.map(fetch, tu_ids):
+            if user_data:
+                profiles[tu_id] = user_data
+            else:
+                failed.append(tu_id)
+
+    if stop.is_set():
+        logger.warning("TU API unavailable during roster fetch; remaining students were skipped")
+    return profiles, failed
+
+
+def upsert_students(user_data_list, batch_size=500):
+    """
+    Create or update User and UserProfile rows for many students using
+    batched bulk_create/bulk_update
+
+    Existing accounts are only filled in, as with enrich_user: empty values
+    don't blank what is there and the user type (role) is never changed.
+
+    Returns:
+        tuple: (dict of username -> User, stats dict)
+    """
+    stats = {'created': 0, 'updated': 0}
+    users_by_username = {}
+    unusable_password = make_password(None)
+
+    for start in range(0, len(user_data_list), batch_size):
+        batch = [extract_user_fields(data) for data in user_data_list[start:start + batch_size]]
+
+        with transaction.atomic():
+            existing = {
+                user.username: user
+                for user in User.objects.select_related('profile').filter(
+                    username__in=[username for username, _, _ in batch]
+                )
+            }
+
+            new_users = []
+            changed_users = []
+            user_fields = set()
+            for username, user_values, _ in batch:
+                user = existing.get(username)
+                if user is None:
+                    new_users.append(User(username=username, password=unusable_password, **user_values))
+                else:
+                    changed = apply_changes(user, {field: value for field, value in user_values.items() if value})
+                    if changed:
+                        changed_users.append(user)
+                        user_fields.update(changed)
+
+            User.objects.bulk_create(new_users)
+            if changed_users:
+                User.objects.bulk_update(changed_users, sorted(user_fields))
+            new_usernames = {user.username for user in new_users}
+            for user in new_users:
+                existing[user.username] = user
+
+            new_profiles = []
+            changed_profiles = []
+            profile_fields = set()
+            for username, _, profile_values in batch:
+                user = existing[username]
+                profile = None
+                if username not in new_usernames:
+                    try:
+                        # Already loaded by select_related, no query
+                        profile = user.profile
+                    except UserProfile.DoesNotExist:
+                        pass
+                if profile is None:
+                    new_profiles.append(UserProfile(user=user, **profile_values))
+                else:
+                    changed = apply_changes(profile, {
+                        field: value for field, value in profile_values.items() if value and field != 'user_type'
+                    })
+                    if changed:
+                        changed_profiles.append(profile)
+                        profile_fields.update(changed)
+
+            UserProfile.objects.bulk_create(new_profiles)
+            if changed_profiles:
+                UserProfile.objects.bulk_update(changed_profiles, sorted(profile_fields))
+
+            updated_ids = {user.pk for user in changed_users} | {p.user_id for p in changed_profiles}
+            # bulk_update sends no post_save, so do what the signal handlers would
+            transaction.on_commit(lambda ids=updated_ids: [invalidate_user(user_id) for user_id in ids])
+
+        stats['created'] += len(new_users)
+        stats['updated'] += len(updated_ids)
+        users_by_username.update(existing)
+
+    return users_by_username, stats
+
+
+def enroll_students(course, users, batch_size=500):
+    """
+    Enroll users in a course in batches; re-enrolls withdrawn students
+
+    Returns:
+        int: Number of enrollment rows written
+    """
+    enrollments = [Enrollment(student=user, course=course, status='enrolled') for user in users]
+    for start in range(0, len(enrollments), batch_size):
+        Enrollment.objects.bulk_create(
+            enrollments[start:start + batch_size],
+            update_conflicts=True,
+            unique_fields=['student', 'course'],
+            update_fields=['status', 'updated_at'],
+        )
+    # bulk_create sends no post_save, so do what the signal handlers would
+    student_ids = [user.pk for user in users]
+    transaction.on_commit(lambda: invalidate_dashboards(student_ids))
+    return len(enrollments)
+
+
+def import_roster(course, tu_ids, workers=8, rate=None, batch_size=500, skip_existing=False):
+    """
+    Import a course roster ahead of first login
+
+    Fetches each student's TU profile concurrently, upserts User and
+    UserProfile rows, and enrolls everyone in the course.
+
+    Args:
+        course (Course): Course to enroll the students in
+        tu_ids (list): Student TU IDs
+        workers (int): Max concurrent TU API calls
+        rate (float): Max TU API calls per second (0 for no limit);
+            defaults to TU_ROSTER_RATE
+        batch_size (int): Rows per bulk write
+        skip_existing (bool): Don't refetch profiles of students who already
+            have an account; they are still enrolled
+
+    Returns:
+        dict: Counts of fetched/created/updated/enrolled/failed students,
+        the failed IDs and the elapsed time
+    """
+    started = time.perf_counter()
+
+    known = {}
+    to_fetch = list(tu_ids)
+    if skip_existing:
+        known = User.objects.in_bulk(tu_ids, field_name='username')
+        to_fetch = [tu_id for tu_id in tu_ids if tu_id not in known]
+
+    profiles, failed = fetch_student_profiles(to_fetch, workers=workers, rate=rate)
+    fetched_at = time.perf_counter()
+
+    users, stats = upsert_students(list(profiles.values()), batch_size=batch_size)
+    for tu_id, user_data in profiles.items():
+        known[tu_id] = users[user_data['username']]
+
+    students = [known[tu_id] for tu_id in tu_ids if tu_id in known]
+    with transaction.atomic():
+        enrolled = enroll_students(course, students, batch_size=batch_size)
+
+    finished = time.perf_counter()
+    return {
+        'requested': len(tu_ids),
+        'fetched': len(profiles),
+        'created': stats['created'],
+        'updated': stats['updated'],
+        'enrolled': enrolled,
+        'failed': len(failed),
+        'failed_ids': failed,
+        'fetch_seconds': fetched_at - started,
+        'write_seconds': finished - fetched_at,
+        'elapsed_seconds': finished - started,
+    }
@@ -0,0 +1,224 @@
+"""
+gunicorn configuration for ams, sized from the host (or container) it runs on.
+
+    gunicorn                      # picks up this file from the working directory
+    gunicorn -c gunicorn.conf.py  # from elsewhere
+
+Environment:
+
+    GUNICORN_WORKER_CLASS   gthread (default), gevent or uvicorn (serves ams.asgi)
+    GUNICORN_WORKERS        fixed worker count instead of the computed one
+    GUNICORN_THREADS        threads per gthread worker (default 8)
+    GUNICORN_WORKER_MEMORY  expected MiB per worker, for the memory cap (default 200)
+    GUNICORN_BIND           default 0.0.0.0:8000
+    GUNICORN_LOG_LEVEL      default info
+    GUNICORN_ACCESS_LOG     access log file, default - (stdout); empty turns it off
+    GUNICORN_MEMORY_LOG_EVERY  log worker RSS every N requests (default 1000, 0 = off)
+    PRELOAD_APP             load the app once in the master (see ams.preload);
+                            not with gevent, see below
+
+Workers (worker_count), unless GUNICORN_WORKERS is set:
+
+    gthread          2 * CPUs + 1 (its threads mostly wait on the TU API)
+    gevent, uvicorn  CPUs
+
+then capped at 80% of memory // GUNICORN_WORKER_MEMORY, and never below 1.
+CPUs are the ones this process is pinned to, lowered to the cgroup CPU quota
+(cpu.max, or cpu.cfs_quota_us / cpu.cfs_period_us on cgroup v1) rounded to
+the nearest whole CPU, so a container limited to 2 CPUs doesn't start a
+worker per host core. Memory is the cgroup memory limit, or MemAvailable
+when there is none. GUNICORN_CMD_ARGS still overrides anything here.
+
+PRELOAD_APP (or --preload) with the gevent worker class is refused at start.
+The gevent worker monkey-patches the standard library in each worker after
+the fork, but with preload_app the master has already imported Django, ssl,
+socket and the clients built on them (requests, redis, psycopg2), which keep
+the unpatched originals: TLS calls to the TU API fail (RecursionError in ssl) and blocking
+I/O stalls every greenlet of the worker.
+"""
+
+import multiprocessing
+import os
+import shutil
+
+WORKER_CLASSES = {
+    'gthread': 'gthread',
+    'gevent': 'gevent',
+    'uvicorn': 'uvicorn_worker.UvicornWorker',
+}
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit():
+    """
+    CPUs this process may use: the cgroup quota if set, else the CPUs it is
+    pinned to
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = multiprocessing.cpu_count()
+    quota = None
+    cpu_max = _read('/sys/fs/cgroup/cpu.max')  # cgroup v2: "<quota> <period>" or "max <period>"
+    if cpu_max and not cpu_max.startswith('max'):
+        limit, period = cpu_max.split()
+        quota = int(limit) / int(period)
+    else:
+        limit, period = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'), _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if limit and period and int(limit) > 0:
+            quota = int(limit) / int(period)
+    if quota:
+        cpus = min(cpus, max(1, int(quota + 0.5)))
+    return max(1, cpus)
+
+
+def memory_limit():
+    """
+    Bytes available to this container: the cgroup limit if set, else the
+    host's available memory
+    """
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _read(path)
+        # cgroup v1 reports "no limit" as a huge number
+        if value and value != 'max' and int(value) < 2 ** 60:
+            return int(value)
+    meminfo = _read('/proc/meminfo') or ''
+    for line in meminfo.splitlines():
+        if line.startswith('MemAvailable:'):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def worker_count(kind, cpus, memory, worker_memory):
+    per_cpu = 2 if kind == 'gthread' else 1
+    workers = cpus * per_cpu + (1 if kind == 'gthread' else 0)
+    if memory:
+        workers = min(workers, int(memory * 0.8 // worker_memory))
+    return max(1, workers)
+
+
+def tu_call_budget():
+    """
+    Worst-case seconds for one TU API call: connect and read timeouts plus
+    the connect retries and their backoff (read timeouts are never retried)
+    """
+    connect = _env_float('TU_API_CONNECT_TIMEOUT', 3.05)
+    read = _env_float('TU_API_READ_TIMEOUT', 10)
+    retries = _env_int('TU_API_MAX_RETRIES', 2)
+    backoff = _env_float('TU_API_BACKOFF_FACTOR', 0.3)
+    return connect * (retries + 1) + read + sum(backoff * 2 ** i for i in range(retries))
+
+
+def rss_mib():
+    statm = _read('/proc/self/statm')
+    if statm:
+        return int(statm.split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+kind = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if kind not in WORKER_CLASSES:
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not {kind!r}")
+
+_cpus = cpu_limit()
+_memory = memory_limit()
+_worker_memory = _env_int('GUNICORN_WORKER_MEMORY', 200) * 2 ** 20
+
+wsgi_app = 'ams.asgi:application' if kind == 'uvicorn' else 'ams.wsgi:application'
+worker_class = WORKER_CLASSES[kind]
+workers = _env_int('GUNICORN_WORKERS', worker_count(kind, _cpus, _memory, _worker_memory))
+if kind == 'gthread':
+    threads = _env_int('GUNICORN_THREADS', 8)
+if kind == 'gevent':
+    worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 200)
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+preload_app = os.environ.get('PRELOAD_APP', 'False').lower() in ('1', 'true', 'yes')
+
+# A login waits on one TU call (the student info sync runs on Celery); give
+# a request twice its worst case before the worker is considered stuck
+timeout = max(30, int(2 * tu_call_budget()))
+graceful_timeout = 30
+# nginx reuses upstream connections only briefly
+keepalive = 5
+# Recycle workers now and then (cheap with preload_app), not all at once
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = max_requests // 10
+# Heartbeat files on tmpfs, not the container's overlay filesystem
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+_memory_log_every = _env_int('GUNICORN_MEMORY_LOG_EVERY', 1000)
+
+
+def on_starting(server):
+    # See the module docstring; checked on the final settings, as --preload
+    # and --worker-class may also come from the command line
+    if server.cfg.preload_app and 'gevent' in server.cfg.worker_class_str.lower():
+        raise RuntimeError('PRELOAD_APP (--preload) cannot be used with the gevent worker class; turn one of them off')
+    # prometheus_client multiprocess files from an earlier run would be summed into /metrics
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory and os.path.isdir(directory):
+        shutil.rmtree(directory, ignore_errors=True)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def when_ready(server):
+    server.log.info(
+        f"ams: {workers} {kind} worker(s)"
+        + (f" x {threads} threads" if kind == 'gthread' else '')
+        + f" for {_cpus} CPU(s), {(_memory or 0) / 2 ** 30:.1f} GiB; timeout {timeout}s, "
+        f"preload {'on' if server.cfg.preload_app else 'off'}"
+    )
+
+
+def post_fork(server, worker):
+    if kind == 'gevent':
+        # Let psycopg2 yield to other greenlets while it waits on Postgres
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    server.log.info("Worker %s started, %.0f MiB", worker.pid, rss_mib())
+
+
+def post_request(worker, req, environ, resp):
+    if _memory_log_every and worker.nr % _memory_log_every == 0:
+        worker.log.info("Worker %s: %s requests, %.0f MiB", worker.pid, worker.nr, rss_mib())
+
+
+def worker_abort(worker):
+    worker.log.warning("Worker %s timed out after %s requests, %.0f MiB", worker.pid, worker.nr, rss_mib())
+
+
+def worker_exit(server, worker):
+    # The uvicorn worker doesn't count requests
+    served = 'n/a' if kind == 'uvicorn' else worker.nr
+    server.log.info("Worker %s exiting after %s requests, %.0f MiB", worker.pid, served, rss_mib())
+
+
+def child_exit(server, worker):
+    # Runs in the master: fold the dead worker's gauges out of /metrics
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)